@@ -0,0 +1,153 @@
+# File: backend/app/api/endpoints/analytics.py
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from ... import crud, schemas, security
+from ...database import DbSession, get_read_db, run
+from ...metrics import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 3 * 366
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def _next_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+def _report_range(start: Optional[date], end: Optional[date]) -> tuple[date, date]:
+    """Fills in the default range (the last 30 days) and rejects reversed or overlong ones."""
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end.")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The range may cover at most {MAX_RANGE_DAYS} days.",
+        )
+    return start, end
+
+def _sales_bucket(start: date, revenue: float, order_count: int, units: int) -> schemas.SalesBucket:
+    return schemas.SalesBucket(
+        start=start,
+        revenue=round(revenue, 2),
+        order_count=order_count,
+        units=units,
+        average_basket=round(revenue / order_count, 2) if order_count else 0.0,
+    )
+
+@router.get("/sales", response_model=schemas.SalesReport)
+async def read_sales(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: Literal["day", "week", "month"] = "day",
+    db: DbSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(security.get_current_user)
+):
+    """
+    Revenue, order count, units and average basket for the current user's page,
+    per day, week or month between `start` and `end` (inclusive, UTC dates).
+    Defaults to the last 30 days. Buckets without sales are included with zeros.
+
+    Reads the daily rollups, so the cost grows with the number of days in the
+    range rather than the number of orders.
+    """
+    start, end = _report_range(start, end)
+
+    page = await run(db, crud.get_page_by_owner_id, owner_id=current_user.id)
+    if not page:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="You do not have a page yet. No sales to show.",
+        )
+    daily = await run(db, crud.get_daily_sales, page_id=page.id, start=start, end=end)
+    products = await run(db, crud.get_product_sales, page_id=page.id, start=start, end=end)
+
+    # Zero-filled buckets, then fold the daily rows into them
+    totals_by_bucket = {}
+    bucket_start = _bucket_start(start, bucket)
+    while bucket_start <= end:
+        totals_by_bucket[bucket_start] = [0.0, 0, 0]
+        bucket_start = _next_bucket(bucket_start, bucket)
+    for day, revenue, order_count, units in daily:
+        totals = totals_by_bucket[_bucket_start(day, bucket)]
+        totals[0] += revenue
+        totals[1] += order_count
+        totals[2] += units
+
+    return schemas.SalesReport(
+        start=start,
+        end=end,
+        bucket=bucket,
+        totals=_sales_bucket(
+            start,
+            sum(totals[0] for totals in totals_by_bucket.values()),
+            sum(totals[1] for totals in totals_by_bucket.values()),
+            sum(totals[2] for totals in totals_by_bucket.values()),
+        ),
+        buckets=[_sales_bucket(key, *totals) for key, totals in totals_by_bucket.items()],
+        products=[
+            schemas.ProductSales(product_name=name, units=units, revenue=round(revenue, 2))
+            for name, units, revenue in products
+        ],
+    )
+
+@router.get("/traffic", response_model=schemas.TrafficReport)
+async def read_traffic(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: DbSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(security.get_current_user)
+):
+    """
+    Storefront views and product clicks for the current user's page, per day
+    between `start` and `end` (inclusive, UTC dates; the last 30 days by
+    default), with clicks per product, most clicked first.
+
+    Workers write their counts every few seconds (TRAFFIC_FLUSH_SECONDS), so
+    the latest traffic shows up with that delay.
+    """
+    start, end = _report_range(start, end)
+
+    page = await run(db, crud.get_page_by_owner_id, owner_id=current_user.id)
+    if not page:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="You do not have a page yet. No traffic to show.",
+        )
+    daily = {day: (views, clicks) for day, views, clicks in await run(
+        db, crud.get_daily_traffic, page_id=page.id, start=start, end=end
+    )}
+    products = await run(db, crud.get_product_clicks, page_id=page.id, start=start, end=end)
+
+    days = [
+        schemas.TrafficDay(day=start + timedelta(days=offset), views=0, clicks=0)
+        for offset in range((end - start).days + 1)
+    ]
+    for traffic_day in days:
+        traffic_day.views, traffic_day.clicks = daily.get(traffic_day.day, (0, 0))
+    return schemas.TrafficReport(
+        start=start,
+        end=end,
+        views=sum(views for views, _ in daily.values()),
+        clicks=sum(clicks for _, clicks in daily.values()),
+        days=days,
+        products=[
+            schemas.ProductClicks(product_id=product_id, product_name=name, clicks=clicks)
+            for product_id, name, clicks in products
+        ],
+    )
@@ -0,0 +1,25 @@
+# File: backend/app/api/endpoints/internal.py
+
+from fastapi import APIRouter, Depends, Response
+
+from ... import database, metrics, security
+
+router = APIRouter(route_class=metrics.TimedRoute, dependencies=[Depends(security.require_internal_token)])
+
+@router.get("/pool")
+async def read_pool_stats():
+    """
+    Connection pool counters for this worker: checkouts, wait time, overflow
+    and invalidations per engine. Each gunicorn worker has its own pool, so
+    sample several times to see every worker.
+    """
+    return {name: stats.snapshot() for name, stats in database.pool_stats.items()}
+
+# Mounted at the root as /metrics, where Prometheus looks by default. Scrape it
+# with the X-Internal-Token header (`http_headers` in the scrape config).
+metrics_router = APIRouter(route_class=metrics.TimedRoute, dependencies=[Depends(security.require_internal_token)])
+
+@metrics_router.get("/metrics")
+def read_metrics():
+    """Prometheus metrics for every gunicorn worker combined."""
+    return Response(metrics.render_metrics(), media_type=metrics.CONTENT_TYPE_LATEST)
@@ -1,26 +1,82 @@
 # File: backend/app/api/endpoints/orders.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+import csv
+import io
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import List, Literal, Optional
 
-from ... import crud, schemas, security
-from ...database import get_db
+import orjson
 
-router = APIRouter()
+from ... import crud, idempotency, ingest, schemas, security
+from ...database import DbSession, get_db, get_read_db, is_replica, run, stream_rows
+from ...limits import RateLimit
+from ...metrics import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
 
 # --- PUBLIC ENDPOINT FOR PLACING AN ORDER ---
-@router.post("/{page_slug}", response_model=schemas.Order, status_code=status.HTTP_201_CREATED)
-def place_order_on_page(
+@router.post(
+    "/{page_slug}",
+    response_model=schemas.Order,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(RateLimit("checkout", page_param="page_slug"))],
+)
+async def place_order_on_page(
     page_slug: str,
     order: schemas.OrderCreate,
-    db: Session = Depends(get_db)
+    db: DbSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None),
 ):
     """
     Public endpoint for a customer to create a new order on a specific page.
+    Products with tracked stock are reserved as part of the order; if any is
+    short, nothing is taken and the response is a 409.
+
+    Clients may send an `Idempotency-Key` header (unique per checkout attempt,
+    up to 255 characters). Retries with the same key and body get the original
+    response back, marked with `Idempotent-Replayed: true`, instead of placing
+    another order. Reusing a key with a different body is a 422; a retry that
+    arrives while the original is still running waits for it, or gets a 409
+    if that takes too long.
     """
+    if idempotency_key is None:
+        return await _create_order(db, page_slug, order)
+    if not idempotency_key or len(idempotency_key) > idempotency.IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1 to {idempotency.IDEMPOTENCY_KEY_MAX_LENGTH} characters.",
+        )
+
+    async def handler():
+        try:
+            db_order = await _create_order(db, page_slug, order)
+        except HTTPException as e:
+            return e.status_code, orjson.dumps({"detail": e.detail})
+        return status.HTTP_201_CREATED, schemas.Order.model_validate(db_order).model_dump_json().encode()
+
+    try:
+        stored, replayed = await idempotency.execute(
+            db, page_slug, idempotency_key, idempotency.fingerprint(order.model_dump_json()), handler
+        )
+    except idempotency.IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="This Idempotency-Key was already used for a different order.",
+        )
+    except idempotency.IdempotencyKeyInProgress:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="An order with this Idempotency-Key is still being processed.",
+            headers={"Retry-After": "1"},
+        )
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(stored.body, status_code=stored.status_code, media_type="application/json", headers=headers)
+
+async def _create_order(db: DbSession, page_slug: str, order: schemas.OrderCreate):
     # First, find the page the customer is ordering from
-    page = crud.get_page_by_slug(db, slug=page_slug)
+    page = await run(db, crud.get_page_by_slug, slug=page_slug)
     if not page:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -28,8 +84,22 @@ def place_order_on_page(
         )
     
     try:
+        if ingest.BATCHED_INGESTION:
+            # Group commit: the order is written with others queued in this
+            # worker. Waiting requests must not hold connections the writer needs.
+            page_id = page.id
+            await run(db, crud.release_connection)
+            return await ingest.order_batcher.submit(page_id, order)
         # Use the CRUD function to create the order
-        return crud.create_order_for_page(db=db, order=order, page_id=page.id)
+        return await run(db, crud.create_order_for_page, order=order, page_id=page.id)
+    except crud.OutOfStockError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except (ingest.OrderQueueFull, ingest.OrderBatchFailed):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Orders cannot be taken right now, please try again.",
+            headers={"Retry-After": "1"},
+        )
     except ValueError as e:
         # This catches errors from our CRUD function, like an invalid product ID
         raise HTTPException(
@@ -40,20 +110,89 @@ def place_order_on_page(
 
 # --- PROTECTED ENDPOINT FOR VIEWING ORDERS ---
 @router.get("/my-orders", response_model=List[schemas.Order])
-def get_my_orders(
-    db: Session = Depends(get_db),
+async def get_my_orders(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: DbSession = Depends(get_read_db),
     current_user: schemas.User = Depends(security.get_current_user)
 ):
     """
-    Protected endpoint for a solopreneur to view all orders for their page.
+    Protected endpoint for a solopreneur to view the orders for their page, newest first.
+
+    Results are paginated: when more orders exist, the `X-Next-Cursor` response
+    header holds the `cursor` to pass for the next page. `since` and `until`
+    restrict the range of `created_at`.
     """
+    try:
+        after = crud.decode_order_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Get the logged-in user's page
-    page = crud.get_page_by_owner_id(db, owner_id=current_user.id)
+    page = await run(db, crud.get_page_by_owner_id, owner_id=current_user.id)
     if not page:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="You do not have a page yet. No orders to show.",
         )
     
-    # Fetch the orders for that page
-    return crud.get_orders_for_page(db=db, page_id=page.id)
\ No newline at end of file
+    # Fetch one extra order to find out whether there is a next page
+    orders = await run(
+        db, crud.get_orders_for_page, page_id=page.id, limit=limit + 1, after=after, since=since, until=until
+    )
+    headers = {}
+    if len(orders) > limit:
+        orders = orders[:limit]
+        headers["X-Next-Cursor"] = crud.encode_order_cursor(orders[-1]["created_at"], orders[-1]["id"])
+    # The rows already have the `schemas.Order` shape, so skip response_model validation
+    return ORJSONResponse(orders, headers=headers)
+
+
+# --- PROTECTED ENDPOINT FOR EXPORTING ORDERS ---
+EXPORT_COLUMNS = [
+    "order_id", "created_at", "customer_name", "customer_phone", "total_price",
+    "item_id", "product_name", "quantity", "price_per_item",
+]
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+async def _export_chunks(page_id: int, format: str, replica: bool):
+    """Encodes each batch from the server-side cursor as soon as it arrives."""
+    if format == "csv":
+        yield (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+    async for rows in stream_rows(crud.order_export_statement(page_id), replica=replica):
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([
+                    value.isoformat() if isinstance(value, datetime) else value for value in row
+                ])
+            yield buffer.getvalue().encode()
+        else:
+            yield b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows)
+
+@router.get("/my-orders/export")
+async def export_my_orders(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    db: DbSession = Depends(get_read_db),
+    current_user: schemas.User = Depends(security.get_current_user)
+):
+    """
+    Protected endpoint that streams a solopreneur's full order history, one
+    line per order item, as NDJSON or CSV. Memory use does not grow with the
+    number of orders.
+    """
+    page = await run(db, crud.get_page_by_owner_id, owner_id=current_user.id)
+    if not page:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="You do not have a page yet. No orders to export.",
+        )
+    filename = f"orders-{page.slug}.{format}"
+    return StreamingResponse(
+        _export_chunks(page.id, format, is_replica(db)),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
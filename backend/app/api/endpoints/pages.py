@@ -1,59 +1,120 @@
 # File: backend/app/api/endpoints/pages.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Optional
 
-from ... import crud, schemas, security
-from ...database import get_db
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 
-router = APIRouter()
+from ... import crud, metrics, schemas, security, snapshots, traffic
+from ...cache import CachedPage, etag_matches, preferred_encoding, storefront_cache
+from ...database import DbSession, get_db, get_read_db, run
+from ...limits import RateLimit
+from ...metrics import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
 
 # --- PROTECTED ENDPOINTS ---
 
 @router.post("/", response_model=schemas.Page, status_code=status.HTTP_201_CREATED)
-def create_page_for_current_user(
+async def create_page_for_current_user(
     page: schemas.PageCreate,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
     current_user: schemas.User = Depends(security.get_current_user)
 ):
-    existing_page = crud.get_page_by_owner_id(db, owner_id=current_user.id)
-    if existing_page:
-        raise HTTPException(
-            status_code=400,
-            detail="User already has a page. Use the update endpoint instead.",
-        )
-    return crud.create_user_page(db=db, page=page, owner_id=current_user.id)
+    try:
+        return await run(db, crud.create_user_page, page=page, owner_id=current_user.id)
+    except crud.PageAlreadyExists as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except crud.SlugTaken as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
 
 @router.get("/me", response_model=schemas.Page)
-def read_current_user_page(
-    db: Session = Depends(get_db),
+async def read_current_user_page(
+    db: DbSession = Depends(get_read_db),
     current_user: schemas.User = Depends(security.get_current_user)
 ):
-    page = crud.get_page_by_owner_id(db, owner_id=current_user.id)
+    page = await run(db, crud.get_page_by_owner_id, owner_id=current_user.id, with_products=True)
     if not page:
         raise HTTPException(status_code=404, detail="Page not found for this user.")
     return page
 
 @router.put("/me", response_model=schemas.Page)
-def update_current_user_page(
+async def update_current_user_page(
     page_update: schemas.PageUpdate,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
     current_user: schemas.User = Depends(security.get_current_user)
 ):
-    db_page = crud.get_page_by_owner_id(db, owner_id=current_user.id)
-    if not db_page:
-        raise HTTPException(status_code=404, detail="Page not found for this user.")
-    return crud.update_user_page(db=db, db_page=db_page, page_update=page_update)
+    try:
+        return await run(db, crud.update_user_page, owner_id=current_user.id, page_update=page_update)
+    except crud.PageNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
 # --- PUBLIC ENDPOINT ---
 # This is new and does not require authentication.
 
-@router.get("/{slug}", response_model=schemas.Page)
-def read_public_page(slug: str, db: Session = Depends(get_db)):
+async def load_storefront(db: DbSession, slug: str) -> Optional[CachedPage]:
     """
-    Fetch a page by its public slug for anyone to view.
+    Loads a page into the storefront cache: its snapshot when that includes
+    every edit, otherwise the page rendered from its tables.
     """
-    db_page = crud.get_page_by_slug(db, slug=slug)
+    version = storefront_cache.version
+    snapshot = await run(db, crud.get_storefront_snapshot, slug=slug)
+    if snapshot is not None and snapshots.is_current(snapshot):
+        if snapshots.needs_render(snapshot):
+            snapshots.snapshot_scheduler.schedule(snapshot.page_id)
+        metrics.STOREFRONT_LOADS.labels("snapshot").inc()
+        return storefront_cache.set(slug, snapshots.from_snapshot(snapshot), version)
+
+    db_page = await run(db, crud.get_page_by_slug, slug=slug, with_products=True)
     if db_page is None:
+        return None
+    if snapshots.needs_render(snapshot):
+        snapshots.snapshot_scheduler.schedule(db_page.id)
+    metrics.STOREFRONT_LOADS.labels("tables").inc()
+    cached = await snapshots.render(db_page, brotli_quality=snapshots.QUICK_BROTLI_QUALITY)
+    return storefront_cache.set(slug, cached, version)
+
+@router.get("/{slug}", response_model=schemas.Page, dependencies=[Depends(RateLimit("storefront", page_param="slug"))])
+async def read_public_page(
+    slug: str,
+    db: DbSession = Depends(get_read_db),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    Fetch a page by its public slug for anyone to view.
+
+    Pages are served from pre-rendered snapshots, cached per slug, already
+    compressed in the best encoding the client accepts. Each encoding carries
+    a strong ETag of its own, so a repeat visitor sending `If-None-Match` gets
+    a 304 without touching the database.
+    """
+    cached = storefront_cache.get(slug) or await load_storefront(db, slug)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Page not found")
-    return db_page
\ No newline at end of file
+    traffic.traffic_counter.view(cached.page_id)
+
+    encoding = preferred_encoding(accept_encoding)
+    etag = cached.etag_for(encoding)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=cached.encoded(encoding), media_type="application/json", headers=headers)
+
+@router.post(
+    "/{slug}/products/{product_id}/clicks",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(RateLimit("storefront", page_param="slug"))],
+)
+async def record_product_click(slug: str, product_id: int, db: DbSession = Depends(get_read_db)):
+    """
+    Counts a visitor's click on a product of the storefront. Counted in
+    memory and written in batches (see app.traffic), so this only reads the
+    database when the storefront is not cached yet.
+    """
+    cached = storefront_cache.get(slug) or await load_storefront(db, slug)
+    if cached is None or product_id not in cached.product_ids:
+        raise HTTPException(status_code=404, detail="Product not found on this page")
+    traffic.traffic_counter.click(cached.page_id, product_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
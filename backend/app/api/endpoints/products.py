@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import codecs
+import csv
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import ValidationError
 
 from ... import crud, schemas, security
-from ...database import get_db
+from ...database import DbSession, get_db, run
+from ...metrics import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
 
-router = APIRouter()
+# Rows per INSERT statement in a bulk import
+BULK_BATCH_SIZE = 500
 
 @router.post("/", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
-def create_product_for_current_user(
+async def create_product_for_current_user(
     product: schemas.ProductCreate,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
     current_user: schemas.User = Depends(security.get_current_user)
 ):
     """
@@ -17,53 +25,164 @@ def create_product_for_current_user(
 
     A user must have created a page before they can add products.
     """
-    # First, get the user's page
-    user_page = crud.get_page_by_owner_id(db, owner_id=current_user.id)
+    try:
+        return await run(db, crud.create_product_for_page, product=product, owner_id=current_user.id)
+    except crud.PageNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+# --- Bulk Import ---
+async def _iter_lines(request: Request):
+    """Decodes the request body as it arrives and yields complete lines."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+async def _iter_csv_records(request: Request):
+    """Yields one dict per CSV record; quoted fields may span lines."""
+    header = None
+    pending = ""
+    async for line in _iter_lines(request):
+        pending += line
+        # An odd number of quotes means a quoted field continues on the next line
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        # Empty cells mean "not provided", so optional columns fall back to their defaults
+        yield {name: value for name, value in zip(header, values) if value != ""}
+
+async def _iter_upload_rows(request: Request):
+    """Yields (row number, raw row or None, parse error or None) for a JSON, NDJSON or CSV upload."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type == "text/csv":
+        row_number = 0
+        async for record in _iter_csv_records(request):
+            row_number += 1
+            yield row_number, record, None
+    elif content_type in ("application/x-ndjson", "application/jsonl"):
+        row_number = 0
+        async for line in _iter_lines(request):
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                yield row_number, orjson.loads(line), None
+            except orjson.JSONDecodeError:
+                yield row_number, None, "Invalid JSON."
+    else:
+        try:
+            rows = orjson.loads(await request.body())
+        except orjson.JSONDecodeError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid JSON.")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array of products.")
+        for row_number, row in enumerate(rows, start=1):
+            yield row_number, row, None
+
+def _describe_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in e.errors()
+    )
+
+@router.post("/bulk", response_model=schemas.ProductImportResult)
+async def import_products_for_current_user(
+    request: Request,
+    db: DbSession = Depends(get_db),
+    current_user: schemas.User = Depends(security.get_current_user)
+):
+    """
+    Create or update many products for the current user's page in one request.
+
+    Accepts a JSON array, NDJSON (`application/x-ndjson`) or CSV (`text/csv`,
+    with a `name,description,price[,id]` header). Rows with an `id` update that
+    product; rows without one create a new product. Rows are validated as they
+    stream in and written in batches inside a single transaction. Invalid rows
+    are reported in `errors` and do not stop the rest of the import.
+    """
+    user_page = await run(db, crud.get_page_by_owner_id, owner_id=current_user.id)
     if not user_page:
         raise HTTPException(
             status_code=404,
             detail="You must create a page before adding products.",
         )
-    # If the page exists, create the product for that page
-    return crud.create_product_for_page(db=db, product=product, page_id=user_page.id)
+    page_id = user_page.id
+
+    created, updated, errors = 0, 0, []
+    batch: list[tuple[int, schemas.ProductImportRow]] = []
+
+    async def flush():
+        nonlocal created, updated
+        batch_created, batch_updated, batch_errors = await run(
+            db, crud.upsert_products, page_id=page_id, rows=batch
+        )
+        created += batch_created
+        updated += batch_updated
+        errors.extend(batch_errors)
+        batch.clear()
+
+    async for row_number, raw_row, parse_error in _iter_upload_rows(request):
+        if parse_error:
+            errors.append({"row": row_number, "error": parse_error})
+            continue
+        try:
+            batch.append((row_number, schemas.ProductImportRow.model_validate(raw_row)))
+        except ValidationError as e:
+            errors.append({"row": row_number, "error": _describe_validation_error(e)})
+            continue
+        if len(batch) >= BULK_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+
+    await run(db, crud.commit_product_import, page_id=page_id)
+    errors.sort(key=lambda error: error["row"])
+    return {"created": created, "updated": updated, "errors": errors}
 
 @router.put("/{product_id}", response_model=schemas.Product)
-def update_user_product(
+async def update_user_product(
     product_id: int,
     product_update: schemas.ProductUpdate,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
     current_user: schemas.User = Depends(security.get_current_user)
 ):
     """
     Update a product belonging to the current user.
     """
-    db_product = crud.get_product(db, product_id=product_id)
-    # Security Check 1: Does the product exist?
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found.")
-    
-    # Security Check 2: Does this product belong to the current user?
-    if db_product.page.owner_id != current_user.id:
+    # The ownership check is part of the UPDATE itself
+    try:
+        return await run(
+            db, crud.update_product, product_id=product_id, owner_id=current_user.id, product_update=product_update
+        )
+    except crud.ProductNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except crud.ProductNotOwned:
         raise HTTPException(status_code=403, detail="Not authorized to update this product.")
-        
-    return crud.update_product(db=db, db_product=db_product, product_update=product_update)
 
 @router.delete("/{product_id}", response_model=schemas.Product)
-def delete_user_product(
+async def delete_user_product(
     product_id: int,
-    db: Session = Depends(get_db),
+    db: DbSession = Depends(get_db),
     current_user: schemas.User = Depends(security.get_current_user)
 ):
     """
     Delete a product belonging to the current user.
     """
-    db_product = crud.get_product(db, product_id=product_id)
-    # Security Check 1: Does the product exist?
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found.")
-        
-    # Security Check 2: Does this product belong to the current user?
-    if db_product.page.owner_id != current_user.id:
+    # The ownership check is part of the DELETE itself
+    try:
+        return await run(db, crud.delete_product, product_id=product_id, owner_id=current_user.id)
+    except crud.ProductNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except crud.ProductNotOwned:
         raise HTTPException(status_code=403, detail="Not authorized to delete this product.")
-        
-    return crud.delete_product(db=db, db_product=db_product)
\ No newline at end of file
@@ -1,68 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
 
-from ... import crud, schemas, security
-from ...database import get_db
+from ... import crud, metrics, schemas, security
+from ...database import DbSession, get_db, run
+from ...metrics import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+logger = logging.getLogger(__name__)
 
 # --- User Registration (Existing) ---
 @router.post("/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-def create_new_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered",
-        )
-    return crud.create_user(db=db, user=user)
+async def create_new_user(user: schemas.UserCreate, db: DbSession = Depends(get_db)):
+    # Look the email up before hashing so a taken address never costs a bcrypt
+    # round; the unique index on email still settles two sign-ups racing past it
+    if await run(db, crud.get_user_by_email, email=user.email):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+    hashed_password = await security.get_password_hash(user.password)
+    try:
+        return await run(db, crud.create_user, user=user, hashed_password=hashed_password)
+    except crud.EmailAlreadyRegistered as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-# --- User Login (UPDATED WITH DEBUGGING) ---
+# --- User Login ---
+# Never log the submitted password or the stored hash; emails are left out too.
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    
-    # --- DEBUGGING STEP 1: Print what we received from the user ---
-    print("--- LOGIN ATTEMPT ---")
-    print(f"Username received: '{form_data.username}'")
-    print(f"Password received: '{form_data.password}'")
-    
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: DbSession = Depends(get_db)):
     # --- Look up the user in the database ---
-    user = crud.get_user_by_email(db, email=form_data.username)
-    
-    # --- DEBUGGING STEP 2: Check if the user was found ---
+    user = await run(db, crud.get_user_by_email, email=form_data.username)
     if not user:
-        print("DEBUG: User not found in the database.")
+        logger.info("login failed", extra={"reason": "unknown_email"})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    print(f"DEBUG: User '{user.email}' found in the database.")
-    print(f"DEBUG: Hashed password from DB: '{user.hashed_password}'")
-    
+
     # --- Verify the password ---
-    is_password_correct = security.verify_password(form_data.password, user.hashed_password)
-    
-    # --- DEBUGGING STEP 3: Check if the password verification was successful ---
-    print(f"DEBUG: Password verification result: {is_password_correct}")
-    
+    # bcrypt can queue for seconds behind other logins; the pooled connection
+    # goes back first instead of being held idle all that time
+    user_id, email, hashed_password = user.id, user.email, user.hashed_password
+    version = security.credential_version(user)
+    await run(db, crud.release_connection)
+    is_password_correct, new_hash = await security.verify_password(form_data.password, hashed_password)
     if not is_password_correct:
-        print("DEBUG: Password verification FAILED.")
+        logger.info("login failed", extra={"reason": "wrong_password", "user_id": user_id})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
     # --- If everything is correct, create and return the token ---
-    print("DEBUG: Password verification SUCCEEDED. Generating token.")
-    access_token = security.create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    logger.info("login succeeded", extra={"user_id": user_id, "rehashed": new_hash is not None})
+    access_token = security.create_user_access_token(user_id=user_id, email=email, credential_version=version)
+
+    # --- Transparently upgrade hashes made under an older cost policy ---
+    # Same password, so the credential version and the user's sessions stay
+    if new_hash:
+        await run(db, crud.rehash_user_password, user_id=user_id, hashed_password=new_hash)
+
+    # --- Start a refresh token family; its first id doubles as the family id ---
+    token_id, refresh_token = security.new_refresh_token()
+    await run(
+        db,
+        crud.create_refresh_token,
+        token_id=token_id,
+        family_id=token_id,
+        user_id=user_id,
+        credential_version=version,
+        expires_at=security.refresh_token_expiry(),
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+# --- Token Refresh ---
+def _refresh_rejected(outcome: str) -> HTTPException:
+    metrics.AUTH_TOKEN_REFRESHES.labels(outcome).inc()
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+@router.post("/token/refresh", response_model=schemas.Token)
+async def refresh_access_token(body: schemas.RefreshTokenRequest, db: DbSession = Depends(get_db)):
+    """
+    Trades a refresh token for a new access token and a new refresh token,
+    without a password check. Each refresh token works once; using one twice
+    ends the session it belongs to, as does a password change.
+    """
+    token_id = security.refresh_token_id(body.refresh_token)
+    if token_id is None:
+        raise _refresh_rejected("invalid")
+    new_token_id, refresh_token = security.new_refresh_token()
+    try:
+        user = await run(
+            db,
+            crud.rotate_refresh_token,
+            token_id=token_id,
+            new_token_id=new_token_id,
+            expires_at=security.refresh_token_expiry(),
+            credential_version=security.credential_version,
+        )
+    except crud.RefreshTokenReused:
+        logger.warning("refresh token reused, session revoked")
+        raise _refresh_rejected("reused")
+    except crud.RefreshTokenOutdated:
+        raise _refresh_rejected("password_changed")
+    except crud.RefreshTokenRejected:
+        raise _refresh_rejected("invalid")
+
+    metrics.AUTH_TOKEN_REFRESHES.labels("renewed").inc()
+    metrics.PASSWORD_VERIFICATIONS_AVOIDED.inc()
+    logger.info("session renewed", extra={"user_id": user.id})
+    access_token = security.create_user_access_token(
+        user_id=user.id, email=user.email, credential_version=security.credential_version(user)
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: schemas.RefreshTokenRequest, db: DbSession = Depends(get_db)):
+    """
+    Ends the session the refresh token belongs to. Access tokens already
+    issued stay valid until they expire.
+    """
+    token_id = security.refresh_token_id(body.refresh_token)
+    if token_id is not None:
+        await run(db, crud.revoke_refresh_token_family, token_id=token_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 # --- Get Current User (Existing) ---
 @router.get("/me", response_model=schemas.User)
-def read_users_me(current_user: schemas.User = Depends(security.get_current_user)):
+async def read_users_me(current_user: schemas.User = Depends(security.get_current_user)):
     return current_user
\ No newline at end of file
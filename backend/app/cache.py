@@ -0,0 +1,219 @@
+# File: backend/app/cache.py
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import orjson
+
+# --- Generic in-process cache ---
+class TTLCache:
+    """
+    A small thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Entries are evicted least-recently-used first once either `max_entries`
+    or the total `max_size` (as reported by `sizeof`) is exceeded.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_size: int | None = None, sizeof=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_size = max_size
+        self._sizeof = sizeof or (lambda value: 1)
+        self._entries: OrderedDict = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = self._sizeof(value)
+        if self.max_size is not None and size > self.max_size:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, size)
+            self._size += size
+            while len(self._entries) > self.max_entries or (
+                self.max_size is not None and self._size > self.max_size
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                return self._remove(key)
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, value, size = self._entries.pop(key)
+        self._size -= size
+        return value
+
+
+# --- Public storefront cache ---
+class CachedPage:
+    """
+    An already-serialized `schemas.Page` body, its gzip and brotli copies and
+    its strong ETag. Each encoding is a separate representation with an ETag of
+    its own, taken from `etag_for`.
+    """
+
+    __slots__ = ("page_id", "body", "body_gzip", "body_br", "etag", "_product_ids")
+
+    def __init__(self, page_id: int, body: bytes, body_gzip: bytes, body_br: bytes, etag: str | None = None):
+        self.page_id = page_id
+        self.body = body
+        self.body_gzip = body_gzip
+        self.body_br = body_br
+        self.etag = etag or '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self._product_ids = None
+
+    @property
+    def product_ids(self) -> frozenset:
+        """Ids of the products on the page, read from the body the first time they are needed."""
+        if self._product_ids is None:
+            self._product_ids = frozenset(product["id"] for product in orjson.loads(self.body)["products"])
+        return self._product_ids
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.body_gzip) + len(self.body_br)
+
+    def encoded(self, encoding: str | None) -> bytes:
+        """The body in `encoding` ("br", "gzip" or None for identity)."""
+        if encoding == "br":
+            return self.body_br
+        if encoding == "gzip":
+            return self.body_gzip
+        return self.body
+
+    def etag_for(self, encoding: str | None) -> str:
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+
+class StorefrontCache:
+    """
+    Caches public storefront responses by slug.
+
+    The cache is per process: a write handled by one gunicorn worker drops the
+    entry in that worker only, so the TTL bounds how long other workers can
+    serve a stale storefront.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, max_entries: int = 10_000):
+        self._pages = TTLCache(
+            max_entries=max_entries, ttl=ttl, max_size=max_bytes, sizeof=lambda page: page.size
+        )
+        self._slugs_by_page_id: dict[int, str] = {}
+        self._version = 0
+        # Called with a page id after every change to that page; app.snapshots
+        # sets it to schedule a new snapshot
+        self.on_change = None
+
+    @property
+    def version(self) -> int:
+        """Bumped on every invalidation; read it before loading a page from the database."""
+        return self._version
+
+    def get(self, slug: str) -> CachedPage | None:
+        return self._pages.get(slug)
+
+    def set(self, slug: str, cached: CachedPage, version: int) -> CachedPage:
+        """Stores a page unless an invalidation happened since `version` was read."""
+        if version == self._version:
+            self._pages.set(slug, cached)
+            self._slugs_by_page_id[cached.page_id] = slug
+        return cached
+
+    def invalidate(self, page_id: int):
+        self._version += 1
+        slug = self._slugs_by_page_id.pop(page_id, None)
+        if slug is not None:
+            self._pages.pop(slug)
+        self.changed(page_id)
+
+    def changed(self, page_id: int):
+        """
+        Reports a change that may stay visible in cached copies until the page
+        is next rendered, such as its stock levels after a checkout.
+        """
+        if self.on_change is not None:
+            self.on_change(page_id)
+
+    def clear(self):
+        self._pages.clear()
+        self._slugs_by_page_id.clear()
+
+
+STOREFRONT_CACHE_TTL_SECONDS = float(os.getenv("STOREFRONT_CACHE_TTL_SECONDS", "30"))
+STOREFRONT_CACHE_MAX_BYTES = int(os.getenv("STOREFRONT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+storefront_cache = StorefrontCache(max_bytes=STOREFRONT_CACHE_MAX_BYTES, ttl=STOREFRONT_CACHE_TTL_SECONDS)
+
+
+# --- Authenticated principals ---
+# user id -> (schemas.User, credential version), filled by `security.get_current_user`.
+# Per process like the storefront cache: after a password change, other workers
+# keep accepting old tokens for at most AUTH_CACHE_TTL_SECONDS.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+principal_cache = TTLCache(max_entries=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+
+
+# --- Idempotent responses ---
+# (page slug, Idempotency-Key) -> idempotency.StoredResponse, in front of the
+# idempotency_keys table so a retry hitting the same worker skips the database.
+IDEMPOTENCY_CACHE_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_CACHE_TTL_SECONDS", "600"))
+IDEMPOTENCY_CACHE_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", "10000"))
+
+idempotency_cache = TTLCache(max_entries=IDEMPOTENCY_CACHE_MAX_ENTRIES, ttl=IDEMPOTENCY_CACHE_TTL_SECONDS)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Checks an `If-None-Match` header value against a strong ETag."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def preferred_encoding(accept_encoding: str | None) -> str | None:
+    """Picks "br" or "gzip" from an `Accept-Encoding` header, brotli first; None means identity."""
+    if not accept_encoding:
+        return None
+    accepted, refused = set(), set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        weight = params.strip().removeprefix("q=")
+        try:
+            refuse = bool(params) and float(weight) <= 0
+        except ValueError:
+            refuse = False
+        (refused if refuse else accepted).add(coding.strip())
+    for coding in ("br", "gzip"):
+        if coding in accepted or ("*" in accepted and coding not in refused):
+            return coding
+    return None
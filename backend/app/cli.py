@@ -0,0 +1,122 @@
+# File: backend/app/cli.py
+#
+# Maintenance commands, run from backend/ as `python -m app.cli <command>`.
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from sqlalchemy import inspect
+
+from . import crud
+from .database import SessionLocal, engine
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --- Migrations ---
+# The schema that create_all produced before migrations existed
+BASELINE_REVISION = "0001"
+
+def _alembic_config():
+    from alembic.config import Config
+    return Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+
+def upgrade_database(revision: str = "head"):
+    """
+    Applies migrations up to `revision`. A database that predates migrations
+    (tables present, no alembic_version) is stamped with the baseline first.
+    """
+    from alembic import command
+
+    config = _alembic_config()
+    tables = inspect(engine).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, revision)
+
+def migrate(args):
+    """Upgrades the database schema to the latest migration."""
+    upgrade_database(args.revision)
+
+# --- Sales rollups ---
+def rebuild_rollups(args):
+    """Recomputes the daily sales rollups from the orders table."""
+    with SessionLocal() as db:
+        scanned = crud.rebuild_sales_rollups(db, page_id=args.page_id)
+    target = f"page {args.page_id}" if args.page_id is not None else "all pages"
+    print(f"Rebuilt sales rollups for {target} from {scanned} orders.")
+
+# --- Idempotency keys ---
+def purge_idempotency_keys(args):
+    """Deletes expired Idempotency-Key records; run it from a daily job."""
+    with SessionLocal() as db:
+        purged = crud.purge_expired_idempotency_keys(db)
+    print(f"Purged {purged} expired idempotency keys.")
+
+# --- Refresh tokens ---
+def purge_refresh_tokens(args):
+    """Deletes expired refresh tokens; run it from a daily job."""
+    with SessionLocal() as db:
+        purged = crud.purge_expired_refresh_tokens(db)
+    print(f"Purged {purged} expired refresh tokens.")
+
+# --- Start-up profile ---
+def profile_startup(args):
+    """Reports how long a fresh interpreter takes to import app.main, per module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(result.stderr)
+
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    total_us = next(cumulative for name, _, cumulative in modules if name.strip() == "app.main")
+    by_package = defaultdict(int)
+    for name, self_us, _ in modules:
+        by_package[name.strip().split(".")[0]] += self_us
+
+    print(f"import app.main: {total_us / 1000:.1f} ms across {len(modules)} modules\n")
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(modules, key=lambda m: m[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}  {name.strip()}")
+    print(f"\n{'self ms':>9}  package")
+    for package, self_us in sorted(by_package.items(), key=lambda p: p[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:>9.1f}  {package}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    upgrade = commands.add_parser("migrate", help=migrate.__doc__)
+    upgrade.add_argument("revision", nargs="?", default="head")
+    upgrade.set_defaults(handler=migrate)
+
+    rebuild = commands.add_parser("rebuild-rollups", help=rebuild_rollups.__doc__)
+    rebuild.add_argument("--page-id", type=int, help="only rebuild this page's rollups")
+    rebuild.set_defaults(handler=rebuild_rollups)
+
+    purge = commands.add_parser("purge-idempotency-keys", help=purge_idempotency_keys.__doc__)
+    purge.set_defaults(handler=purge_idempotency_keys)
+
+    purge_tokens = commands.add_parser("purge-refresh-tokens", help=purge_refresh_tokens.__doc__)
+    purge_tokens.set_defaults(handler=purge_refresh_tokens)
+
+    profile = commands.add_parser("profile-startup", help=profile_startup.__doc__)
+    profile.add_argument("--top", type=int, default=25, help="how many modules and packages to list")
+    profile.set_defaults(handler=profile_startup)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,117 +1,1004 @@
 # File: backend/app/crud.py
 
+import base64
+import json
 import re
-from sqlalchemy.orm import Session
-from . import models, schemas, security
+from collections.abc import Callable
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import and_, case, cast, delete, func, insert, literal, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, aliased, selectinload
+from . import models, schemas
+from .cache import principal_cache, storefront_cache
 
 # --- User CRUD (Existing) ---
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = security.get_password_hash(user.password)
-    db_user = models.User(email=user.email, hashed_password=hashed_password)
+def get_user(db: Session, user_id: int):
+    return db.query(models.User).filter(models.User.id == user_id).first()
+
+class EmailAlreadyRegistered(ValueError):
+    """Another user signed up with this email first."""
+
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
+    """
+    Inserts the user with one INSERT ... RETURNING and returns the new row.
+    Callers check the email first; the unique index on email settles two
+    sign-ups racing past that check, raising EmailAlreadyRegistered.
+    """
+    User = models.User
+    stmt = _dialect_insert(db)(User).values(email=user.email, hashed_password=hashed_password)
+    db_user = db.execute(
+        stmt.on_conflict_do_nothing().returning(User.id, User.email, User.hashed_password, User.credential_version)
+    ).first()
+    if db_user is None:
+        db.rollback()
+        raise EmailAlreadyRegistered("Email already registered")
+    db.commit()
+    return db_user
+
+def update_user_password(db: Session, db_user: models.User, hashed_password: str):
+    """A password change: bumps the credential version, which ends the user's sessions."""
+    user_id = db_user.id
+    db_user.hashed_password = hashed_password
+    db_user.credential_version = models.User.credential_version + 1
     db.add(db_user)
     db.commit()
-    db.refresh(db_user)
+    principal_cache.pop(user_id)
     return db_user
 
+def rehash_user_password(db: Session, user_id: int, hashed_password: str):
+    """Stores a new hash of the same password, e.g. under a new cost policy; sessions stay valid."""
+    db.execute(update(models.User).where(models.User.id == user_id).values(hashed_password=hashed_password))
+    db.commit()
+
 # --- Page CRUD (Existing) ---
 def _generate_slug(title: str) -> str:
     s = title.lower().strip()
     s = re.sub(r'[\s\W-]+', '-', s)
     return s
 
-def get_page_by_owner_id(db: Session, owner_id: int):
-    return db.query(models.Page).filter(models.Page.owner_id == owner_id).first()
+def get_page_by_owner_id(db: Session, owner_id: int, with_products: bool = False):
+    query = db.query(models.Page).filter(models.Page.owner_id == owner_id)
+    if with_products:
+        query = query.options(selectinload(models.Page.products))
+    return query.first()
+
+class PageNotFound(ValueError):
+    """The user has not created a page yet."""
+
+class PageAlreadyExists(ValueError):
+    """The user already has a page; each user gets one."""
+
+class SlugTaken(ValueError):
+    """Another page already has the slug this title turns into."""
+
+def _page_columns():
+    Page = models.Page
+    return Page.id, Page.slug, Page.title, Page.description, Page.owner_id
+
+def _product_columns():
+    Product = models.Product
+    return Product.id, Product.name, Product.description, Product.price, Product.stock, Product.page_id
 
 def create_user_page(db: Session, page: schemas.PageCreate, owner_id: int):
-    slug = _generate_slug(page.title)
-    if db.query(models.Page).filter(models.Page.slug == slug).first():
-        raise ValueError("Page with this title already exists, creating a duplicate slug.")
-    db_page = models.Page(**page.model_dump(), owner_id=owner_id, slug=slug)
-    db.add(db_page)
+    """
+    Inserts the page with one INSERT ... RETURNING; the unique indexes on slug
+    and owner_id turn duplicates away, and only then is the reason looked up.
+    Returns the page's columns (a new page has no products). Raises
+    PageAlreadyExists or SlugTaken.
+    """
+    Page = models.Page
+    stmt = _dialect_insert(db)(Page).values(**page.model_dump(), owner_id=owner_id, slug=_generate_slug(page.title))
+    db_page = db.execute(stmt.on_conflict_do_nothing().returning(*_page_columns())).first()
+    if db_page is None:
+        db.rollback()
+        if db.scalar(select(Page.id).where(Page.owner_id == owner_id)) is not None:
+            raise PageAlreadyExists("User already has a page. Use the update endpoint instead.")
+        raise SlugTaken("Page with this title already exists, creating a duplicate slug.")
     db.commit()
-    db.refresh(db_page)
     return db_page
 
-def update_user_page(db: Session, db_page: models.Page, page_update: schemas.PageUpdate):
+def update_user_page(db: Session, owner_id: int, page_update: schemas.PageUpdate):
+    """
+    Updates the owner's page with one UPDATE ... RETURNING, without loading it
+    first. Returns a dict shaped like `schemas.Page`, products included, or
+    raises PageNotFound.
+    """
+    Page = models.Page
     update_data = page_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_page, key, value)
-    db.add(db_page)
+    if not update_data:
+        db_page = db.execute(select(*_page_columns()).where(Page.owner_id == owner_id)).first()
+    else:
+        db_page = db.execute(
+            update(Page)
+            .where(Page.owner_id == owner_id)
+            .values(**update_data)
+            .returning(*_page_columns())
+            .execution_options(synchronize_session=False)
+        ).first()
+    if db_page is None:
+        db.rollback()
+        raise PageNotFound("Page not found for this user.")
+    products = db.execute(
+        select(*_product_columns()).where(models.Product.page_id == db_page.id).order_by(models.Product.id)
+    ).mappings().all()
+    if update_data:
+        mark_storefront_dirty(db, db_page.id)
     db.commit()
-    db.refresh(db_page)
-    return db_page
+    if update_data:
+        storefront_cache.invalidate(db_page.id)
+    return {**db_page._asdict(), "products": products}
 
-def get_page_by_slug(db: Session, slug: str):
-    return db.query(models.Page).filter(models.Page.slug == slug).first()
+def get_recently_ordered_page_slugs(db: Session, limit: int) -> list[str]:
+    """Slugs of up to `limit` pages among those with the most recent orders."""
+    recent_orders = (
+        select(models.Order.page_id).order_by(models.Order.id.desc()).limit(limit * 20).subquery()
+    )
+    return list(db.scalars(
+        select(models.Page.slug).where(models.Page.id.in_(select(recent_orders.c.page_id))).limit(limit)
+    ))
+
+def get_page_by_slug(db: Session, slug: str, with_products: bool = False):
+    query = db.query(models.Page).filter(models.Page.slug == slug)
+    if with_products:
+        query = query.options(selectinload(models.Page.products))
+    return query.first()
+
+def get_page_by_id(db: Session, page_id: int):
+    """Fetches a page together with its products."""
+    return (
+        db.query(models.Page)
+        .options(selectinload(models.Page.products))
+        .filter(models.Page.id == page_id)
+        .first()
+    )
 
 # --- Product CRUD (Existing) ---
-def create_product_for_page(db: Session, product: schemas.ProductCreate, page_id: int):
-    db_product = models.Product(**product.model_dump(), page_id=page_id)
-    db.add(db_product)
+def create_product_for_page(db: Session, product: schemas.ProductCreate, owner_id: int):
+    """
+    Adds a product to the owner's page with one INSERT ... SELECT ... RETURNING:
+    the page id comes from the owner inside the statement, so the page is not
+    looked up first. Raises PageNotFound when the owner has no page yet.
+    """
+    Product = models.Product
+    values = product.model_dump()
+    columns = Product.__table__.c
+    # Cast, so PostgreSQL does not read untyped parameters (a NULL stock) as text
+    source = select(
+        *(cast(literal(value), columns[key].type) for key, value in values.items()), models.Page.id
+    ).where(models.Page.owner_id == owner_id)
+    db_product = db.execute(
+        insert(Product.__table__).from_select([*values, "page_id"], source).returning(*_product_columns())
+    ).first()
+    if db_product is None:
+        db.rollback()
+        raise PageNotFound("You must create a page before adding products.")
+    mark_storefront_dirty(db, db_product.page_id)
     db.commit()
-    db.refresh(db_product)
+    storefront_cache.invalidate(db_product.page_id)
     return db_product
 
-def get_product(db: Session, product_id: int):
-    return db.query(models.Product).filter(models.Product.id == product_id).first()
+def _dialect_insert(db: Session):
+    """The backend's own `insert()` construct, which supports `ON CONFLICT`."""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
 
-def update_product(db: Session, db_product: models.Product, product_update: schemas.ProductUpdate):
+def upsert_products(db: Session, page_id: int, rows: list[tuple[int, schemas.ProductImportRow]]):
+    """
+    Writes one batch of a bulk import without committing, so a whole import
+    runs in a single transaction; finish it with `commit_product_import`.
+
+    New products go in with one multi-row INSERT; rows with an `id` become one
+    INSERT ... ON CONFLICT (id) DO UPDATE limited to this page's products.
+    Returns (created, updated, errors), where errors are per-row dicts.
+    """
+    Product = models.Product
+    errors = []
+    requested_ids = {item.id for _, item in rows if item.id is not None}
+    owned_ids = set()
+    if requested_ids:
+        owned_ids = set(db.scalars(
+            select(Product.id).where(Product.page_id == page_id, Product.id.in_(requested_ids))
+        ))
+
+    new_rows = []
+    # Keyed by id: one statement cannot update the same row twice, so the last row wins
+    updates: dict[int, dict] = {}
+    for row_number, item in rows:
+        values = {**item.model_dump(exclude={"id"}), "page_id": page_id}
+        if item.id is None:
+            new_rows.append(values)
+        elif item.id in owned_ids:
+            updates[item.id] = {**values, "id": item.id}
+        else:
+            errors.append({"row": row_number, "error": f"Product with ID {item.id} is invalid for this page."})
+
+    dialect_insert = _dialect_insert(db)
+    if new_rows:
+        db.execute(dialect_insert(Product.__table__).values(new_rows))
+    if updates:
+        stmt = dialect_insert(Product.__table__).values(list(updates.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.id],
+            set_={column: stmt.excluded[column] for column in ("name", "description", "price")},
+            where=Product.page_id == stmt.excluded.page_id,
+        )
+        db.execute(stmt)
+    return len(new_rows), len(updates), errors
+
+def commit_product_import(db: Session, page_id: int):
+    mark_storefront_dirty(db, page_id)
+    db.commit()
+    storefront_cache.invalidate(page_id)
+
+class ProductNotFound(ValueError):
+    """No product has this id."""
+
+class ProductNotOwned(ValueError):
+    """The product is on another user's page."""
+
+def _owned_by(owner_id: int):
+    """Matches products on the owner's page, as part of the write's own WHERE clause."""
+    Page = models.Page
+    return models.Product.page_id == select(Page.id).where(Page.owner_id == owner_id).scalar_subquery()
+
+def _product_write_failed(db: Session, product_id: int):
+    """Works out why a write matched no row, only once it has: a missing product or someone else's."""
+    db.rollback()
+    if db.scalar(select(models.Product.id).where(models.Product.id == product_id)) is None:
+        raise ProductNotFound("Product not found.")
+    raise ProductNotOwned("Product belongs to another user's page.")
+
+def update_product(db: Session, product_id: int, owner_id: int, product_update: schemas.ProductUpdate):
+    """
+    Updates a product on the owner's page with one UPDATE ... RETURNING, the
+    ownership check included. Raises ProductNotFound or ProductNotOwned.
+    """
+    Product = models.Product
     update_data = product_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_product, key, value)
-    db.add(db_product)
+    if not update_data:
+        db_product = db.execute(
+            select(*_product_columns()).where(Product.id == product_id, _owned_by(owner_id))
+        ).first()
+    else:
+        db_product = db.execute(
+            update(Product)
+            .where(Product.id == product_id, _owned_by(owner_id))
+            .values(**update_data)
+            .returning(*_product_columns())
+            .execution_options(synchronize_session=False)
+        ).first()
+    if db_product is None:
+        _product_write_failed(db, product_id)
+    if update_data:
+        mark_storefront_dirty(db, db_product.page_id)
     db.commit()
-    db.refresh(db_product)
+    if update_data:
+        storefront_cache.invalidate(db_product.page_id)
     return db_product
 
-def delete_product(db: Session, db_product: models.Product):
-    db.delete(db_product)
+def delete_product(db: Session, product_id: int, owner_id: int):
+    """
+    Deletes a product on the owner's page with one DELETE ... RETURNING and
+    returns the deleted row. Raises ProductNotFound or ProductNotOwned.
+    """
+    Product = models.Product
+    db_product = db.execute(
+        delete(Product)
+        .where(Product.id == product_id, _owned_by(owner_id))
+        .returning(*_product_columns())
+        .execution_options(synchronize_session=False)
+    ).first()
+    if db_product is None:
+        _product_write_failed(db, product_id)
+    mark_storefront_dirty(db, db_product.page_id)
     db.commit()
+    storefront_cache.invalidate(db_product.page_id)
     return db_product
 
 # --- NEW FUNCTIONS FOR ORDERS ---
 
-def get_orders_for_page(db: Session, page_id: int):
-    """Fetches all orders for a specific page, newest first."""
-    return db.query(models.Order).filter(models.Order.page_id == page_id).order_by(models.Order.id.desc()).all()
+def encode_order_cursor(created_at: datetime, order_id: int) -> str:
+    """Builds the opaque cursor pointing just past the given order in the order history."""
+    raw = json.dumps([created_at.isoformat(), order_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-def create_order_for_page(db: Session, order: schemas.OrderCreate, page_id: int):
-    """Creates a new order, calculating total price and linking items."""
-    total_price = 0.0
-    order_items_to_create = []
+def decode_order_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, order_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+def get_orders_for_page(
+    db: Session,
+    page_id: int,
+    limit: int | None = None,
+    after: tuple[datetime, int] | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """
+    Fetches orders for a specific page, newest first, with their items loaded in one extra query.
 
-    # Loop through the items from the incoming order data
+    Returns plain dicts shaped like `schemas.Order`, built straight from column
+    tuples: order history is the largest payload we serve, and skipping ORM
+    objects and per-row Pydantic models is most of the cost of serving it.
+
+    Pagination is keyset-based over `(created_at, id)`: `after` is the key of the
+    last order already returned, so every page is a range scan on
+    `ix_orders_page_id_created_at_id` regardless of how deep it is.
+    """
+    Order, OrderItem = models.Order, models.OrderItem
+    query = (
+        db.query(Order.id, Order.customer_name, Order.customer_phone, Order.total_price, Order.created_at)
+        .filter(Order.page_id == page_id)
+    )
+    if since is not None:
+        query = query.filter(Order.created_at >= since)
+    if until is not None:
+        query = query.filter(Order.created_at < until)
+    if after is not None:
+        query = query.filter(tuple_(Order.created_at, Order.id) < tuple_(*after))
+    query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+
+    orders = [
+        {
+            "id": order_id,
+            "customer_name": customer_name,
+            "customer_phone": customer_phone,
+            "total_price": total_price,
+            "created_at": created_at,
+            "items": [],
+        }
+        for order_id, customer_name, customer_phone, total_price, created_at in query
+    ]
+    orders_by_id = {order["id"]: order for order in orders}
+    if orders_by_id:
+        item_rows = (
+            db.query(OrderItem.order_id, OrderItem.id, OrderItem.product_name, OrderItem.quantity, OrderItem.price_per_item)
+            .filter(OrderItem.order_id.in_(orders_by_id))
+            .order_by(OrderItem.id)
+        )
+        for order_id, item_id, product_name, quantity, price_per_item in item_rows:
+            orders_by_id[order_id]["items"].append({
+                "id": item_id,
+                "product_name": product_name,
+                "quantity": quantity,
+                "price_per_item": price_per_item,
+            })
+    return orders
+
+def order_export_statement(page_id: int):
+    """
+    One row per order item (orders without items get a single row with empty
+    item columns), newest order first. Meant for `database.stream_rows`.
+    """
+    Order, OrderItem = models.Order, models.OrderItem
+    return (
+        select(
+            Order.id.label("order_id"),
+            Order.created_at,
+            Order.customer_name,
+            Order.customer_phone,
+            Order.total_price,
+            OrderItem.id.label("item_id"),
+            OrderItem.product_name,
+            OrderItem.quantity,
+            OrderItem.price_per_item,
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.page_id == page_id)
+        .order_by(Order.created_at.desc(), Order.id.desc(), OrderItem.id)
+    )
+
+def get_products_for_update(db: Session, product_ids: list[int]):
+    """
+    Fetches several products in one `IN (...)` query, locking their rows until
+    the transaction ends where the backend supports `SELECT ... FOR UPDATE`
+    (SQLite ignores the clause). Rows are locked in id order to avoid deadlocks.
+    """
+    return (
+        db.query(models.Product)
+        .filter(models.Product.id.in_(product_ids))
+        .order_by(models.Product.id)
+        .with_for_update()
+        .all()
+    )
+
+class OutOfStockError(ValueError):
+    """The order asks for more units of a product than are left."""
+
+def _reserve_stock(db: Session, quantities: dict[int, int], products: dict) -> bool:
+    """
+    Takes the ordered quantities off every stock-tracked product in the cart
+    with one conditional UPDATE, all or nothing: no row changes unless every
+    line has enough stock. The check happens inside the statement, so two
+    buyers can never both take the last unit. Raises OutOfStockError; returns
+    whether any stock was taken.
+
+    Quantities must be positive: a negative one would put stock back. The API
+    schema rejects them already; this covers direct callers and the ingest path.
+    """
+    if not quantities or any(quantity <= 0 for quantity in quantities.values()):
+        raise ValueError("An order needs at least one item, and every quantity must be positive.")
+    tracked = {product_id: quantity for product_id, quantity in quantities.items()
+               if products[product_id].stock is not None}
+    if not tracked:
+        return False
+    # Turn away sold-out carts without the UPDATE, so once a drop sells out
+    # checkouts stop queueing for the write lock. Only the UPDATE can succeed.
+    if any(products[product_id].stock < quantity for product_id, quantity in tracked.items()):
+        raise OutOfStockError("Not enough stock left for one or more products in this order.")
+    Product = models.Product
+    other = aliased(Product)
+    shortfall = (
+        select(other.id)
+        .where(other.id.in_(tracked), other.stock < case(tracked, value=other.id))
+        .exists()
+    )
+    wanted = case(tracked, value=Product.id)
+    result = db.execute(
+        update(Product)
+        .where(Product.id.in_(tracked), Product.stock >= wanted, ~shortfall)
+        .values(stock=Product.stock - wanted)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(tracked):
+        raise OutOfStockError("Not enough stock left for one or more products in this order.")
+    return True
+
+def _merge_cart(order: schemas.OrderCreate) -> dict[int, int]:
+    """Merges duplicate cart lines, keeping the order in which products first appear."""
+    quantities: dict[int, int] = {}
     for item_in in order.items:
-        product = get_product(db, product_id=item_in.product_id)
-        
+        quantities[item_in.product_id] = quantities.get(item_in.product_id, 0) + item_in.quantity
+    return quantities
+
+def _price_cart(quantities: dict[int, int], products: dict, page_id: int) -> tuple[float, list[dict]]:
+    """Returns the order total and its item rows, or raises ValueError for a product not on the page."""
+    total_price = 0.0
+    order_item_rows = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+
         # Validation: Ensure the product exists and belongs to the correct page
         if not product or product.page_id != page_id:
-            raise ValueError(f"Product with ID {item_in.product_id} is invalid for this page.")
-        
-        # Calculate the total price
-        total_price += product.price * item_in.quantity
-        
-        # Create the OrderItem database model instance
-        order_item = models.OrderItem(
-            product_name=product.name,
-            quantity=item_in.quantity,
-            price_per_item=product.price
-        )
-        order_items_to_create.append(order_item)
+            raise ValueError(f"Product with ID {product_id} is invalid for this page.")
+
+        total_price += product.price * quantity
+        order_item_rows.append({
+            "product_name": product.name,
+            "quantity": quantity,
+            "price_per_item": product.price,
+        })
+    return total_price, order_item_rows
+
+def create_order_for_page(db: Session, order: schemas.OrderCreate, page_id: int):
+    """
+    Creates a new order, calculating total price and linking items. Returns a
+    dict shaped like `schemas.Order`, built from what the INSERTs returned, so
+    nothing is read back after the commit.
+    """
+    quantities = _merge_cart(order)
 
-    # Create the main Order database model instance
-    db_order = models.Order(
+    # Resolve every product in a single locked query, so prices cannot change mid-order
+    products = {product.id: product for product in get_products_for_update(db, list(quantities))}
+    try:
+        total_price, order_item_rows = _price_cart(quantities, products, page_id)
+        took_stock = _reserve_stock(db, quantities, products)
+    except ValueError:
+        db.rollback()
+        raise
+
+    created_at = datetime.now(timezone.utc)
+    order_id = db.scalar(insert(models.Order).values(
         customer_name=order.customer_name,
         customer_phone=order.customer_phone,
         total_price=total_price,
         page_id=page_id,
-        items=order_items_to_create # SQLAlchemy will handle linking these
+        created_at=created_at,
+    ).returning(models.Order.id))
+
+    # Insert every item in one multi-row INSERT ... RETURNING. Each returned
+    # row carries its own values, so no parameter order has to be kept, which
+    # on SQLite would mean one INSERT per item
+    items = []
+    if order_item_rows:
+        OrderItem = models.OrderItem
+        items = db.execute(
+            insert(OrderItem).returning(
+                OrderItem.id, OrderItem.product_name, OrderItem.quantity, OrderItem.price_per_item
+            ),
+            [{**row, "order_id": order_id} for row in order_item_rows],
+        ).mappings().all()
+
+    # Keep the sales rollups in step within the same transaction
+    daily, by_product = {}, {}
+    _accumulate_sale(daily, by_product, page_id, created_at, total_price, order_item_rows)
+    _add_to_rollups(db, daily, by_product)
+
+    db.commit()
+    if took_stock:
+        # Stock levels on the storefront can trail checkouts for a moment
+        storefront_cache.changed(page_id)
+    return {
+        "id": order_id,
+        "customer_name": order.customer_name,
+        "customer_phone": order.customer_phone,
+        "total_price": total_price,
+        "created_at": created_at,
+        "items": sorted(items, key=lambda item: item["id"]),
+    }
+
+def release_connection(db: Session):
+    """Ends the session's transaction so its pooled connection goes back while the request waits."""
+    db.rollback()
+
+def create_orders_batch(db: Session, entries: list[tuple[int, schemas.OrderCreate, datetime]]) -> list:
+    """
+    Writes many orders, given as (page_id, order, created_at), in one
+    transaction: one locked product query, one multi-row insert each for
+    orders and items, one rollup update and a single commit.
+
+    Returns one result per entry: a dict shaped like `schemas.Order`, or the
+    ValueError that rejected that order. Rejected orders do not affect the rest.
+    """
+    Order, OrderItem = models.Order, models.OrderItem
+    carts = [_merge_cart(order) for _, order, _ in entries]
+    product_ids = sorted({product_id for cart in carts for product_id in cart})
+    products = {product.id: product for product in get_products_for_update(db, product_ids)}
+
+    results: list = [None] * len(entries)
+    accepted = []
+    stock_pages = set()
+    for index, ((page_id, order, created_at), cart) in enumerate(zip(entries, carts)):
+        try:
+            total_price, item_rows = _price_cart(cart, products, page_id)
+            if _reserve_stock(db, cart, products):
+                stock_pages.add(page_id)
+        except ValueError as e:
+            results[index] = e
+            continue
+        accepted.append((index, {
+            "customer_name": order.customer_name,
+            "customer_phone": order.customer_phone,
+            "total_price": total_price,
+            "page_id": page_id,
+            "created_at": created_at,
+        }, item_rows))
+
+    if accepted:
+        order_ids = db.scalars(
+            insert(Order).returning(Order.id, sort_by_parameter_order=True),
+            [order_row for _, order_row, _ in accepted],
+        ).all()
+        item_params = [
+            {**item_row, "order_id": order_id}
+            for (_, _, item_rows), order_id in zip(accepted, order_ids)
+            for item_row in item_rows
+        ]
+        item_ids = iter(db.scalars(
+            insert(OrderItem).returning(OrderItem.id, sort_by_parameter_order=True), item_params
+        ).all() if item_params else [])
+
+        daily, by_product = {}, {}
+        for _, order_row, item_rows in accepted:
+            _accumulate_sale(
+                daily, by_product, order_row["page_id"], order_row["created_at"], order_row["total_price"], item_rows
+            )
+        _add_to_rollups(db, daily, by_product)
+
+        for (index, order_row, item_rows), order_id in zip(accepted, order_ids):
+            results[index] = {
+                "id": order_id,
+                "customer_name": order_row["customer_name"],
+                "customer_phone": order_row["customer_phone"],
+                "total_price": order_row["total_price"],
+                "created_at": order_row["created_at"],
+                "items": [{"id": next(item_ids), **item_row} for item_row in item_rows],
+            }
+    db.commit()
+    for page_id in stock_pages:
+        storefront_cache.changed(page_id)
+    return results
+
+# --- Sales Rollups ---
+ROLLUP_BATCH_SIZE = 500
+
+def _sale_day(created_at: datetime) -> date:
+    """The UTC date an order counts towards. SQLite hands back naive UTC datetimes."""
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+def _accumulate_sale(daily: dict, by_product: dict, page_id: int, created_at: datetime, total_price: float, item_rows):
+    """Adds one order to in-memory rollup deltas keyed like the rollup tables' primary keys."""
+    day = _sale_day(created_at)
+    totals = daily.setdefault((page_id, day), [0.0, 0, 0])
+    totals[0] += total_price
+    totals[1] += 1
+    for item in item_rows:
+        totals[2] += item["quantity"]
+        product_totals = by_product.setdefault((page_id, day, item["product_name"]), [0, 0.0])
+        product_totals[0] += item["quantity"]
+        product_totals[1] += item["quantity"] * item["price_per_item"]
+
+def _add_increments(db: Session, table, key_columns: tuple, value_columns: tuple, deltas: dict):
+    """
+    Adds `deltas` ({key tuple: [value, ...]}) to a counters table with
+    INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x, ROLLUP_BATCH_SIZE rows per statement.
+    """
+    dialect_insert = _dialect_insert(db)
+    rows = [
+        {**dict(zip(key_columns, key)), **dict(zip(value_columns, values))}
+        for key, values in deltas.items()
+    ]
+    for start in range(0, len(rows), ROLLUP_BATCH_SIZE):
+        stmt = dialect_insert(table).values(rows[start:start + ROLLUP_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: table.c[column] + stmt.excluded[column] for column in value_columns},
+        )
+        db.execute(stmt)
+
+def _add_to_rollups(db: Session, daily: dict, by_product: dict):
+    """Adds rollup deltas to both sales rollup tables."""
+    _add_increments(
+        db, models.PageDailySales.__table__, ("page_id", "day"), ("revenue", "order_count", "units"), daily
     )
+    _add_increments(
+        db, models.PageProductDailySales.__table__, ("page_id", "day", "product_name"), ("units", "revenue"),
+        by_product,
+    )
+
+def rebuild_sales_rollups(db: Session, page_id: int | None = None) -> int:
+    """
+    Recomputes the rollups from existing orders, for one page or all of them,
+    in a single transaction. Returns the number of orders scanned.
+    """
+    Order, OrderItem = models.Order, models.OrderItem
+    for model in (models.PageDailySales, models.PageProductDailySales):
+        stmt = delete(model)
+        if page_id is not None:
+            stmt = stmt.where(model.page_id == page_id)
+        db.execute(stmt)
 
-    db.add(db_order)
+    stmt = (
+        select(
+            Order.id, Order.page_id, Order.created_at, Order.total_price,
+            OrderItem.product_name, OrderItem.quantity, OrderItem.price_per_item,
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .order_by(Order.id)
+        .execution_options(yield_per=ROLLUP_BATCH_SIZE * 10)
+    )
+    if page_id is not None:
+        stmt = stmt.where(Order.page_id == page_id)
+
+    daily, by_product = {}, {}
+    orders_scanned = 0
+    current = None
+    for order_id, order_page_id, created_at, total_price, product_name, quantity, price_per_item in db.execute(stmt):
+        if current is None or current[0] != order_id:
+            if current is not None:
+                _accumulate_sale(daily, by_product, *current[1:])
+            current = (order_id, order_page_id, created_at, total_price, [])
+            orders_scanned += 1
+        if product_name is not None:
+            current[4].append({"product_name": product_name, "quantity": quantity, "price_per_item": price_per_item})
+    if current is not None:
+        _accumulate_sale(daily, by_product, *current[1:])
+
+    _add_to_rollups(db, daily, by_product)
     db.commit()
-    db.refresh(db_order)
-    return db_order
\ No newline at end of file
+    return orders_scanned
+
+def get_daily_sales(db: Session, page_id: int, start: date, end: date):
+    """Daily rollup rows for `start` to `end` inclusive, oldest first; days without sales are absent."""
+    Sales = models.PageDailySales
+    return db.execute(
+        select(Sales.day, Sales.revenue, Sales.order_count, Sales.units)
+        .where(Sales.page_id == page_id, Sales.day >= start, Sales.day <= end)
+        .order_by(Sales.day)
+    ).all()
+
+def get_product_sales(db: Session, page_id: int, start: date, end: date):
+    """Units and revenue per product name over `start` to `end` inclusive, best sellers first."""
+    Sales = models.PageProductDailySales
+    units = func.sum(Sales.units).label("units")
+    return db.execute(
+        select(Sales.product_name, units, func.sum(Sales.revenue).label("revenue"))
+        .where(Sales.page_id == page_id, Sales.day >= start, Sales.day <= end)
+        .group_by(Sales.product_name)
+        .order_by(units.desc(), Sales.product_name)
+    ).all()
+
+# --- Idempotency Keys ---
+def claim_idempotency_key(
+    db: Session, scope: str, key: str, fingerprint: str, lock_seconds: float, ttl_seconds: float
+):
+    """
+    Takes ownership of (scope, key) for the calling request and returns None,
+    or returns the existing row when another request holds or completed it.
+    Expired rows and claims whose lock has run out are taken over.
+    """
+    table = models.IdempotencyKey.__table__
+    now = datetime.now(timezone.utc)
+    stmt = _dialect_insert(db)(table).values(
+        scope=scope, key=key, fingerprint=fingerprint, status_code=None, response_body=None,
+        locked_until=now + timedelta(seconds=lock_seconds), expires_at=now + timedelta(seconds=ttl_seconds),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["scope", "key"],
+        set_={column: stmt.excluded[column] for column in (
+            "fingerprint", "status_code", "response_body", "locked_until", "expires_at",
+        )},
+        where=or_(table.c.expires_at < now, and_(table.c.status_code.is_(None), table.c.locked_until < now)),
+    )
+    claimed = db.execute(stmt).rowcount == 1
+    # Commit the claim so other workers see it while this request runs
+    db.commit()
+    if claimed:
+        return None
+    return get_idempotency_key(db, scope, key)
+
+def get_idempotency_key(db: Session, scope: str, key: str):
+    """Reads the row's current state; None if it was released in the meantime."""
+    Key = models.IdempotencyKey
+    row = db.execute(
+        select(Key.fingerprint, Key.status_code, Key.response_body)
+        .where(Key.scope == scope, Key.key == key)
+    ).first()
+    # End the read so the next poll sees other workers' commits
+    db.rollback()
+    return row
+
+def complete_idempotency_key(db: Session, scope: str, key: str, status_code: int, response_body: str):
+    Key = models.IdempotencyKey
+    db.execute(
+        Key.__table__.update()
+        .where(Key.scope == scope, Key.key == key)
+        .values(status_code=status_code, response_body=response_body)
+    )
+    db.commit()
+
+def release_idempotency_key(db: Session, scope: str, key: str):
+    """Drops an unfinished claim so a retry can run the request again."""
+    db.rollback()
+    Key = models.IdempotencyKey
+    db.execute(delete(Key).where(Key.scope == scope, Key.key == key, Key.status_code.is_(None)))
+    db.commit()
+
+def purge_expired_idempotency_keys(db: Session) -> int:
+    result = db.execute(
+        delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at < datetime.now(timezone.utc))
+    )
+    db.commit()
+    return result.rowcount
+
+# --- Replica Heartbeat ---
+HEARTBEAT_ID = 1
+
+def beat_replica_heartbeat(db: Session, beat_at: datetime):
+    """Stamps the heartbeat row on the primary; an older stamp never overwrites a newer one."""
+    Heartbeat = models.ReplicaHeartbeat
+    db.execute(
+        update(Heartbeat)
+        .where(Heartbeat.id == HEARTBEAT_ID, Heartbeat.beat_at < beat_at)
+        .values(beat_at=beat_at)
+    )
+    db.commit()
+
+def get_replica_heartbeat(db: Session) -> datetime | None:
+    Heartbeat = models.ReplicaHeartbeat
+    beat_at = db.scalar(select(Heartbeat.beat_at).where(Heartbeat.id == HEARTBEAT_ID))
+    # End the read so the next check sees a fresh snapshot
+    db.rollback()
+    if beat_at is not None and beat_at.tzinfo is None:
+        # SQLite hands back naive datetimes; they are stored in UTC
+        beat_at = beat_at.replace(tzinfo=timezone.utc)
+    return beat_at
+
+# --- Storefront Snapshots ---
+def mark_storefront_dirty(db: Session, page_id: int):
+    """
+    Flags the page's snapshot as missing an edit, inside the edit's own
+    transaction, so readers stop serving it the moment the edit commits.
+    """
+    Snapshot = models.StorefrontSnapshot
+    db.execute(
+        update(Snapshot)
+        .where(Snapshot.page_id == page_id)
+        .values(dirty_since=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+
+def get_storefront_snapshot(db: Session, slug: str):
+    Snapshot = models.StorefrontSnapshot
+    return db.execute(
+        select(
+            Snapshot.page_id, Snapshot.etag, Snapshot.body, Snapshot.body_gzip, Snapshot.body_br,
+            Snapshot.rendered_at, Snapshot.dirty_since,
+        ).where(Snapshot.slug == slug)
+    ).first()
+
+def get_storefront_source(db: Session, page_id: int):
+    """
+    Returns (page with its products, the snapshot's dirty mark) for rendering.
+    The mark is read first: an edit committed in between leaves a newer mark,
+    which saving the snapshot then keeps.
+    """
+    Snapshot = models.StorefrontSnapshot
+    dirty_since = db.scalar(select(Snapshot.dirty_since).where(Snapshot.page_id == page_id))
+    return get_page_by_id(db, page_id), dirty_since
+
+def save_storefront_snapshot(
+    db: Session,
+    page_id: int,
+    slug: str,
+    etag: str,
+    body: bytes,
+    body_gzip: bytes,
+    body_br: bytes,
+    rendered_at: datetime,
+    seen_dirty_since: datetime | None,
+):
+    """
+    Stores a rendered storefront. `rendered_at` is when its source was read
+    and `seen_dirty_since` the dirty mark read with it: the mark is only
+    cleared if no edit has set a newer one since, and a snapshot never
+    replaces one rendered from a later read.
+    """
+    Snapshot = models.StorefrontSnapshot
+    stmt = _dialect_insert(db)(Snapshot).values(
+        page_id=page_id, slug=slug, etag=etag, body=body, body_gzip=body_gzip, body_br=body_br,
+        rendered_at=rendered_at, dirty_since=None,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Snapshot.page_id],
+        set_={
+            **{column: stmt.excluded[column] for column in ("etag", "body", "body_gzip", "body_br", "rendered_at")},
+            "dirty_since": case(
+                (Snapshot.dirty_since.is_not_distinct_from(seen_dirty_since), None),
+                else_=Snapshot.dirty_since,
+            ),
+        },
+        where=Snapshot.rendered_at <= stmt.excluded.rendered_at,
+    )
+    db.execute(stmt)
+    db.commit()
+
+# --- Refresh Tokens ---
+class RefreshTokenRejected(ValueError):
+    """The refresh token is unknown, expired, revoked or already used."""
+
+class RefreshTokenReused(RefreshTokenRejected):
+    """An already used refresh token came back; its family has been revoked."""
+
+class RefreshTokenOutdated(RefreshTokenRejected):
+    """The account is gone or its password changed since login; the family has been revoked."""
+
+def create_refresh_token(
+    db: Session, token_id: str, family_id: str, user_id: int, credential_version: str, expires_at: datetime
+):
+    db.execute(insert(models.RefreshToken).values(
+        id=token_id, family_id=family_id, user_id=user_id,
+        credential_version=credential_version, expires_at=expires_at,
+    ))
+    db.commit()
+
+def _revoke_refresh_token_family(db: Session, token_id: str, now: datetime):
+    Token = models.RefreshToken
+    family_id = select(Token.family_id).where(Token.id == token_id).scalar_subquery()
+    db.execute(
+        update(Token)
+        .where(Token.family_id == family_id, Token.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+
+def rotate_refresh_token(
+    db: Session, token_id: str, new_token_id: str, expires_at: datetime, credential_version: Callable[..., str]
+):
+    """
+    Uses up a refresh token and issues `new_token_id` in its family, in one
+    transaction. The token is taken with a single UPDATE by primary key that
+    also checks expiry, revocation and earlier use, so of two concurrent
+    refreshes with the same token only one succeeds. `credential_version`
+    gives a user row's version, for comparison with the one the token was
+    issued under.
+
+    Returns the user row with id, email and credential_version. Raises
+    RefreshTokenReused, after revoking the family, when the token had already
+    been used; RefreshTokenOutdated, likewise after revoking it, when the user
+    is gone or has changed password; and RefreshTokenRejected for any other
+    invalid token.
+    """
+    Token, User = models.RefreshToken, models.User
+    now = datetime.now(timezone.utc)
+    used = db.execute(
+        update(Token)
+        .where(Token.id == token_id, Token.used_at.is_(None), Token.revoked_at.is_(None), Token.expires_at > now)
+        .values(used_at=now)
+        .returning(Token.user_id, Token.family_id, Token.credential_version)
+    ).first()
+    if used is None:
+        # A used token coming back means it leaked: whoever holds its successor
+        # may be the thief, so the whole session goes
+        reused = db.scalar(
+            select(Token.id).where(Token.id == token_id, Token.used_at.is_not(None), Token.revoked_at.is_(None))
+        )
+        if reused is None:
+            db.rollback()
+            raise RefreshTokenRejected("Invalid refresh token.")
+        _revoke_refresh_token_family(db, token_id, now)
+        db.commit()
+        raise RefreshTokenReused("Refresh token already used.")
+
+    user = db.execute(
+        select(User.id, User.email, User.credential_version).where(User.id == used.user_id)
+    ).first()
+    if user is None or credential_version(user) != used.credential_version:
+        # Checked before the successor is issued, so the session ends in this transaction
+        _revoke_refresh_token_family(db, token_id, now)
+        db.commit()
+        raise RefreshTokenOutdated("Refresh token predates a password change.")
+    db.execute(insert(Token).values(
+        id=new_token_id, family_id=used.family_id, user_id=used.user_id,
+        credential_version=used.credential_version, expires_at=expires_at,
+    ))
+    db.commit()
+    return user
+
+def revoke_refresh_token_family(db: Session, token_id: str):
+    """Revokes the token and every other token of its family, i.e. the whole login session."""
+    _revoke_refresh_token_family(db, token_id, datetime.now(timezone.utc))
+    db.commit()
+
+def purge_expired_refresh_tokens(db: Session) -> int:
+    result = db.execute(
+        delete(models.RefreshToken).where(models.RefreshToken.expires_at < datetime.now(timezone.utc))
+    )
+    db.commit()
+    return result.rowcount
+
+# --- Storefront Traffic ---
+PAGE_TRAFFIC_ROW = 0
+
+def add_traffic_counts(db: Session, counts: dict):
+    """Adds {(page_id, day, product_id): [views, clicks]} to the traffic counters in one transaction."""
+    _add_increments(
+        db, models.PageDailyTraffic.__table__, ("page_id", "day", "product_id"), ("views", "clicks"), counts
+    )
+    db.commit()
+
+def get_daily_traffic(db: Session, page_id: int, start: date, end: date):
+    """(day, views, clicks) rows for the days in range that had any traffic."""
+    Traffic = models.PageDailyTraffic
+    return db.execute(
+        select(Traffic.day, func.sum(Traffic.views), func.sum(Traffic.clicks))
+        .where(Traffic.page_id == page_id, Traffic.day >= start, Traffic.day <= end)
+        .group_by(Traffic.day)
+        .order_by(Traffic.day)
+    ).all()
+
+def get_product_clicks(db: Session, page_id: int, start: date, end: date):
+    """(product_id, product name or None if deleted, clicks) rows, most clicked first."""
+    Traffic, Product = models.PageDailyTraffic, models.Product
+    clicks = func.sum(Traffic.clicks).label("clicks")
+    return db.execute(
+        select(Traffic.product_id, Product.name, clicks)
+        .outerjoin(Product, Product.id == Traffic.product_id)
+        .where(
+            Traffic.page_id == page_id,
+            Traffic.product_id != PAGE_TRAFFIC_ROW,
+            Traffic.day >= start,
+            Traffic.day <= end,
+        )
+        .group_by(Traffic.product_id, Product.name)
+        .order_by(clicks.desc(), Traffic.product_id)
+    ).all()
@@ -1,38 +1,485 @@
 # File: backend/app/database.py (Final Corrected Version)
 
 import os
+import threading
+import time
+from contextlib import AsyncExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Union
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.requests import Request
+
+from . import metrics
+from .cache import TTLCache
 
 # Load environment variables (only works for local .env file)
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# --- THE FIX ---
-# We create a dictionary for connection arguments
-connect_args = {}
-# If our database is SQLite (for local development), we add the special argument.
-# For PostgreSQL in production, this dictionary remains empty.
-if DATABASE_URL and DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes", "on")
+
+# --- Connection Pool Settings ---
+# Every gunicorn worker has its own pool, so the database sees up to
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", "true")
+# Postgres only; 0 leaves the server default in place
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# SQLite only: how long a writer waits for the database lock before failing
+# with "database is locked". SQLite has one writer at a time, and in async mode
+# a transaction holds the lock across event loop hops, so bursts of checkouts
+# queue for longer than the driver's 5 second default.
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "60"))
+
+# --- Pool Metrics ---
+class PoolStats:
+    """
+    Counters fed by pool events, exposed through `/internal/pool`. Checkouts
+    happen on many threads at once, so every update takes `_lock`.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self) -> dict:
+        pool = self.engine.pool
+        with self._lock:
+            snapshot = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+                "timeouts": self.timeouts,
+                "wait_mean_ms": round(self.wait_total / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+        if isinstance(pool, QueuePool):
+            snapshot.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "max_overflow": pool._max_overflow,
+            })
+        return snapshot
+
+pool_stats: dict[str, PoolStats] = {}
+
+class _TimedCheckoutMixin:
+    """Measures how long each checkout waits for a connection, including pool timeouts."""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.stats.increment("timeouts")
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.stats.record_wait(waited)
+            query_stats = _query_stats.get()
+            if query_stats is not None:
+                query_stats.pool_wait += waited
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep feeding the same stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _instrument(name: str, sync_engine):
+    stats = pool_stats[name] = PoolStats(name)
+    stats.engine = sync_engine
+    sync_engine.pool.stats = stats
 
-# Create the SQLAlchemy engine, passing the conditional connect_args
-engine = create_engine(
-    DATABASE_URL, connect_args=connect_args
-)
+    def bump(counter):
+        def listener(*args):
+            stats.increment(counter)
+        return listener
+
+    event.listen(sync_engine, "connect", bump("connects"))
+    event.listen(sync_engine, "checkout", bump("checkouts"))
+    event.listen(sync_engine, "checkin", bump("checkins"))
+    event.listen(sync_engine, "invalidate", bump("invalidations"))
+    event.listen(sync_engine, "soft_invalidate", bump("soft_invalidations"))
+
+def _engine_options(url: str, is_async: bool = False) -> dict:
+    """Pool and connection arguments shared by every engine we create."""
+    parsed = make_url(url)
+    # We create a dictionary for connection arguments
+    connect_args = {}
+    options = {}
+    if parsed.get_backend_name() == "sqlite":
+        # If our database is SQLite (for local development), we add the special argument.
+        connect_args = {"timeout": SQLITE_BUSY_TIMEOUT_SECONDS}
+        if not is_async:
+            connect_args["check_same_thread"] = False
+        # In-memory databases keep SQLAlchemy's single-connection pool
+        if parsed.database in (None, "", ":memory:"):
+            return {"connect_args": connect_args}
+    elif parsed.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS:
+        if is_async:
+            connect_args = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            connect_args = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    options.update(
+        connect_args=connect_args,
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    return options
+
+# Create the SQLAlchemy engine with the configured pool
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+_instrument("primary", engine)
 
 # Each instance of the SessionLocal class will be a new database session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# --- Async Mode ---
+# DATABASE_MODE=async serves requests from an AsyncEngine (asyncpg for Postgres,
+# aiosqlite for SQLite) instead of running sessions in the threadpool. The sync
+# engine above is still used by scripts and schema setup.
+#
+# It is not faster on SQLite. Successful requests per second, one CPU, two runs
+# each of `BCRYPT_ROUNDS=4 HASH_QUEUE_LIMIT=1000 python -m benchmarks.load
+# --requests 3000 --concurrency N` with the default admission limit:
+#   N=10   sync 141-180  async 130-138  (async p50 28-30 ms vs 45-57 ms, but
+#                                        p99 ~700 ms vs 160-200 ms)
+#   N=50   sync 112-133  async  54-56   (503s: sync ~580, async ~2550 of 3000)
+#   N=100  sync  71-89   async  14-27
+# aiosqlite still runs each connection on a thread of its own. Measure against
+# Postgres before switching a deployment to async; the default stays sync.
+DATABASE_MODE = os.getenv("DATABASE_MODE", "sync").lower()
+ASYNC_DATABASE = DATABASE_MODE == "async"
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def _async_url(url: str):
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"DATABASE_MODE=async does not support '{backend}' databases.")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend])
+
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DATABASE:
+    async_engine = create_async_engine(_async_url(DATABASE_URL), **_engine_options(DATABASE_URL, is_async=True))
+    _instrument("primary_async", async_engine.sync_engine)
+    # Objects must stay loaded after commit: lazy loads cannot run outside `run_sync`
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# --- Read Replica ---
+# With DATABASE_REPLICA_URL set, read-only routes take their session from
+# `get_read_db`, which serves them from the replica unless it is lagging or the
+# caller has just written something. Any copy of the primary works, including a
+# copy of a local SQLite file.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+# Reads go back to the primary while the replica trails it by more than this,
+# as measured by app.replication; 0 turns the check off
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+# How long a caller's reads stay on the primary after one of its requests commits
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+replica_engine = None
+ReplicaSessionLocal = None
+async_replica_engine = None
+AsyncReplicaSessionLocal = None
+if DATABASE_REPLICA_URL and ASYNC_DATABASE:
+    async_replica_engine = create_async_engine(
+        _async_url(DATABASE_REPLICA_URL), **_engine_options(DATABASE_REPLICA_URL, is_async=True)
+    )
+    _instrument("replica_async", async_replica_engine.sync_engine)
+    AsyncReplicaSessionLocal = async_sessionmaker(async_replica_engine, autoflush=False, expire_on_commit=False)
+elif DATABASE_REPLICA_URL:
+    replica_engine = create_engine(DATABASE_REPLICA_URL, **_engine_options(DATABASE_REPLICA_URL))
+    _instrument("replica", replica_engine)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+DbSession = Union[Session, AsyncSession]
+
 # This Base will be used by all our ORM models to inherit from
 Base = declarative_base()
 
+# --- Statement counting ---
+# Counts the SQL statements issued, the time spent executing them and the time
+# spent waiting for a pooled connection while a `QueryStats` is active in the
+# current context. FastAPI copies the context into the threadpool that runs
+# sync endpoints, so one `QueryStats` sees every statement issued for a request.
+class QueryStats:
+    __slots__ = ("statements", "replica_statements", "db_time", "pool_wait")
+
+    def __init__(self):
+        self.statements = 0
+        # Included in `statements`
+        self.replica_statements = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        context._statement_started_at = time.perf_counter()
+
+def _count_replica_statement(conn, cursor, statement, parameters, context, executemany):
+    _count_statement(conn, cursor, statement, parameters, context, executemany)
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.replica_statements += 1
+
+def _time_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = _query_stats.get()
+    started_at = getattr(context, "_statement_started_at", None)
+    if stats is not None and started_at is not None:
+        stats.db_time += time.perf_counter() - started_at
+
+for _sync_engine in [engine] + ([async_engine.sync_engine] if async_engine is not None else []):
+    event.listen(_sync_engine, "before_cursor_execute", _count_statement)
+    event.listen(_sync_engine, "after_cursor_execute", _time_statement)
+_replica_sync_engine = async_replica_engine.sync_engine if async_replica_engine is not None else replica_engine
+if _replica_sync_engine is not None:
+    event.listen(_replica_sync_engine, "before_cursor_execute", _count_replica_statement)
+    event.listen(_replica_sync_engine, "after_cursor_execute", _time_statement)
+
+class StatementBudgetExceeded(AssertionError):
+    pass
+
+@contextmanager
+def count_statements():
+    """
+    Yields a `QueryStats` counting the statements issued inside the block.
+    Blocks can nest; an enclosing block's stats include the inner block's.
+    """
+    outer = _query_stats.get()
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+        if outer is not None:
+            outer.statements += stats.statements
+            outer.replica_statements += stats.replica_statements
+            outer.db_time += stats.db_time
+            outer.pool_wait += stats.pool_wait
+
+@contextmanager
+def statement_budget(max_statements: int, label: str = "block"):
+    """
+    Fails with `StatementBudgetExceeded` when the block issues more than
+    `max_statements` statements. Used to catch N+1 regressions.
+    """
+    with count_statements() as stats:
+        yield stats
+    if stats.statements > max_statements:
+        raise StatementBudgetExceeded(
+            f"{label} issued {stats.statements} SQL statements (budget: {max_statements})"
+        )
+
+# --- Read routing ---
+class ReplicaLag:
+    """The replica's lag as last measured by app.replication."""
+
+    def __init__(self, max_lag: float):
+        self.max_lag = max_lag
+        self.lag: float | None = None
+        self.measured_at: float | None = None
+
+    def record(self, lag: float | None):
+        """Stores a measurement; None means the replica could not be checked."""
+        self.lag = lag
+        self.measured_at = time.monotonic()
+
+    def acceptable(self) -> bool:
+        if self.max_lag <= 0:
+            return True
+        if self.lag is None:
+            return False
+        # Lag grows by at most the time elapsed since it was measured
+        return self.lag + (time.monotonic() - self.measured_at) <= self.max_lag
+
+replica_lag = ReplicaLag(DB_REPLICA_MAX_LAG_SECONDS)
+
+# Authorization header -> True for callers whose requests committed recently.
+# Per process: another worker can still serve that caller from the replica,
+# which DB_REPLICA_MAX_LAG_SECONDS bounds.
+_recent_writers = TTLCache(max_entries=100_000, ttl=DB_READ_YOUR_WRITES_SECONDS)
+
+def _remember_writer(session):
+    key = session.info.get("writer")
+    if key is not None:
+        _recent_writers.set(key, True)
+
+if DATABASE_REPLICA_URL:
+    event.listen(Session, "after_commit", _remember_writer)
+
+def _writer_info(request: Request) -> dict:
+    if not DATABASE_REPLICA_URL:
+        return {}
+    return {"writer": request.headers.get("authorization")}
+
+def _read_from_replica(request: Request) -> bool:
+    """Decides where a read-only request goes, and counts why."""
+    if not DATABASE_REPLICA_URL:
+        reason = "no_replica"
+    elif (key := request.headers.get("authorization")) is not None and _recent_writers.get(key):
+        reason = "read_your_writes"
+    elif not replica_lag.acceptable():
+        reason = "replica_lagging"
+    else:
+        reason = "replica"
+    metrics.DB_READ_SESSIONS.labels(reason).inc()
+    return reason == "replica"
+
+def is_replica(db: DbSession) -> bool:
+    return db.info.get("replica", False)
+
 # --- Dependency ---
-def get_db():
-    db = SessionLocal()
+# `get_db` is the primary, for mutations and anything that must see the latest
+# writes. `get_read_db` is for read-only routes and may hand out a replica session.
+if ASYNC_DATABASE:
+    async def get_db(request: Request):
+        async with AsyncSessionLocal(info=_writer_info(request)) as db:
+            yield db
+
+    async def get_read_db(request: Request):
+        if _read_from_replica(request):
+            session = AsyncReplicaSessionLocal(info={"replica": True})
+        else:
+            session = AsyncSessionLocal()
+        async with session as db:
+            yield db
+else:
+    def get_db(request: Request):
+        db = SessionLocal(info=_writer_info(request))
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def get_read_db(request: Request):
+        db = ReplicaSessionLocal(info={"replica": True}) if _read_from_replica(request) else SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+async def run(db: DbSession, fn, /, *args, **kwargs):
+    """
+    Calls a sync crud function with the request's session without blocking the
+    event loop: through `AsyncSession.run_sync` in async mode, or in the
+    threadpool in sync mode.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+async def stream_rows(statement, batch_size: int = 1000, replica: bool = False):
+    """
+    Yields the rows of `statement` in lists of up to `batch_size`, read through a
+    server-side cursor so memory stays flat however many rows there are.
+
+    Uses its own session, on the replica when `replica` is set: a streaming
+    response keeps reading after the request's session has been closed.
+    """
+    statement = statement.execution_options(yield_per=batch_size)
+    if ASYNC_DATABASE:
+        async with (AsyncReplicaSessionLocal if replica else AsyncSessionLocal)() as db:
+            result = await db.stream(statement)
+            async for partition in result.partitions():
+                yield partition
+        return
+
+    def partitions():
+        with (ReplicaSessionLocal if replica else SessionLocal)() as db:
+            yield from db.execute(statement).partitions()
+
+    rows = partitions()
     try:
-        yield db
+        async for partition in iterate_in_threadpool(rows):
+            yield partition
     finally:
-        db.close()
+        await run_in_threadpool(rows.close)
+
+async def warm_pool(connections: int = DB_POOL_SIZE):
+    """
+    Opens up to `connections` pooled connections and returns them to the pool,
+    so the first requests a worker serves do not pay for connecting.
+    """
+    if ASYNC_DATABASE:
+        for target in filter(None, [async_engine, async_replica_engine]):
+            async with AsyncExitStack() as stack:
+                for _ in range(connections):
+                    conn = await stack.enter_async_context(target.connect())
+                    await conn.exec_driver_sql("SELECT 1")
+        return
+
+    def open_connections(target):
+        opened = []
+        try:
+            for _ in range(connections):
+                opened.append(target.connect())
+                opened[-1].exec_driver_sql("SELECT 1")
+        finally:
+            for conn in opened:
+                conn.close()
+
+    for target in filter(None, [engine, replica_engine]):
+        await run_in_threadpool(open_connections, target)
+
+async def dispose_engines():
+    for target in filter(None, [async_engine, async_replica_engine]):
+        await target.dispose()
+    for target in filter(None, [engine, replica_engine]):
+        target.dispose()
@@ -0,0 +1,85 @@
+# File: backend/app/hashing.py
+#
+# Password hashing runs in a dedicated process pool so that a burst of bcrypt
+# work (logins, registrations) cannot occupy the event loop or the threadpool
+# that serves every other route. This module is imported by the pool's worker
+# processes too, so it must stay free of app imports.
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+# --- Policy ---
+# Changing BCRYPT_ROUNDS rehashes stored passwords on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Returns whether the password matches, plus a new hash if the stored one is outdated."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def _ready() -> int:
+    return os.getpid()
+
+# --- Pool ---
+# Every web worker (WEB_CONCURRENCY of them, see gunicorn.conf.py) starts its own
+# pool, so both settings below apply per web worker. By default the workers
+# split the CPUs between them rather than each claiming all of them.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))))
+# Jobs allowed to wait for a free worker before new ones are rejected
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_POOL_WORKERS * 4)))
+
+class HashingPoolSaturated(Exception):
+    pass
+
+class HashingPool:
+    """
+    A process pool with a bounded queue. When every worker is busy and the
+    queue is full, `run` fails immediately with `HashingPoolSaturated`
+    instead of letting requests pile up behind bcrypt.
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.capacity = workers + queue_limit
+        self.in_flight = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned workers only import this module, not the app or its open connections
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.capacity:
+            raise HashingPoolSaturated()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def warm(self):
+        """Starts every worker process now instead of on the first logins."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        # Submitted together, so each call finds no idle worker and spawns one
+        await asyncio.gather(*(loop.run_in_executor(executor, _ready) for _ in range(self.workers)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+hashing_pool = HashingPool(workers=HASH_POOL_WORKERS, queue_limit=HASH_QUEUE_LIMIT)
@@ -0,0 +1,124 @@
+# File: backend/app/idempotency.py
+#
+# Idempotency-Key support for POST /orders/{page_slug}. The first request
+# with a key claims it in the idempotency_keys table, runs, and stores its
+# response; retries get the stored response back without touching products or
+# orders. A duplicate arriving while the first is still running waits for it:
+# on an in-process future when both hit the same worker, otherwise by polling
+# the claimed row.
+
+import asyncio
+import hashlib
+import os
+import time
+
+from . import crud
+from .cache import idempotency_cache
+from .database import DbSession, run
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# How long a key and its stored response are kept
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+# How long a duplicate waits for the first request, and how long a claim left
+# by a crashed worker blocks the key
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "30"))
+POLL_INTERVAL_SECONDS = 0.05
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different body."""
+
+class IdempotencyKeyInProgress(Exception):
+    """The first request with this key is still running after the wait."""
+
+class StoredResponse:
+    __slots__ = ("fingerprint", "status_code", "body")
+
+    def __init__(self, fingerprint: str, status_code: int, body: bytes):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.body = body
+
+def fingerprint(request_body: str) -> str:
+    return hashlib.sha256(request_body.encode()).hexdigest()
+
+# (scope, key) -> future resolved when this worker's request holding the key finishes
+_in_flight: dict[tuple[str, str], asyncio.Future] = {}
+
+def _checked(stored: StoredResponse, request_fingerprint: str) -> StoredResponse:
+    if stored.fingerprint != request_fingerprint:
+        raise IdempotencyKeyReused()
+    return stored
+
+async def execute(
+    db: DbSession, scope: str, key: str, request_fingerprint: str, handler
+) -> tuple[StoredResponse, bool]:
+    """
+    Runs `handler` at most once per (scope, key) and returns its stored
+    response plus whether it was replayed. `handler` is an async callable
+    returning (status_code, body). Responses with a 5xx status, and
+    exceptions, release the key so the client can retry.
+    """
+    cache_key = (scope, key)
+    deadline = time.monotonic() + IDEMPOTENCY_LOCK_SECONDS
+    while True:
+        stored = idempotency_cache.get(cache_key)
+        if stored is not None:
+            return _checked(stored, request_fingerprint), True
+
+        pending = _in_flight.get(cache_key)
+        if pending is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(pending), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise IdempotencyKeyInProgress()
+            continue
+
+        future = asyncio.get_running_loop().create_future()
+        _in_flight[cache_key] = future
+        try:
+            existing = await run(
+                db, crud.claim_idempotency_key, scope=scope, key=key, fingerprint=request_fingerprint,
+                lock_seconds=IDEMPOTENCY_LOCK_SECONDS, ttl_seconds=IDEMPOTENCY_KEY_TTL_SECONDS,
+            )
+            if existing is None:
+                return await _run_claimed(db, scope, key, request_fingerprint, handler), False
+            stored = await _wait_for_other_worker(db, scope, key, existing, request_fingerprint, deadline)
+            if stored is not None:
+                idempotency_cache.set(cache_key, stored)
+                return stored, True
+            # The claim was released; try to take it over
+        finally:
+            del _in_flight[cache_key]
+            future.set_result(None)
+
+async def _run_claimed(db: DbSession, scope: str, key: str, request_fingerprint: str, handler) -> StoredResponse:
+    try:
+        status_code, body = await handler()
+    except BaseException:
+        await run(db, crud.release_idempotency_key, scope=scope, key=key)
+        raise
+    stored = StoredResponse(request_fingerprint, status_code, body)
+    if status_code >= 500:
+        await run(db, crud.release_idempotency_key, scope=scope, key=key)
+        return stored
+    await run(
+        db, crud.complete_idempotency_key, scope=scope, key=key,
+        status_code=status_code, response_body=body.decode(),
+    )
+    idempotency_cache.set((scope, key), stored)
+    return stored
+
+async def _wait_for_other_worker(
+    db: DbSession, scope: str, key: str, row, request_fingerprint: str, deadline: float
+) -> StoredResponse | None:
+    """Polls the row claimed by another worker until it has a response, or None if it is released."""
+    while row is not None:
+        if row.fingerprint != request_fingerprint:
+            raise IdempotencyKeyReused()
+        if row.status_code is not None:
+            return StoredResponse(row.fingerprint, row.status_code, row.response_body.encode())
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInProgress()
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+        row = await run(db, crud.get_idempotency_key, scope=scope, key=key)
+    return None
@@ -0,0 +1,144 @@
+# File: backend/app/ingest.py
+#
+# Optional group-commit path for checkout, for flash sales where many orders
+# arrive at once. With ORDER_INGESTION_MODE=batched, POST /orders/{page_slug}
+# validates the request, queues the order in this worker and waits. A single
+# writer task takes whatever has queued up, at most ORDER_BATCH_MAX_SIZE orders
+# or ORDER_BATCH_MAX_WAIT_MS after the first one, and writes the lot with
+# crud.create_orders_batch: one product query, one multi-row insert each for
+# orders and items, one commit. Each waiting request then resolves with its
+# own order id.
+#
+# Durability is the same as the direct path, as seen by the client:
+# - A 201 is only sent after the batch holding the order has committed.
+# - An order still queued or mid-flush when the worker dies was never
+#   acknowledged and is lost; the client sees a dropped connection and retries,
+#   which is safe with an Idempotency-Key.
+# - An order for a product not on its page (400) or out of stock (409) fails
+#   alone. A database error fails the whole batch, and every order in it gets
+#   a 503.
+# - On shutdown the queue is drained before the engines are disposed.
+# The cost is latency: an order can wait up to ORDER_BATCH_MAX_WAIT_MS, plus
+# the flush in progress, before its own batch is written.
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import crud, database, metrics, schemas
+
+logger = logging.getLogger(__name__)
+
+ORDER_INGESTION_MODE = os.getenv("ORDER_INGESTION_MODE", "direct").lower()
+BATCHED_INGESTION = ORDER_INGESTION_MODE == "batched"
+ORDER_BATCH_MAX_SIZE = int(os.getenv("ORDER_BATCH_MAX_SIZE", "200"))
+ORDER_BATCH_MAX_WAIT_MS = float(os.getenv("ORDER_BATCH_MAX_WAIT_MS", "5"))
+# Orders queued beyond this are turned away with a 503 instead of waiting
+ORDER_QUEUE_LIMIT = int(os.getenv("ORDER_QUEUE_LIMIT", "5000"))
+
+class OrderQueueFull(Exception):
+    """The worker already has ORDER_QUEUE_LIMIT orders waiting to be written."""
+
+class OrderBatchFailed(Exception):
+    """The batch holding this order could not be written; nothing in it was committed."""
+
+def _write_batch_sync(entries):
+    with database.SessionLocal() as db:
+        return crud.create_orders_batch(db, entries)
+
+async def write_batch(entries: list[tuple[int, schemas.OrderCreate, datetime]]) -> list:
+    """Runs crud.create_orders_batch on a session of its own."""
+    if database.ASYNC_DATABASE:
+        async with database.AsyncSessionLocal() as db:
+            return await db.run_sync(crud.create_orders_batch, entries)
+    return await run_in_threadpool(_write_batch_sync, entries)
+
+class OrderBatcher:
+    """Queues orders from this worker's requests and writes them in batches."""
+
+    def __init__(self, max_batch_size: int, max_wait_seconds: float, queue_limit: int):
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.queue_limit = queue_limit
+        self._queue: asyncio.Queue | None = None
+        self._writer: asyncio.Task | None = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_limit)
+        self._writer = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Writes everything already queued, then stops the writer."""
+        if self._writer is None:
+            return
+        queue, self._queue = self._queue, None
+        await queue.put(None)
+        await self._writer
+        self._writer = None
+
+    async def submit(self, page_id: int, order: schemas.OrderCreate) -> dict:
+        """
+        Queues an order and returns it, shaped like `schemas.Order`, once its
+        batch has committed. Raises ValueError for an invalid product or
+        missing stock, and OrderQueueFull or OrderBatchFailed when it could
+        not be written.
+        """
+        if self._queue is None:
+            raise OrderQueueFull()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((page_id, order, datetime.now(timezone.utc), future))
+        except asyncio.QueueFull:
+            raise OrderQueueFull()
+        return await future
+
+    async def _run(self):
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size and batch[-1] is not None:
+                if queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(queue.get_nowait())
+            if batch[-1] is None:
+                stopping = True
+                batch.pop()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch):
+        start = time.perf_counter()
+        try:
+            results = await write_batch([(page_id, order, created_at) for page_id, order, created_at, _ in batch])
+        except Exception as e:
+            logger.exception("order batch failed", extra={"orders": len(batch)})
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(OrderBatchFailed(str(e)))
+            return
+        metrics.ORDER_BATCH_SIZE.observe(len(batch))
+        metrics.ORDER_BATCH_FLUSH_TIME.observe(time.perf_counter() - start)
+        for (*_, future), result in zip(batch, results):
+            # A request that was cancelled while waiting no longer has a future to resolve
+            if future.done():
+                continue
+            if isinstance(result, ValueError):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+order_batcher = OrderBatcher(ORDER_BATCH_MAX_SIZE, ORDER_BATCH_MAX_WAIT_MS / 1000, ORDER_QUEUE_LIMIT)
@@ -0,0 +1,213 @@
+# File: backend/app/limits.py
+#
+# Admission control for the public routes. Token buckets limit each page and,
+# when enabled, each client IP per route; a concurrency limit sheds requests once a worker
+# has more in flight than its connection pool can serve. Both answer from
+# memory, so a rejection never costs a database query.
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+from fastapi import HTTPException, Request, status
+
+from . import metrics
+from .cache import TTLCache
+from .database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+
+# --- Configuration ---
+def _parse_limit(name: str, default: str) -> tuple[float, float] | None:
+    """Reads "RATE[:BURST]" (requests per second, bucket size); 0 turns the limit off."""
+    rate, _, burst = os.getenv(name, default).partition(":")
+    if not rate or float(rate) <= 0:
+        return None
+    return float(rate), float(burst or rate)
+
+# route -> {"page": (rate, burst), "client": (rate, burst)}, from
+# RATE_LIMIT_<ROUTE>_PER_PAGE and RATE_LIMIT_<ROUTE>_PER_CLIENT.
+#
+# Per-client limits are off unless configured. They key on the address uvicorn
+# reports, which behind a proxy (Azure App Service's front end included) is the
+# proxy's own unless FORWARDED_ALLOW_IPS trusts it (see gunicorn.conf.py);
+# otherwise every shopper would share one bucket. Suggested values once it is
+# set: RATE_LIMIT_STOREFRONT_PER_CLIENT=10:30, RATE_LIMIT_CHECKOUT_PER_CLIENT=1:5.
+ROUTE_LIMITS = {
+    "storefront": {
+        "page": _parse_limit("RATE_LIMIT_STOREFRONT_PER_PAGE", "100:200"),
+        "client": _parse_limit("RATE_LIMIT_STOREFRONT_PER_CLIENT", "0"),
+    },
+    "checkout": {
+        "page": _parse_limit("RATE_LIMIT_CHECKOUT_PER_PAGE", "20:40"),
+        "client": _parse_limit("RATE_LIMIT_CHECKOUT_PER_CLIENT", "0"),
+    },
+}
+
+# Requests one worker may have in flight before it sheds new ones with a 503.
+# 0 disables the limit. Defaults to twice what the worker's pool can serve.
+ADMISSION_MAX_IN_FLIGHT = int(
+    os.getenv("ADMISSION_MAX_IN_FLIGHT", str(2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+)
+
+# gunicorn.conf.py points this at a file shared by all workers; without it each
+# process keeps its own buckets.
+RATE_LIMIT_STATE_FILE = os.getenv("RATE_LIMIT_STATE_FILE")
+RATE_LIMIT_SLOTS = int(os.getenv("RATE_LIMIT_SLOTS", "65536"))
+
+# --- Token bucket stores ---
+# `take` is given [(key, rate, burst), ...] and either takes one token from
+# every bucket, returning 0, or takes none and returns the seconds until it
+# could succeed.
+
+class MemoryTokenBuckets:
+    """Buckets for this process only."""
+
+    def __init__(self, max_entries: int = 100_000):
+        # An evicted bucket starts again full, so entries only need to outlive a refill
+        self._buckets = TTLCache(max_entries=max_entries, ttl=3600)
+        self._lock = threading.Lock()
+
+    def take(self, requests: list[tuple[str, float, float]], now: float) -> float:
+        with self._lock:
+            levels = []
+            for key, rate, burst in requests:
+                tokens, updated_at = self._buckets.get(key) or (burst, now)
+                levels.append(min(burst, tokens + (now - updated_at) * rate))
+            wait = max(
+                ((1 - tokens) / rate for tokens, (_, rate, _) in zip(levels, requests) if tokens < 1),
+                default=0.0,
+            )
+            if wait:
+                return wait
+            for tokens, (key, _, _) in zip(levels, requests):
+                self._buckets.set(key, (tokens - 1, now))
+            return 0.0
+
+
+class SharedTokenBuckets:
+    """
+    Buckets in a memory-mapped file, shared by every worker on the machine.
+
+    The file is a fixed table of slots (key hash, tokens, updated_at, full_at)
+    with short linear probing. A slot whose bucket has refilled is free for
+    reuse, and when every probed slot is taken the one that refills soonest is
+    evicted. An evicted bucket starts again full, so under pressure limits err
+    on the permissive side. Updates happen under an fcntl lock on the file.
+    """
+
+    SLOT = struct.Struct("<Qddd")
+    PROBES = 8
+
+    def __init__(self, path: str, slots: int):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.slots = slots
+        size = slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        # fcntl locks are per process, so threads also need a lock of their own
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # Python's hash() differs between processes; 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def _find_slot(self, key_hash: int, now: float) -> int:
+        start = key_hash % self.slots
+        reusable, soonest, soonest_full_at = None, start, math.inf
+        for probe in range(self.PROBES):
+            index = (start + probe) % self.slots
+            slot_hash, _, _, full_at = self.SLOT.unpack_from(self._map, index * self.SLOT.size)
+            if slot_hash == key_hash:
+                return index
+            if reusable is None and (slot_hash == 0 or full_at <= now):
+                reusable = index
+            if full_at < soonest_full_at:
+                soonest, soonest_full_at = index, full_at
+        return reusable if reusable is not None else soonest
+
+    def take(self, requests: list[tuple[str, float, float]], now: float) -> float:
+        with self._lock:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX)
+            try:
+                buckets = []
+                for key, rate, burst in requests:
+                    key_hash = self._hash(key)
+                    index = self._find_slot(key_hash, now)
+                    slot_hash, tokens, updated_at, _ = self.SLOT.unpack_from(self._map, index * self.SLOT.size)
+                    if slot_hash != key_hash:
+                        tokens, updated_at = burst, now
+                    buckets.append((index, key_hash, min(burst, tokens + (now - updated_at) * rate), rate, burst))
+                wait = max(
+                    ((1 - tokens) / rate for _, _, tokens, rate, _ in buckets if tokens < 1), default=0.0
+                )
+                if wait:
+                    return wait
+                for index, key_hash, tokens, rate, burst in buckets:
+                    tokens -= 1
+                    full_at = now + (burst - tokens) / rate
+                    self.SLOT.pack_into(self._map, index * self.SLOT.size, key_hash, tokens, now, full_at)
+                return 0.0
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN)
+
+
+token_buckets = (
+    SharedTokenBuckets(RATE_LIMIT_STATE_FILE, RATE_LIMIT_SLOTS) if RATE_LIMIT_STATE_FILE else MemoryTokenBuckets()
+)
+
+# --- Route dependency ---
+class RateLimit:
+    """
+    Route dependency enforcing ROUTE_LIMITS[route] per page (taken from the
+    `page_param` path parameter) and, when configured, per client IP. Behind
+    a proxy, set FORWARDED_ALLOW_IPS so uvicorn reports the real client address.
+    """
+
+    def __init__(self, route: str, page_param: str):
+        self.route = route
+        self.page_param = page_param
+        self.limits = ROUTE_LIMITS[route]
+
+    async def __call__(self, request: Request):
+        requests = []
+        if self.limits["page"]:
+            requests.append((f"{self.route}:page:{request.path_params[self.page_param]}", *self.limits["page"]))
+        if self.limits["client"] and request.client is not None:
+            requests.append((f"{self.route}:client:{request.client.host}", *self.limits["client"]))
+        if not requests:
+            return
+        wait = token_buckets.take(requests, time.monotonic())
+        if wait:
+            metrics.REQUESTS_SHED.labels(self.route, "rate_limit").inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please slow down.",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+# --- Concurrency limit ---
+class ConcurrencyLimiter:
+    """Counts requests in flight in this worker; the event loop is single-threaded."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+
+    def try_acquire(self) -> bool:
+        if self.limit and self.in_flight >= self.limit:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+concurrency_limiter = ConcurrencyLimiter(ADMISSION_MAX_IN_FLIGHT)
@@ -0,0 +1,198 @@
+# File: backend/app/logs.py
+#
+# Structured logging for everything under the "app" logger. A log call only
+# tags the record with the request's id and route and puts it on a bounded
+# in-memory queue; a writer thread per worker formats records as JSON lines
+# and writes them to stdout. When the queue is full (stdout is backed up),
+# records are dropped and counted in `log_records_dropped_total` rather than
+# making the request wait.
+#
+# Records below WARNING are sampled per request: LOG_SAMPLE_RATES sets the
+# share of requests logged on a route, e.g.
+#   LOG_SAMPLE_RATES="GET /pages/{slug}=0.01,POST /orders/{page_slug}=0.1"
+# and a request is either logged in full or not at all. Warnings and errors
+# are always kept.
+#
+# Pass values in `extra` rather than formatting them into the message: the
+# message is only built on the writer thread, so arguments must not be
+# mutated after the call.
+
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+import orjson
+
+from . import metrics
+
+# --- Configuration ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# One "request" record per request, with status, duration and statement count
+LOG_REQUESTS = os.getenv("LOG_REQUESTS", "true").lower() in ("1", "true", "yes", "on")
+
+def _parse_sample_rates(value: str) -> dict[str, float]:
+    """Reads "METHOD /route=RATE,..." into {"METHOD /route": rate}."""
+    rates = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        route, _, rate = entry.rpartition("=")
+        rates[route.strip()] = float(rate)
+    return rates
+
+LOG_SAMPLE_RATES = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+LOG_SAMPLE_DEFAULT = float(os.getenv("LOG_SAMPLE_DEFAULT", "1"))
+
+# --- Request correlation ---
+class RequestLog:
+    """What log records need to know about the request they were written in."""
+
+    __slots__ = ("request_id", "scope", "sampled")
+
+    def __init__(self, request_id: str, scope: dict):
+        self.request_id = request_id
+        self.scope = scope
+        self.sampled: bool | None = None
+
+    @property
+    def route(self) -> str | None:
+        # Filled in by the router, so unknown until the request has been matched
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {route.path}" if route is not None else None
+
+_request_log: ContextVar[RequestLog | None] = ContextVar("request_log", default=None)
+
+REQUEST_ID_MAX_LENGTH = 64
+
+def new_request_id(supplied: str | None = None) -> str:
+    """Keeps a sane caller-supplied X-Request-ID, so logs line up across services; otherwise makes one."""
+    if supplied and len(supplied) <= REQUEST_ID_MAX_LENGTH and supplied.replace("-", "").replace("_", "").isalnum():
+        return supplied
+    return uuid.uuid4().hex
+
+@contextmanager
+def bind_request(request_id: str, scope: dict):
+    token = _request_log.set(RequestLog(request_id, scope))
+    try:
+        yield
+    finally:
+        _request_log.reset(token)
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with the current request and applies per-route sampling, in the caller's thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request = _request_log.get()
+        if request is None:
+            return True
+        record.request_id = request.request_id
+        record.route = request.route
+        if record.levelno >= logging.WARNING:
+            return True
+        if request.sampled is None:
+            rate = LOG_SAMPLE_RATES.get(record.route, LOG_SAMPLE_DEFAULT)
+            request.sampled = rate >= 1 or random.random() < rate
+        return request.sampled
+
+# --- Queue and writer ---
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queues records as they are, dropping them once `max_size` are waiting."""
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int):
+        super().__init__(log_queue)
+        self.max_size = max_size
+
+    def createLock(self):
+        # The queue is thread-safe on its own; skip the per-handler lock
+        self.lock = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting waits for the writer thread; only a traceback has to be
+        # rendered now, while the exception is still current
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= self.max_size:
+            metrics.LOG_RECORDS_DROPPED.inc()
+            return
+        self.queue.put_nowait(record)
+
+# LogRecord attributes that are not `extra` fields
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "route"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id, route and `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+            entry["route"] = record.route
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+# Unbounded by itself, but the handler stops adding at LOG_QUEUE_SIZE; unlike
+# queue.Queue, putting never takes a lock
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+def _configure():
+    # None of these LogRecord fields are written out, and filling them in is
+    # most of what a log call costs
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    handler = NonBlockingQueueHandler(log_queue, LOG_QUEUE_SIZE)
+    handler.addFilter(RequestContextFilter())
+    logger = logging.getLogger("app")
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.CRITICAL + 1 if LOG_LEVEL == "OFF" else LOG_LEVEL)
+
+_configure()
+
+def _stdout_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+class LogWriter:
+    """The background thread that drains `log_queue` into `handler` (stdout by default)."""
+
+    def __init__(self, handler_factory=_stdout_handler):
+        self.handler_factory = handler_factory
+        self._listener: logging.handlers.QueueListener | None = None
+
+    def start(self):
+        if self._listener is not None:
+            return
+        self._listener = logging.handlers.QueueListener(log_queue, self.handler_factory())
+        self._listener.start()
+
+    def stop(self):
+        """Writes out what is queued, then stops the thread."""
+        if self._listener is None:
+            return
+        self._listener.stop()
+        self._listener = None
+
+log_writer = LogWriter()
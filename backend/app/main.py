@@ -1,22 +1,114 @@
 # File: backend/app/main.py
 
-from fastapi import FastAPI
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 
-from . import models, database
+from . import database, hashing, ingest, limits, logs, metrics, replication, snapshots, startup, traffic
 # Import the new orders router
-from .api.endpoints import users, pages, products, orders 
+from .api.endpoints import users, pages, products, orders, analytics, internal
+
+# The schema is managed by migrations (`python -m app.cli migrate`), which
+# gunicorn.conf.py runs once before any worker starts.
 
-# This line creates the tables
-models.Base.metadata.create_all(bind=database.engine)
+request_logger = logging.getLogger("app.requests")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logs.log_writer.start()
+    # Started first, so storefronts loaded during warm-up can schedule snapshots
+    await snapshots.snapshot_scheduler.start()
+    await traffic.traffic_counter.start()
+    # Uvicorn only starts accepting connections once this has finished
+    await startup.warm_up()
+    await replication.replica_monitor.start()
+    if ingest.BATCHED_INGESTION:
+        await ingest.order_batcher.start()
+    yield
+    # Write any queued orders while the engines are still open
+    await ingest.order_batcher.stop()
+    await replication.replica_monitor.stop()
+    await snapshots.snapshot_scheduler.stop()
+    await traffic.traffic_counter.stop()
+    hashing.hashing_pool.shutdown()
+    # Pooled aiosqlite connections keep non-daemon threads alive until disposed
+    await database.dispose_engines()
+    logs.log_writer.stop()
 
 app = FastAPI(
     title="Solopreneur Digital Toolkit API",
     description="The backend API for the Solopreneur Digital Toolkit.",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# --- Load shedding ---
+# Past ADMISSION_MAX_IN_FLIGHT requests in this worker, new ones get a 503
+# straight away instead of queueing for a database connection. Operational
+# endpoints stay reachable so an overloaded worker can still be inspected.
+ADMISSION_EXEMPT_PREFIXES = ("/metrics", "/internal/")
+
+@app.middleware("http")
+async def shed_excess_load(request: Request, call_next):
+    # OPTIONS requests are cheap and never touch the database
+    if request.method == "OPTIONS" or request.url.path.startswith(ADMISSION_EXEMPT_PREFIXES):
+        return await call_next(request)
+    if not limits.concurrency_limiter.try_acquire():
+        metrics.REQUESTS_SHED.labels("*", "concurrency").inc()
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Server is busy, please try again shortly."},
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await call_next(request)
+    finally:
+        limits.concurrency_limiter.release()
+
+# --- Request metrics ---
+# Every response gets a Server-Timing header breaking its time down into SQL,
+# pool wait, serialization and password hashing; the same figures feed the
+# per-route histograms served at /metrics.
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    with database.count_statements() as sql, metrics.track_request() as timings:
+        response = await call_next(request)
+    duration = time.perf_counter() - start
+    route = request.scope.get("route")
+    route_path = route.path if route is not None else "unmatched"
+    metrics.observe_request(request.method, route_path, response.status_code, duration, sql, timings)
+    response.headers["Server-Timing"] = metrics.server_timing(duration, sql, timings)
+    if logs.LOG_REQUESTS:
+        request_logger.info("request", extra={
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 2),
+            "sql_statements": sql.statements,
+        })
+    startup.record_request_served()
+    return response
+
+# --- Request ids ---
+# Declared after the other middleware so it runs before them (only CORS wraps
+# it): everything logged while handling a request, in any middleware or
+# endpoint, carries its id. The id is echoed back in the X-Request-ID header.
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    request_id = logs.new_request_id(request.headers.get("x-request-id"))
+    with logs.bind_request(request_id, request.scope):
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 # --- CORS Configuration ---
+# Added last so it is the outermost middleware: responses produced by the
+# middleware above (503s from load shedding)
+# still carry CORS headers, and preflights are answered before any of it runs.
 origins = [
     "http://localhost:3000",
     "https://gentle-hill-000ab8500.1.azurestaticapps.net",
@@ -31,6 +123,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "Idempotent-Replayed", "X-Request-ID"],
 )
 
 # --- Routers ---
@@ -39,6 +132,9 @@ app.include_router(pages.router, prefix="/pages", tags=["Pages"])
 app.include_router(products.router, prefix="/products", tags=["Products"])
 # Include the new orders router
 app.include_router(orders.router, prefix="/orders", tags=["Orders"])
+app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
+app.include_router(internal.router, prefix="/internal", tags=["Internal"], include_in_schema=False)
+app.include_router(internal.metrics_router, include_in_schema=False)
 
 
 @app.get("/")
@@ -0,0 +1,226 @@
+# File: backend/app/metrics.py
+#
+# Per-request timings and the Prometheus metrics they feed. Under gunicorn,
+# PROMETHEUS_MULTIPROC_DIR (set by gunicorn.conf.py) makes every worker write
+# its samples to shared files, so /metrics reports totals across all workers
+# whichever worker serves the scrape.
+
+import asyncio
+import functools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# --- Request timings ---
+# Filled in while a request runs. SQL time and statement counts live in
+# `database.QueryStats`; this holds the rest of the breakdown.
+class RequestTimings:
+    __slots__ = ("hashing", "serialization", "endpoint_returned_at")
+
+    def __init__(self):
+        self.hashing = 0.0
+        self.serialization = 0.0
+        self.endpoint_returned_at = None
+
+_request_timings: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+@contextmanager
+def track_request():
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+def record_hashing(seconds: float):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.hashing += seconds
+
+def _mark_endpoint_returned():
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.endpoint_returned_at = time.perf_counter()
+
+def _timed_endpoint(endpoint):
+    """Wraps an endpoint so the time its return value takes to serialize can be measured."""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_returned()
+    else:
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_returned()
+    return timed
+
+class TimedRoute(APIRoute):
+    """
+    Route class for every router: records the time between the endpoint
+    returning and the response being ready, i.e. response_model validation
+    and JSON encoding.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            timings = _request_timings.get()
+            if timings is not None and timings.endpoint_returned_at is not None:
+                timings.serialization += time.perf_counter() - timings.endpoint_returned_at
+            return response
+
+        return timed_handler
+
+# --- Prometheus ---
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Wall time per request.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent executing SQL statements per request.",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_POOL_WAIT = Histogram(
+    "http_request_pool_wait_seconds", "Time spent waiting for a pooled database connection per request.",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements issued per request.",
+    ["method", "route"], buckets=STATEMENT_BUCKETS,
+)
+REQUEST_SERIALIZATION_TIME = Histogram(
+    "http_request_serialization_seconds", "Time spent validating and encoding the response body.",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+REQUEST_HASHING_TIME = Histogram(
+    "http_request_hashing_seconds", "Time spent waiting for password hashing per request.",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+
+REQUESTS_SHED = Counter(
+    "http_requests_shed_total", "Requests rejected by admission control before doing any work.",
+    ["route", "reason"],
+)
+
+STARTUP_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+WORKER_STARTUP = Histogram(
+    "worker_startup_seconds",
+    "Worker boot time by phase: importing the app, warming up, and time to the first request served.",
+    ["phase"], buckets=STARTUP_BUCKETS,
+)
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+ORDER_BATCH_SIZE = Histogram(
+    "order_batch_size", "Orders written per group commit in batched ingestion mode.",
+    buckets=BATCH_SIZE_BUCKETS,
+)
+ORDER_BATCH_FLUSH_TIME = Histogram(
+    "order_batch_flush_seconds", "Time to write and commit one batch of orders.",
+    buckets=LATENCY_BUCKETS,
+)
+
+AUTH_TOKEN_REFRESHES = Counter(
+    "auth_token_refreshes_total", "POST /users/token/refresh calls by outcome.", ["outcome"],
+)
+PASSWORD_VERIFICATIONS_AVOIDED = Counter(
+    "auth_password_verifications_avoided_total",
+    "Sessions renewed with a refresh token rather than a password login, each one bcrypt verification saved.",
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log records discarded because the log queue was full.",
+)
+
+TRAFFIC_COUNTS_DROPPED = Counter(
+    "storefront_traffic_counts_dropped_total",
+    "Storefront views and clicks discarded because a worker's unflushed counters were full.",
+)
+TRAFFIC_FLUSH_TIME = Histogram(
+    "storefront_traffic_flush_seconds", "Time to write one batch of storefront traffic counters.",
+    buckets=LATENCY_BUCKETS,
+)
+
+STOREFRONT_LOADS = Counter(
+    "storefront_loads_total",
+    "Storefronts loaded into a worker's cache, from a snapshot or rendered from the tables.", ["source"],
+)
+STOREFRONT_RENDER_TIME = Histogram(
+    "storefront_snapshot_render_seconds", "Time to read, render, compress and save one storefront snapshot.",
+    buckets=LATENCY_BUCKETS,
+)
+
+# Share of request statements offloaded from the primary:
+#   sum(rate(db_statements_total{target="replica"}[5m])) / sum(rate(db_statements_total[5m]))
+DB_STATEMENTS = Counter(
+    "db_statements_total", "SQL statements issued by requests, by the engine that ran them.", ["target"],
+)
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total", "Sessions handed to read-only routes, by where they went and why.", ["reason"],
+)
+REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds", "How far the read replica trails the primary; +Inf when it cannot be checked.",
+    multiprocess_mode="max",
+)
+
+def observe_request(method: str, route: str, status_code: int, duration: float, sql, timings: RequestTimings):
+    REQUEST_DURATION.labels(method, route, str(status_code)).observe(duration)
+    if sql.replica_statements:
+        DB_STATEMENTS.labels("replica").inc(sql.replica_statements)
+    if sql.statements > sql.replica_statements:
+        DB_STATEMENTS.labels("primary").inc(sql.statements - sql.replica_statements)
+    REQUEST_DB_TIME.labels(method, route).observe(sql.db_time)
+    REQUEST_POOL_WAIT.labels(method, route).observe(sql.pool_wait)
+    REQUEST_STATEMENTS.labels(method, route).observe(sql.statements)
+    REQUEST_SERIALIZATION_TIME.labels(method, route).observe(timings.serialization)
+    if timings.hashing:
+        REQUEST_HASHING_TIME.labels(method, route).observe(timings.hashing)
+
+def server_timing(duration: float, sql, timings: RequestTimings) -> str:
+    """Formats the request's breakdown as a `Server-Timing` header value, in milliseconds."""
+    entries = [
+        f"total;dur={duration * 1000:.2f}",
+        f'db;dur={sql.db_time * 1000:.2f};desc="{sql.statements} statements"',
+        f"pool;dur={sql.pool_wait * 1000:.2f}",
+        f"ser;dur={timings.serialization * 1000:.2f}",
+    ]
+    if timings.hashing:
+        entries.append(f"hash;dur={timings.hashing * 1000:.2f}")
+    return ", ".join(entries)
+
+def render_metrics() -> bytes:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
@@ -1,6 +1,7 @@
 # File: backend/app/models.py
 
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Index, LargeBinary, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func # Import func
 from .database import Base
@@ -11,6 +12,8 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    # Bumped by a password change but not by a rehash; tokens carry it as `cv`
+    credential_version = Column(Integer, nullable=False, default=0, server_default="0")
     page = relationship("Page", back_populates="owner", uselist=False, cascade="all, delete-orphan")
 
 class Page(Base):
@@ -19,7 +22,8 @@ class Page(Base):
     slug = Column(String, unique=True, index=True, nullable=False)
     title = Column(String, index=True, default="My Page")
     description = Column(String, default="Welcome to my page!")
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    # Unique: one page per user, enforced by the INSERT in crud.create_user_page
+    owner_id = Column(Integer, ForeignKey("users.id"), unique=True, index=True)
     owner = relationship("User", back_populates="page")
     products = relationship("Product", back_populates="page", cascade="all, delete-orphan")
     orders = relationship("Order", back_populates="page", cascade="all, delete-orphan")
@@ -30,7 +34,9 @@ class Product(Base):
     name = Column(String, index=True, nullable=False)
     description = Column(String, nullable=True)
     price = Column(Float, nullable=False)
-    page_id = Column(Integer, ForeignKey("pages.id"))
+    # Units left to sell; NULL means the product's stock is not tracked
+    stock = Column(Integer, nullable=True)
+    page_id = Column(Integer, ForeignKey("pages.id"), index=True)
     page = relationship("Page", back_populates="products")
 
 
@@ -41,16 +47,105 @@ class Order(Base):
     customer_phone = Column(String, nullable=False)
     total_price = Column(Float, nullable=False)
     # ADD THIS NEW COLUMN
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set from Python as well so every row stores the same timestamp format
+    # (SQLite's CURRENT_TIMESTAMP drops microseconds), keeping keyset cursors exact.
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), default=lambda: datetime.now(timezone.utc))
     page_id = Column(Integer, ForeignKey("pages.id"))
     page = relationship("Page", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    # Serves the keyset-paginated order history as an index range scan.
+    __table_args__ = (Index("ix_orders_page_id_created_at_id", "page_id", "created_at", "id"),)
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True, index=True)
     product_name = Column(String, nullable=False)
     quantity = Column(Integer, nullable=False)
     price_per_item = Column(Float, nullable=False)
-    order_id = Column(Integer, ForeignKey("orders.id"))
-    order = relationship("Order", back_populates="items")
\ No newline at end of file
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
+    order = relationship("Order", back_populates="items")
+
+
+# --- Sales rollups ---
+# Maintained by crud.create_order_for_page in the order's own transaction, so
+# analytics read O(days) rows instead of scanning orders. Days are UTC dates.
+# Rebuild with `python -m app.cli rebuild-rollups`.
+class PageDailySales(Base):
+    __tablename__ = "page_daily_sales"
+    page_id = Column(Integer, ForeignKey("pages.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    revenue = Column(Float, nullable=False, default=0.0)
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+
+class PageProductDailySales(Base):
+    __tablename__ = "page_product_daily_sales"
+    page_id = Column(Integer, ForeignKey("pages.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    # Order items keep the product's name at checkout time, so rollups do too
+    product_name = Column(String, primary_key=True)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+# Responses to POST /orders/{page_slug} requests sent with an Idempotency-Key.
+# `scope` is the page slug. A row with no status_code is a claim held by the
+# request still running; it can be taken over once `locked_until` passes.
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    scope = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+# A single row (id 1) stamped on the primary by every worker; its age as read
+# from the read replica is the replica's lag (see app.replication).
+class ReplicaHeartbeat(Base):
+    __tablename__ = "replica_heartbeat"
+    id = Column(Integer, primary_key=True)
+    beat_at = Column(DateTime(timezone=True), nullable=False)
+
+# The public storefront (`schemas.Page` JSON) rendered ahead of time, in each
+# encoding it is served with (see app.snapshots). Every edit to the page or its
+# products sets `dirty_since` in its own transaction; saving a snapshot that
+# includes the edit clears it again.
+class StorefrontSnapshot(Base):
+    __tablename__ = "storefront_snapshots"
+    page_id = Column(Integer, ForeignKey("pages.id"), primary_key=True)
+    slug = Column(String, unique=True, nullable=False)
+    etag = Column(String, nullable=False)
+    body = Column(LargeBinary, nullable=False)
+    body_gzip = Column(LargeBinary, nullable=False)
+    body_br = Column(LargeBinary, nullable=False)
+    rendered_at = Column(DateTime(timezone=True), nullable=False)
+    dirty_since = Column(DateTime(timezone=True), nullable=True)
+
+# Refresh tokens handed out at login. Only the id is stored: the token itself
+# is the id plus an HMAC of it (see app.security). Each refresh marks its token
+# used and issues the next one in the same family; presenting a used token
+# again revokes the whole family.
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    id = Column(String, primary_key=True)
+    family_id = Column(String, nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # `security.credential_version` at login; a password change ends the family
+    credential_version = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    used_at = Column(DateTime(timezone=True), nullable=True)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+
+# Storefront traffic per page and UTC day, counted in memory by each worker and
+# added here in batches (see app.traffic). Row product_id 0 holds the page's
+# views; the other rows hold clicks per product. No foreign key on product_id,
+# so counts outlive deleted products.
+class PageDailyTraffic(Base):
+    __tablename__ = "page_daily_traffic"
+    page_id = Column(Integer, ForeignKey("pages.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    clicks = Column(Integer, nullable=False, default=0)
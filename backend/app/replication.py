@@ -0,0 +1,75 @@
+# File: backend/app/replication.py
+#
+# Measures how far the read replica trails the primary. Each worker stamps the
+# replica_heartbeat row on the primary every DB_REPLICA_HEARTBEAT_SECONDS and
+# reads it back from the replica: the age of the replica's copy is its lag.
+# `database.get_read_db` sends reads to the primary while that lag is over
+# DB_REPLICA_MAX_LAG_SECONDS or the replica cannot be reached.
+
+import asyncio
+import os
+from contextlib import suppress
+from datetime import datetime, timezone
+
+from . import crud, database, metrics
+
+DB_REPLICA_HEARTBEAT_SECONDS = float(os.getenv("DB_REPLICA_HEARTBEAT_SECONDS", "1"))
+
+async def _call(replica: bool, fn, **kwargs):
+    if database.ASYNC_DATABASE:
+        factory = database.AsyncReplicaSessionLocal if replica else database.AsyncSessionLocal
+        async with factory() as db:
+            return await database.run(db, fn, **kwargs)
+    factory = database.ReplicaSessionLocal if replica else database.SessionLocal
+    with factory() as db:
+        return await database.run(db, fn, **kwargs)
+
+async def measure_lag() -> float | None:
+    """Stamps the heartbeat and returns the replica's lag in seconds, or None if it has no heartbeat."""
+    await _call(False, crud.beat_replica_heartbeat, beat_at=datetime.now(timezone.utc))
+    beat_at = await _call(True, crud.get_replica_heartbeat)
+    if beat_at is None:
+        return None
+    return max(0.0, (datetime.now(timezone.utc) - beat_at).total_seconds())
+
+class ReplicaMonitor:
+    """Keeps `database.replica_lag` current from a background task in each worker."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(database.DATABASE_REPLICA_URL) and database.DB_REPLICA_MAX_LAG_SECONDS > 0
+
+    async def check(self):
+        try:
+            lag = await measure_lag()
+        except Exception:
+            # An unreachable replica, or primary, counts as too far behind
+            lag = None
+        database.replica_lag.record(lag)
+        metrics.REPLICA_LAG.set(lag if lag is not None else float("inf"))
+
+    async def start(self):
+        if not self.enabled:
+            return
+        # Measure once before serving, so the first reads can use the replica
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+replica_monitor = ReplicaMonitor(DB_REPLICA_HEARTBEAT_SECONDS)
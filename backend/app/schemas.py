@@ -1,8 +1,8 @@
 # File: backend/app/schemas.py
 
-from pydantic import BaseModel, EmailStr, ConfigDict
+from pydantic import BaseModel, EmailStr, ConfigDict, Field
 from typing import Optional, List
-from datetime import datetime # Import datetime
+from datetime import date, datetime # Import datetime
 
 # --- User Schemas ---
 class UserCreate(BaseModel):
@@ -18,9 +18,16 @@ class User(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    # Single use: trade it at POST /users/token/refresh for a new pair
+    refresh_token: Optional[str] = None
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: str | None = None
+    user_id: int | None = None
+    credential_version: str | None = None
 
 # --- Product Schemas ---
 class ProductBase(BaseModel):
@@ -29,18 +36,37 @@ class ProductBase(BaseModel):
     price: float
 
 class ProductCreate(ProductBase):
-    pass
+    # Units available to sell; leave out (or null) for unlimited stock
+    stock: Optional[int] = Field(None, ge=0)
 
 class ProductUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     price: Optional[float] = None
+    # Sets the units left; null stops tracking stock for the product
+    stock: Optional[int] = Field(None, ge=0)
 
 class Product(ProductBase):
     id: int
     page_id: int
+    # On the public storefront this can lag by up to the storefront cache TTL;
+    # checkout always checks the live value
+    stock: Optional[int] = None
     model_config = ConfigDict(from_attributes=True)
 
+# One row of a bulk import: rows with an `id` update that product, rows without one create a new product
+class ProductImportRow(ProductBase):
+    id: Optional[int] = None
+
+class ProductImportError(BaseModel):
+    row: int
+    error: str
+
+class ProductImportResult(BaseModel):
+    created: int
+    updated: int
+    errors: List[ProductImportError] = []
+
 # --- Page Schemas ---
 class PageCreate(BaseModel):
     title: str
@@ -65,13 +91,13 @@ class Page(BaseModel):
 # The customer's cart will be a list of these
 class OrderItemCreate(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(gt=0)
 
 # Data shape for a full order when creating it
 class OrderCreate(BaseModel):
     customer_name: str
     customer_phone: str
-    items: List[OrderItemCreate]
+    items: List[OrderItemCreate] = Field(min_length=1)
 
 # Data shape for a single item when returned from the API
 class OrderItem(BaseModel):
@@ -102,12 +128,12 @@ class Page(BaseModel):
 
 class OrderItemCreate(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(gt=0)
 
 class OrderCreate(BaseModel):
     customer_name: str
     customer_phone: str
-    items: List[OrderItemCreate]
+    items: List[OrderItemCreate] = Field(min_length=1)
 
 class OrderItem(BaseModel):
     id: int
@@ -123,4 +149,44 @@ class Order(BaseModel):
     total_price: float
     created_at: datetime # ADD THIS LINE
     items: List[OrderItem] = []
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+# --- Sales analytics ---
+class SalesBucket(BaseModel):
+    start: date  # first day of the day, ISO week (Monday) or month
+    revenue: float
+    order_count: int
+    units: int
+    average_basket: float
+
+class ProductSales(BaseModel):
+    product_name: str
+    units: int
+    revenue: float
+
+class SalesReport(BaseModel):
+    start: date
+    end: date
+    bucket: str
+    totals: SalesBucket
+    buckets: List[SalesBucket]
+    products: List[ProductSales]
+
+# --- Storefront Traffic Schemas ---
+class TrafficDay(BaseModel):
+    day: date
+    views: int
+    clicks: int
+
+class ProductClicks(BaseModel):
+    product_id: int
+    product_name: Optional[str] = None  # None once the product has been deleted
+    clicks: int
+
+class TrafficReport(BaseModel):
+    start: date
+    end: date
+    views: int
+    clicks: int
+    days: List[TrafficDay]
+    products: List[ProductClicks]
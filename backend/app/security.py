@@ -1,22 +1,40 @@
+import hashlib
+import hmac
+import os
+import secrets
+import time
 from datetime import datetime, timedelta, timezone
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
 
 # FIX: Changed from '..' to '.' to import from the same 'app' directory
-from . import crud, schemas 
-from .database import get_db
+from . import crud, hashing, metrics, schemas 
+from .cache import TTLCache, principal_cache
+from .database import DbSession, get_db, run
 
 # --- Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs in `hashing.hashing_pool`; when that pool is saturated we answer
+# 503 right away rather than queueing more CPU work behind it.
+async def _run_hashing(fn, *args):
+    start = time.perf_counter()
+    try:
+        return await hashing.hashing_pool.run(fn, *args)
+    except hashing.HashingPoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+    finally:
+        metrics.record_hashing(time.perf_counter() - start)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Returns whether the password matches, plus a replacement hash if the cost policy changed."""
+    return await _run_hashing(hashing.verify_and_update, plain_password, hashed_password)
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+async def get_password_hash(password: str) -> str:
+    return await _run_hashing(hashing.hash_password, password)
 
 # --- JWT Configuration ---
 SECRET_KEY = "your-super-secret-key-that-is-long-and-random"
@@ -32,23 +50,114 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def credential_version(user) -> str:
+    """
+    The user's credential version, embedded in tokens as `cv`. A password
+    change bumps it, which invalidates older tokens; a rehash under a new cost
+    policy keeps it.
+    """
+    return str(user.credential_version)
+
+def create_user_access_token(user_id: int, email: str, credential_version: str) -> str:
+    return create_access_token(data={"sub": email, "uid": user_id, "cv": credential_version})
+
+# --- Refresh Tokens ---
+# Opaque "<id>.<signature>" strings, where the signature is an HMAC of the id:
+# forged or mangled tokens are turned away without a query, and the database
+# only ever stores ids. Renewing a session costs that HMAC plus one update by
+# primary key, instead of the bcrypt verification a password login needs.
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+def _refresh_token_signature(token_id: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), b"refresh:" + token_id.encode(), hashlib.sha256).hexdigest()[:32]
+
+def new_refresh_token() -> tuple[str, str]:
+    """Returns (id to store, token to hand to the client)."""
+    token_id = secrets.token_urlsafe(16)
+    return token_id, f"{token_id}.{_refresh_token_signature(token_id)}"
+
+def refresh_token_id(token: str) -> str | None:
+    """The id of a refresh token with a valid signature, else None."""
+    token_id, _, signature = token.partition(".")
+    if not token_id or not hmac.compare_digest(signature, _refresh_token_signature(token_id)):
+        return None
+    return token_id
+
+def refresh_token_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+
+# --- Token Verification ---
+# Verified payloads of recently seen tokens, so hot tokens skip the HMAC check.
+# Only successfully decoded tokens are stored, and `exp` is re-checked on every hit.
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+_verified_tokens = TTLCache(max_entries=TOKEN_CACHE_MAX_ENTRIES, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def decode_access_token(token: str) -> dict:
+    """Returns the token's claims, raising JWTError if it is invalid or expired."""
+    payload = _verified_tokens.get(token)
+    if payload is not None:
+        if payload["exp"] <= datetime.now(timezone.utc).timestamp():
+            _verified_tokens.pop(token)
+            raise JWTError("Signature has expired.")
+        return payload
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if "exp" in payload:
+        _verified_tokens.set(token, payload)
+    return payload
+
+# --- Internal Endpoints ---
+# Operational endpoints (pool and metrics) are only served when INTERNAL_API_TOKEN
+# is set, and then only to callers sending it in the X-Internal-Token header.
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+def require_internal_token(x_internal_token: str | None = Header(None)):
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_internal_token or not hmac.compare_digest(x_internal_token, INTERNAL_API_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid internal token.")
+
 # --- Dependency to get the current user ---
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: DbSession = Depends(get_db)):
+    """
+    Resolves the bearer token to a user. Tokens carrying `uid` and `cv` claims
+    are served from `principal_cache` without touching the database; older
+    tokens that only carry `sub` fall back to a lookup by email. A cached entry
+    whose version differs from the token's is treated as a miss: the token may
+    come from another worker that has seen a newer version of the user.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        token_data = schemas.TokenData(
+            email=email, user_id=payload.get("uid"), credential_version=payload.get("cv")
+        )
     except JWTError:
         raise credentials_exception
-    
-    user = crud.get_user_by_email(db, email=token_data.email)
+
+    if token_data.user_id is not None:
+        cached = principal_cache.get(token_data.user_id)
+        if cached is not None:
+            principal, version = cached
+            if version == token_data.credential_version:
+                return principal
+            principal_cache.pop(token_data.user_id)
+        user = await run(db, crud.get_user, user_id=token_data.user_id)
+    else:
+        user = await run(db, crud.get_user_by_email, email=token_data.email)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+
+    version = credential_version(user)
+    if token_data.credential_version is not None and version != token_data.credential_version:
+        raise credentials_exception
+    principal = schemas.User.model_validate(user)
+    principal_cache.set(user.id, (principal, version))
+    return principal
\ No newline at end of file
@@ -0,0 +1,199 @@
+# File: backend/app/snapshots.py
+#
+# Pre-rendered public storefronts. GET /pages/{slug} is served from the page's
+# storefront_snapshots row: the `schemas.Page` JSON rendered ahead of time and
+# stored with gzip and brotli copies, so loading a storefront is one indexed
+# read with no serialization or compression.
+#
+# - An edit to a page or its products marks its snapshot dirty in the edit's
+#   own transaction and, once committed, schedules a render in the worker that
+#   handled it. Until the new snapshot is saved, readers that see the mark
+#   render the page from its tables as before, so an edit shows up at once.
+# - Renders are debounced per page: SNAPSHOT_DEBOUNCE_SECONDS after its latest
+#   change, but no later than SNAPSHOT_MAX_DELAY_SECONDS after the first one,
+#   so a seller saving ten products in a row costs one render.
+# - Checkouts that take stock only schedule a render, without the dirty mark:
+#   stock levels on a storefront may trail by up to SNAPSHOT_MAX_DELAY_SECONDS,
+#   and checkout enforces stock itself.
+# - A worker that dies with renders pending leaves dirty marks behind; readers
+#   schedule a render once a mark is older than SNAPSHOT_MAX_DELAY_SECONDS, and
+#   for any snapshot older than SNAPSHOT_MAX_AGE_SECONDS.
+
+import asyncio
+import gzip
+import logging
+import os
+import time
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timezone
+
+import brotli
+from fastapi.concurrency import run_in_threadpool
+
+from . import crud, database, metrics, schemas
+from .cache import CachedPage, storefront_cache
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DEBOUNCE_SECONDS = float(os.getenv("SNAPSHOT_DEBOUNCE_SECONDS", "0.5"))
+SNAPSHOT_MAX_DELAY_SECONDS = float(os.getenv("SNAPSHOT_MAX_DELAY_SECONDS", "5"))
+SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", "300"))
+# Brotli's best setting takes tens of milliseconds, but snapshots are rendered
+# once per edit rather than per request
+SNAPSHOT_BROTLI_QUALITY = int(os.getenv("SNAPSHOT_BROTLI_QUALITY", "11"))
+# For pages a reader renders itself while there is no current snapshot
+QUICK_BROTLI_QUALITY = 5
+
+# --- Rendering ---
+def _compress(page_id: int, body: bytes, brotli_quality: int) -> CachedPage:
+    return CachedPage(
+        page_id,
+        body,
+        gzip.compress(body, compresslevel=9, mtime=0),
+        brotli.compress(body, quality=brotli_quality),
+    )
+
+async def render(db_page, brotli_quality: int = SNAPSHOT_BROTLI_QUALITY) -> CachedPage:
+    """Serializes a page loaded with its products, compressing it off the event loop."""
+    body = schemas.Page.model_validate(db_page).model_dump_json().encode()
+    return await run_in_threadpool(_compress, db_page.id, body, brotli_quality)
+
+def from_snapshot(snapshot) -> CachedPage:
+    """A `crud.get_storefront_snapshot` row as served."""
+    return CachedPage(snapshot.page_id, snapshot.body, snapshot.body_gzip, snapshot.body_br, snapshot.etag)
+
+def _age(moment: datetime) -> float:
+    if moment.tzinfo is None:
+        # SQLite hands back naive datetimes; they are stored in UTC
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - moment).total_seconds()
+
+def is_current(snapshot) -> bool:
+    """Whether the snapshot includes every edit made to its page."""
+    return snapshot.dirty_since is None
+
+def needs_render(snapshot) -> bool:
+    """
+    Whether a reader should schedule a render: there is no snapshot, the
+    worker that marked it dirty has had time to render it and has not, or it
+    is old enough that stock changes may have gone missing.
+    """
+    if snapshot is None:
+        return True
+    if snapshot.dirty_since is not None and _age(snapshot.dirty_since) > SNAPSHOT_MAX_DELAY_SECONDS:
+        return True
+    return _age(snapshot.rendered_at) > SNAPSHOT_MAX_AGE_SECONDS
+
+@asynccontextmanager
+async def _primary_session():
+    if database.ASYNC_DATABASE:
+        async with database.AsyncSessionLocal() as db:
+            yield db
+    else:
+        with database.SessionLocal() as db:
+            yield db
+
+async def regenerate(page_id: int):
+    """Renders the page from the primary, saves its snapshot and refreshes this worker's cache."""
+    start = time.perf_counter()
+    version = storefront_cache.version
+    rendered_at = datetime.now(timezone.utc)
+    async with _primary_session() as db:
+        db_page, dirty_since = await database.run(db, crud.get_storefront_source, page_id=page_id)
+        if db_page is None:
+            return
+        slug = db_page.slug
+        cached = await render(db_page)
+        await database.run(
+            db,
+            crud.save_storefront_snapshot,
+            page_id=page_id,
+            slug=slug,
+            etag=cached.etag,
+            body=cached.body,
+            body_gzip=cached.body_gzip,
+            body_br=cached.body_br,
+            rendered_at=rendered_at,
+            seen_dirty_since=dirty_since,
+        )
+    storefront_cache.set(slug, cached, version)
+    metrics.STOREFRONT_RENDER_TIME.observe(time.perf_counter() - start)
+
+# --- Debounced renders ---
+class SnapshotScheduler:
+    """Renders changed pages from a background task in each worker, debounced per page."""
+
+    def __init__(self, debounce_seconds: float, max_delay_seconds: float):
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        # page id -> (first change, when to render), in event loop time
+        self._pending: dict[int, tuple[float, float]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        storefront_cache.on_change = self.schedule
+
+    async def stop(self):
+        """Renders whatever is still pending, then stops the task."""
+        if self._task is None:
+            return
+        storefront_cache.on_change = None
+        # Before Python 3.12, asyncio.wait_for swallows a cancellation that
+        # arrives as the wakeup fires; the flag ends the loop regardless
+        self._stopping = True
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        pending, self._pending = self._pending, {}
+        for page_id in pending:
+            with suppress(Exception):
+                await regenerate(page_id)
+
+    def schedule(self, page_id: int):
+        """Asks for the page to be rendered. Safe to call from any thread, e.g. crud in the threadpool."""
+        if self._loop is None:
+            return
+        with suppress(RuntimeError):
+            # The loop is closed during shutdown
+            self._loop.call_soon_threadsafe(self._schedule, page_id)
+
+    def _schedule(self, page_id: int):
+        now = self._loop.time()
+        first_change = self._pending[page_id][0] if page_id in self._pending else now
+        self._pending[page_id] = (
+            first_change,
+            min(now + self.debounce_seconds, first_change + self.max_delay_seconds),
+        )
+        self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            page_id, (_, due) = min(self._pending.items(), key=lambda entry: entry[1][1])
+            delay = due - self._loop.time()
+            if delay > 0:
+                # Woken early when a page is scheduled, which may be due sooner
+                self._wakeup.clear()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                continue
+            del self._pending[page_id]
+            try:
+                await regenerate(page_id)
+            except Exception:
+                # The dirty mark stays, so readers keep rendering from the tables
+                # and schedule the page again once the mark is old
+                logger.exception("storefront snapshot render failed", extra={"page_id": page_id})
+
+snapshot_scheduler = SnapshotScheduler(SNAPSHOT_DEBOUNCE_SECONDS, SNAPSHOT_MAX_DELAY_SECONDS)
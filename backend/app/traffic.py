@@ -0,0 +1,111 @@
+# File: backend/app/traffic.py
+#
+# Storefront views and product clicks. Counting happens in memory in each
+# worker: GET /pages/{slug} and POST /pages/{slug}/products/{id}/clicks only
+# bump a dict entry, with no database write on the request path. A background
+# task adds the accumulated counts to page_daily_traffic every
+# TRAFFIC_FLUSH_SECONDS with one batched upsert per flush.
+#
+# What can be lost:
+# - A worker that crashes or is killed loses the counts it has not flushed
+#   yet, at most TRAFFIC_FLUSH_SECONDS worth of its own traffic. A graceful
+#   shutdown flushes first.
+# - When a flush fails, its counts are kept and retried with the next one.
+#   While the database stays unreachable, a worker holds at most
+#   TRAFFIC_MAX_KEYS (page, day, product) entries; increments for new entries
+#   past that are dropped and counted in storefront_traffic_counts_dropped_total.
+# Counts are for reporting, not billing: a flush that committed but still
+# reported an error (a connection lost during COMMIT) is retried, and counted twice.
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import suppress
+from datetime import datetime, timezone
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import crud, database, metrics
+
+logger = logging.getLogger(__name__)
+
+TRAFFIC_FLUSH_SECONDS = float(os.getenv("TRAFFIC_FLUSH_SECONDS", "10"))
+TRAFFIC_MAX_KEYS = int(os.getenv("TRAFFIC_MAX_KEYS", "100000"))
+
+def _write_counts_sync(counts):
+    with database.SessionLocal() as db:
+        crud.add_traffic_counts(db, counts)
+
+async def write_counts(counts: dict):
+    """Runs crud.add_traffic_counts on a session of its own."""
+    if database.ASYNC_DATABASE:
+        async with database.AsyncSessionLocal() as db:
+            return await db.run_sync(crud.add_traffic_counts, counts)
+    return await run_in_threadpool(_write_counts_sync, counts)
+
+class TrafficCounter:
+    """
+    Per-worker view and click counts, keyed like page_daily_traffic rows.
+    Only touched from the event loop, so it needs no lock.
+    """
+
+    def __init__(self, flush_seconds: float, max_keys: int):
+        self.flush_seconds = flush_seconds
+        self.max_keys = max_keys
+        # (page_id, UTC day, product_id) -> [views, clicks]
+        self._counts: dict = {}
+        self._stopping: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def view(self, page_id: int):
+        self._add((page_id, datetime.now(timezone.utc).date(), crud.PAGE_TRAFFIC_ROW), 1, 0)
+
+    def click(self, page_id: int, product_id: int):
+        self._add((page_id, datetime.now(timezone.utc).date(), product_id), 0, 1)
+
+    def _add(self, key, views: int, clicks: int):
+        counts = self._counts.get(key)
+        if counts is None:
+            if len(self._counts) >= self.max_keys:
+                metrics.TRAFFIC_COUNTS_DROPPED.inc()
+                return
+            counts = self._counts[key] = [0, 0]
+        counts[0] += views
+        counts[1] += clicks
+
+    async def flush(self):
+        """Writes what has been counted so far; on failure the counts are kept for the next flush."""
+        if not self._counts:
+            return
+        counts, self._counts = self._counts, {}
+        start = time.perf_counter()
+        try:
+            await write_counts(counts)
+        except Exception:
+            logger.exception("storefront traffic flush failed", extra={"entries": len(counts)})
+            for key, (views, clicks) in counts.items():
+                self._add(key, views, clicks)
+            return
+        metrics.TRAFFIC_FLUSH_TIME.observe(time.perf_counter() - start)
+
+    async def start(self):
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Writes whatever is left, then stops the task."""
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        # Not cancelled on shutdown, so a flush in progress is never cut short
+        while not self._stopping.is_set():
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._stopping.wait(), self.flush_seconds)
+            await self.flush()
+
+traffic_counter = TrafficCounter(TRAFFIC_FLUSH_SECONDS, TRAFFIC_MAX_KEYS)
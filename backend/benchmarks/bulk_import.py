@@ -0,0 +1,57 @@
+# File: backend/benchmarks/bulk_import.py
+#
+# Rows per second for importing a catalog through POST /products/ one item at a
+# time versus a single POST /products/bulk (JSON array and CSV).
+# Run from backend/:  python -m benchmarks.bulk_import [--rows 2000]
+
+import argparse
+import asyncio
+import time
+
+from .common import create_schema, use_scratch_database
+
+async def run_benchmark(args):
+    import httpx
+    from app import crud, database, schemas, security
+    from app.main import app
+
+    create_schema()
+    with database.SessionLocal() as db:
+        user = crud.create_user(db, schemas.UserCreate(email="bulk@example.com", password="x"), hashed_password="x")
+        crud.create_user_page(db, schemas.PageCreate(title="Bulk Shop"), owner_id=user.id)
+        token = security.create_user_access_token(user.id, user.email, security.credential_version(user))
+    headers = {"Authorization": f"Bearer {token}"}
+    rows = [{"name": f"Product {i}", "description": "Imported", "price": 10 + i % 90} for i in range(args.rows)]
+    csv_body = "name,description,price\n" + "".join(f"{r['name']},{r['description']},{r['price']}\n" for r in rows)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+            start = time.perf_counter()
+            for row in rows:
+                response = await client.post("/products/", json=row)
+                assert response.status_code == 201, response.text
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            response = await client.post("/products/bulk", json=rows)
+            assert response.json()["created"] == args.rows, response.text
+            bulk_json = time.perf_counter() - start
+
+            start = time.perf_counter()
+            response = await client.post("/products/bulk", content=csv_body, headers={"Content-Type": "text/csv"})
+            assert response.json()["created"] == args.rows, response.text
+            bulk_csv = time.perf_counter() - start
+
+    for label, elapsed in [("single-item POST", single), ("bulk JSON", bulk_json), ("bulk CSV", bulk_csv)]:
+        print(f"{label:>17}: {args.rows / elapsed:>10.0f} rows/s  ({elapsed:.2f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+    use_scratch_database()
+    asyncio.run(run_benchmark(args))
+
+if __name__ == "__main__":
+    main()
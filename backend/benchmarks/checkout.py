@@ -0,0 +1,53 @@
+# File: backend/benchmarks/checkout.py
+#
+# Measures crud.create_order_for_page latency and statement count as the cart grows.
+# Run from backend/:  python -m benchmarks.checkout [--iterations 200]
+
+import argparse
+import time
+
+from .common import create_schema, summarize, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, models, schemas  # noqa: E402
+
+CART_SIZES = [1, 5, 10, 30, 100]
+
+def seed(db, product_count: int) -> tuple[int, list[int]]:
+    user = models.User(email="bench-checkout@example.com", hashed_password="x")
+    page = models.Page(slug="bench-checkout", title="Bench", owner=user)
+    page.products = [models.Product(name=f"Product {i}", price=1.0 + i) for i in range(product_count)]
+    db.add(page)
+    db.commit()
+    return page.id, [product.id for product in page.products]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    create_schema()
+    with database.SessionLocal() as db:
+        page_id, product_ids = seed(db, max(CART_SIZES))
+
+    print(f"{'cart':>6} {'stmts':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for cart_size in CART_SIZES:
+        order = schemas.OrderCreate(
+            customer_name="Bench",
+            customer_phone="000",
+            items=[schemas.OrderItemCreate(product_id=pid, quantity=1) for pid in product_ids[:cart_size]],
+        )
+        samples = []
+        statements = 0
+        for _ in range(args.iterations):
+            with database.SessionLocal() as db, database.count_statements() as stats:
+                start = time.perf_counter()
+                crud.create_order_for_page(db, order=order, page_id=page_id)
+                samples.append(time.perf_counter() - start)
+            statements = stats.statements
+        result = summarize(samples)
+        print(f"{cart_size:>6} {statements:>6} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8}")
+
+if __name__ == "__main__":
+    main()
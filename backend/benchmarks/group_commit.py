@@ -0,0 +1,122 @@
+# File: backend/benchmarks/group_commit.py
+#
+# Checkout throughput with one commit per order (ORDER_INGESTION_MODE=direct)
+# against group commit through ingest.OrderBatcher (batched), at the same
+# number of concurrent customers. Honours DATABASE_MODE, and DATABASE_URL when
+# it points at a scratch Postgres database; otherwise uses a fresh SQLite file.
+#
+# Run from backend/:
+#   python -m benchmarks.group_commit [--orders 2000] [--concurrency 64]
+#   DATABASE_URL=postgresql://.../bench python -m benchmarks.group_commit
+
+import argparse
+import asyncio
+import time
+
+from .common import create_schema, summarize, use_scratch_database
+
+use_scratch_database()
+
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+
+from app import crud, database, ingest, metrics, models, schemas  # noqa: E402
+
+def seed(product_count: int) -> tuple[int, list[int]]:
+    with database.SessionLocal() as db:
+        user = models.User(email="bench-group-commit@example.com", hashed_password="x")
+        page = models.Page(slug="bench-group-commit", title="Bench", owner=user)
+        page.products = [models.Product(name=f"Product {i}", price=1.0 + i) for i in range(product_count)]
+        db.add(page)
+        db.commit()
+        return page.id, [product.id for product in page.products]
+
+def _create_order_sync(page_id, order):
+    with database.SessionLocal() as db:
+        return crud.create_order_for_page(db, order=order, page_id=page_id)
+
+async def place_direct(page_id, order):
+    """What the endpoint does in direct mode: one transaction per order."""
+    if database.ASYNC_DATABASE:
+        async with database.AsyncSessionLocal() as db:
+            return await database.run(db, crud.create_order_for_page, order=order, page_id=page_id)
+    return await run_in_threadpool(_create_order_sync, page_id, order)
+
+async def drive(place, orders: list, page_id: int, concurrency: int) -> tuple[float, list[float], int]:
+    """
+    Places every order from `concurrency` customers in parallel. Returns the
+    wall time, the latencies of the orders placed and how many failed.
+    """
+    pending = iter(orders)
+    samples = []
+    failed = 0
+
+    async def customer():
+        nonlocal failed
+        for order in pending:
+            start = time.perf_counter()
+            try:
+                await place(page_id, order)
+            except Exception:
+                # SQLite gives up with "database is locked" when writers queue too long
+                failed += 1
+                continue
+            samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(customer() for _ in range(concurrency)))
+    return time.perf_counter() - start, samples, failed
+
+def report(mode: str, elapsed: float, samples: list[float], failed: int, mean_batch: float):
+    result = summarize(samples)
+    print(f"{mode:>8} {len(samples) / elapsed:>9.0f} {failed:>7} {mean_batch:>6.1f} "
+          f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8}")
+
+def batch_count() -> float:
+    return sum(s.value for m in metrics.ORDER_BATCH_SIZE.collect() for s in m.samples if s.name.endswith("_count"))
+
+async def run(args):
+    create_schema()
+    page_id, product_ids = seed(args.cart_size * 10)
+    orders = [
+        schemas.OrderCreate(
+            customer_name=f"Customer {n}",
+            customer_phone="000",
+            items=[
+                schemas.OrderItemCreate(product_id=product_ids[(n + i) % len(product_ids)], quantity=1)
+                for i in range(args.cart_size)
+            ],
+        )
+        for n in range(args.orders)
+    ]
+
+    # Fill the pool and the compiled statement cache before timing anything
+    await database.warm_pool()
+    await place_direct(page_id, orders[0])
+
+    print(f"{database.engine.dialect.name}, DATABASE_MODE={database.DATABASE_MODE}, "
+          f"{args.orders} orders of {args.cart_size} items, {args.concurrency} concurrent customers\n")
+    print(f"{'mode':>8} {'orders/s':>9} {'failed':>7} {'batch':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    report("direct", *await drive(place_direct, orders, page_id, args.concurrency), 1)
+
+    batcher = ingest.OrderBatcher(args.batch_size, args.batch_wait_ms / 1000, len(orders))
+    await batcher.start()
+    batches_before = batch_count()
+    elapsed, samples, failed = await drive(batcher.submit, orders, page_id, args.concurrency)
+    await batcher.stop()
+    report("batched", elapsed, samples, failed, len(orders) / max(1, batch_count() - batches_before))
+
+    await database.dispose_engines()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--cart-size", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=ingest.ORDER_BATCH_MAX_SIZE)
+    parser.add_argument("--batch-wait-ms", type=float, default=ingest.ORDER_BATCH_MAX_WAIT_MS)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# File: backend/benchmarks/load.py
+#
+# Mixed-traffic load test for the main API routes. Seeds a SQLite database,
+# runs app.main.app in-process over httpx's ASGI transport, and drives the
+# public storefront, checkout, login and order listing concurrently. Reports
+# throughput, p50/p95/p99 latency and SQL statements per request for each
+# route, writes the results as JSON and, given a baseline file, prints the
+# change against it.
+#
+# With --replica, reads on read-only routes go to a copy of the seeded SQLite
+# file, and the report shows the share of each route's statements that ran on
+# it. To use a real replica instead, set DATABASE_URL and DATABASE_REPLICA_URL.
+#
+# Run from backend/:
+#   python -m benchmarks.load --output baseline.json
+#   python -m benchmarks.load --output after.json --baseline baseline.json
+#   python -m benchmarks.load --replica
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+from .common import create_schema, summarize, use_scratch_database
+
+PASSWORD = "bench-password"
+SEED_BATCH_SIZE = 5000
+
+# Every request comes from the same client address, so per-client rate limits
+# (off by default, but an environment may turn them on) would turn most of
+# the load into 429s
+for _name in ("RATE_LIMIT_STOREFRONT_PER_CLIENT", "RATE_LIMIT_CHECKOUT_PER_CLIENT"):
+    os.environ.setdefault(_name, "0")
+
+# Relative share of requests per scenario
+DEFAULT_MIX = {"storefront": 60, "checkout": 15, "login": 5, "my_orders": 20}
+
+# --- Seeding ---
+def seed(pages: int, products_per_page: int, orders_per_page: int) -> list[dict]:
+    """
+    Inserts `pages` merchants, each with one page, its products and its order
+    history, and returns what the scenarios need to address them.
+    """
+    from sqlalchemy import insert
+    from app import database, hashing, models
+
+    rng = random.Random(0)
+    # Naive UTC, which is what SQLite hands back for orders placed through the API
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    hashed_password = hashing.hash_password(PASSWORD)
+
+    merchants = []
+    with database.engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": n, "email": f"merchant{n}@bench.example", "hashed_password": hashed_password}
+            for n in range(1, pages + 1)
+        ])
+        conn.execute(insert(models.Page), [
+            {"id": n, "slug": f"bench-shop-{n}", "title": f"Bench Shop {n}", "owner_id": n}
+            for n in range(1, pages + 1)
+        ])
+
+        product_rows, next_product_id = [], 1
+        for n in range(1, pages + 1):
+            ids = list(range(next_product_id, next_product_id + products_per_page))
+            next_product_id += products_per_page
+            product_rows.extend(
+                {"id": pid, "name": f"Product {pid}", "price": round(rng.uniform(1, 100), 2), "page_id": n}
+                for pid in ids
+            )
+            merchants.append({
+                "user_id": n,
+                "email": f"merchant{n}@bench.example",
+                # A new user's credential version, as issued in tokens
+                "credential_version": "0",
+                "slug": f"bench-shop-{n}",
+                "product_ids": ids,
+            })
+        for start in range(0, len(product_rows), SEED_BATCH_SIZE):
+            conn.execute(insert(models.Product), product_rows[start:start + SEED_BATCH_SIZE])
+
+        order_rows, item_rows, next_order_id = [], [], 1
+        for merchant in merchants:
+            for _ in range(orders_per_page):
+                total = 0.0
+                for pid in rng.sample(merchant["product_ids"], min(3, len(merchant["product_ids"]))):
+                    quantity = rng.randint(1, 3)
+                    price = product_rows[pid - 1]["price"]
+                    item_rows.append({
+                        "order_id": next_order_id, "product_name": f"Product {pid}",
+                        "quantity": quantity, "price_per_item": price,
+                    })
+                    total += quantity * price
+                order_rows.append({
+                    "id": next_order_id, "customer_name": "Bench Customer", "customer_phone": "000",
+                    "total_price": round(total, 2), "page_id": merchant["user_id"],
+                    "created_at": now - timedelta(minutes=rng.randint(0, 90 * 24 * 60)),
+                })
+                next_order_id += 1
+            if len(item_rows) >= SEED_BATCH_SIZE:
+                conn.execute(insert(models.Order), order_rows)
+                conn.execute(insert(models.OrderItem), item_rows)
+                order_rows, item_rows = [], []
+        if order_rows:
+            conn.execute(insert(models.Order), order_rows)
+            conn.execute(insert(models.OrderItem), item_rows)
+    return merchants
+
+# --- Scenarios ---
+# Each takes (client, merchant, rng) and returns the response.
+async def storefront(client, merchant, rng):
+    return await client.get(f"/pages/{merchant['slug']}")
+
+async def checkout(client, merchant, rng):
+    product_ids = rng.sample(merchant["product_ids"], min(rng.randint(1, 5), len(merchant["product_ids"])))
+    return await client.post(f"/orders/{merchant['slug']}", json={
+        "customer_name": "Load Test",
+        "customer_phone": "000",
+        "items": [{"product_id": pid, "quantity": rng.randint(1, 3)} for pid in product_ids],
+    })
+
+async def login(client, merchant, rng):
+    return await client.post("/users/login", data={"username": merchant["email"], "password": PASSWORD})
+
+async def my_orders(client, merchant, rng):
+    return await client.get("/orders/my-orders", headers=merchant["auth"])
+
+SCENARIOS = {"storefront": storefront, "checkout": checkout, "login": login, "my_orders": my_orders}
+
+# --- Runner ---
+async def run_load(args, merchants: list[dict]) -> dict:
+    import httpx
+    from app import database, security
+    from app.main import app
+
+    for merchant in merchants:
+        token = security.create_user_access_token(
+            merchant["user_id"], merchant["email"], merchant["credential_version"]
+        )
+        merchant["auth"] = {"Authorization": f"Bearer {token}"}
+
+    names = [name for name in SCENARIOS if args.mix.get(name)]
+    weights = [args.mix[name] for name in names]
+    samples = {name: [] for name in names}
+    statements = {name: 0 for name in names}
+    replica_statements = {name: 0 for name in names}
+    statuses = {name: {} for name in names}
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # One request per scenario first, so pool start-up and lazy imports are not measured
+            warm_rng = random.Random(1)
+            for name in names:
+                await SCENARIOS[name](client, merchants[0], warm_rng)
+
+            remaining = args.requests
+
+            async def worker(seed: int):
+                nonlocal remaining
+                rng = random.Random(seed)
+                while remaining > 0:
+                    remaining -= 1
+                    name = rng.choices(names, weights)[0]
+                    merchant = rng.choice(merchants)
+                    with database.count_statements() as stats:
+                        start = time.perf_counter()
+                        response = await SCENARIOS[name](client, merchant, rng)
+                        samples[name].append(time.perf_counter() - start)
+                    statements[name] += stats.statements
+                    replica_statements[name] += stats.replica_statements
+                    codes = statuses[name]
+                    codes[response.status_code] = codes.get(response.status_code, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(seed) for seed in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+    scenarios = {}
+    for name in names:
+        count = len(samples[name])
+        scenarios[name] = {
+            **summarize(samples[name]),
+            "throughput_rps": round(count / elapsed, 2),
+            "queries_per_request": round(statements[name] / count, 2) if count else 0.0,
+            "replica_share": round(replica_statements[name] / statements[name], 3) if statements[name] else 0.0,
+            "errors": sum(n for code, n in statuses[name].items() if code >= 400),
+            "status_codes": {str(code): n for code, n in sorted(statuses[name].items())},
+        }
+    all_samples = [sample for name in names for sample in samples[name]]
+    return {
+        "config": {
+            "pages": args.pages,
+            "products_per_page": args.products_per_page,
+            "orders_per_page": args.orders_per_page,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mix": {name: args.mix[name] for name in names},
+            "database_mode": database.DATABASE_MODE,
+            "read_replica": bool(database.DATABASE_REPLICA_URL),
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "elapsed_s": round(elapsed, 3),
+        "overall": {
+            **summarize(all_samples),
+            "throughput_rps": round(len(all_samples) / elapsed, 2),
+            "replica_share": round(sum(replica_statements.values()) / max(1, sum(statements.values())), 3),
+        },
+        "scenarios": scenarios,
+    }
+
+# --- Reporting ---
+METRICS = ["throughput_rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request", "replica_share", "errors"]
+
+def _change(current, previous) -> str:
+    if previous in (None, 0):
+        return ""
+    return f"({(current - previous) / previous * 100:+.1f}%)"
+
+def print_report(results: dict, baseline: dict | None):
+    rows = [("overall", results["overall"], (baseline or {}).get("overall"))]
+    rows += [
+        (name, result, (baseline or {}).get("scenarios", {}).get(name))
+        for name, result in results["scenarios"].items()
+    ]
+    print(f"{'route':<12} " + " ".join(f"{metric:>20}" for metric in METRICS))
+    for name, result, previous in rows:
+        cells = []
+        for metric in METRICS:
+            value = result.get(metric)
+            if value is None:
+                cells.append(f"{'-':>20}")
+                continue
+            change = _change(value, previous.get(metric)) if previous else ""
+            cells.append(f"{value:>10} {change:>9}")
+        print(f"{name:<12} " + " ".join(cells))
+    if baseline and baseline.get("config") != results["config"]:
+        print("note: the baseline was recorded with a different configuration:", baseline.get("config"))
+
+def _parse_mix(value: str) -> dict:
+    mix = dict(DEFAULT_MIX)
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = int(weight)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-traffic load test for the API.")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--products-per-page", type=int, default=20)
+    parser.add_argument("--orders-per-page", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000, help="total requests across all scenarios")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument(
+        "--mix", type=_parse_mix, default=dict(DEFAULT_MIX),
+        help="scenario weights, e.g. storefront=50,login=0 (default: %s)"
+        % ",".join(f"{name}={weight}" for name, weight in DEFAULT_MIX.items()),
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results from an earlier run to compare against")
+    parser.add_argument(
+        "--replica", action="store_true",
+        help="serve read-only routes from a copy of the seeded SQLite database",
+    )
+    args = parser.parse_args()
+
+    database_url = use_scratch_database()
+    if args.replica:
+        primary_path = database_url.removeprefix("sqlite:///")
+        replica_path = primary_path + ".replica"
+        os.environ["DATABASE_REPLICA_URL"] = f"sqlite:///{replica_path}"
+        # Nothing replicates writes made during the run, so skip the lag check
+        os.environ.setdefault("DB_REPLICA_MAX_LAG_SECONDS", "0")
+    create_schema()
+    started = time.perf_counter()
+    merchants = seed(args.pages, args.products_per_page, args.orders_per_page)
+    if args.replica:
+        with closing(sqlite3.connect(primary_path)) as primary, closing(sqlite3.connect(replica_path)) as replica:
+            primary.backup(replica)
+    print(f"seeded {args.pages} pages, {args.pages * args.products_per_page} products and "
+          f"{args.pages * args.orders_per_page} orders in {time.perf_counter() - started:.1f}s")
+
+    results = asyncio.run(run_load(args, merchants))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+if __name__ == "__main__":
+    main()
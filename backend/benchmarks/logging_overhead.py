@@ -0,0 +1,125 @@
+# File: backend/benchmarks/logging_overhead.py
+#
+# Cost of app.logs on the request path:
+#   1. one log call with logging off, on (writer to /dev/null), and on with a
+#      sink that has stopped draining, where records are dropped instead of
+#      blocking the caller
+#   2. login throughput through the in-process app with logging off and on
+# bcrypt defaults to 4 rounds here so the logging share of a login is visible;
+# set BCRYPT_ROUNDS=12 for production-like numbers.
+# Run from backend/:  python -m benchmarks.logging_overhead [--calls 100000 --logins 400]
+
+import argparse
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from .common import create_schema, summarize, use_scratch_database
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+use_scratch_database()
+
+from app import logs, metrics  # noqa: E402
+
+app_logger = logging.getLogger("app")
+bench_logger = logging.getLogger("app.bench")
+
+def _devnull_handler() -> logging.Handler:
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    handler.setFormatter(logs.JsonFormatter())
+    return handler
+
+class StalledHandler(logging.Handler):
+    """A sink that blocks until released, like stdout piped to a stuck collector."""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+
+    def emit(self, record):
+        self.released.wait()
+
+def per_call_ns(calls: int) -> float:
+    start = time.perf_counter_ns()
+    for n in range(calls):
+        bench_logger.info("order placed", extra={"order_id": n, "total": 12.5})
+    return (time.perf_counter_ns() - start) / calls
+
+def dropped() -> float:
+    return sum(s.value for m in metrics.LOG_RECORDS_DROPPED.collect() for s in m.samples if s.name.endswith("_total"))
+
+def log_call_costs(calls: int):
+    level = app_logger.level
+    app_logger.setLevel(logging.CRITICAL + 1)
+    print(f"log call, logging off:        {per_call_ns(calls) / 1000:.2f} us")
+    app_logger.setLevel(level)
+
+    writer = logs.LogWriter(_devnull_handler)
+    writer.start()
+    print(f"log call, logging on:         {per_call_ns(calls) / 1000:.2f} us")
+    writer.stop()
+
+    stalled = StalledHandler()
+    writer = logs.LogWriter(lambda: stalled)
+    writer.start()
+    before = dropped()
+    cost = per_call_ns(calls + logs.LOG_QUEUE_SIZE)
+    print(f"log call, sink stalled:       {cost / 1000:.2f} us, {dropped() - before:.0f} records dropped")
+    stalled.released.set()
+    writer.stop()
+
+async def login_throughput(logins: int, concurrency: int) -> tuple[float, list[float], dict]:
+    import httpx
+    from app.main import app
+
+    samples, statuses = [], {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            form = {"username": "bench-logging@example.com", "password": "secret"}
+            await client.post("/users/login", data=form)
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def login():
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post("/users/login", data=form)
+                    samples.append(time.perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(login() for _ in range(logins)))
+            elapsed = time.perf_counter() - start
+    return elapsed, samples, statuses
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    log_call_costs(args.calls)
+
+    from app import crud, database, hashing, schemas
+
+    create_schema()
+    with database.SessionLocal() as db:
+        crud.create_user(
+            db, schemas.UserCreate(email="bench-logging@example.com", password="secret"),
+            hashed_password=hashing.hash_password("secret"),
+        )
+    logs.log_writer.handler_factory = _devnull_handler
+    print(f"\nbcrypt rounds {hashing.BCRYPT_ROUNDS}, {args.logins} logins, {args.concurrency} concurrent")
+    level = app_logger.level
+    for label, label_level in (("logging off", logging.CRITICAL + 1), ("logging on", level)):
+        app_logger.setLevel(label_level)
+        elapsed, samples, statuses = asyncio.run(login_throughput(args.logins, args.concurrency))
+        result = summarize(samples)
+        print(f"{label:<12} {statuses.get(200, 0) / elapsed:>7.1f} logins/s  "
+              f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  statuses {statuses}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# File: backend/benchmarks/login_storm.py
+#
+# Fires a burst of concurrent logins at the in-process app while a reader keeps
+# loading a public storefront, and reports p99 latency for both. With bcrypt
+# in the hashing pool, storefront latency should stay flat during the storm.
+# With --refresh, the same sessions renew through POST /users/token/refresh
+# instead, which skips bcrypt altogether.
+# Run from backend/:  python -m benchmarks.login_storm [--logins 200 --concurrency 50] [--refresh]
+
+import argparse
+import asyncio
+import time
+
+from .common import create_schema, summarize, use_scratch_database
+
+async def storm(args):
+    import httpx
+    from app import crud, database, hashing, schemas
+    from app.main import app
+
+    create_schema()
+    with database.SessionLocal() as db:
+        user = crud.create_user(
+            db, schemas.UserCreate(email="storm@example.com", password="secret"),
+            hashed_password=hashing.hash_password("secret"),
+        )
+        crud.create_user_page(db, schemas.PageCreate(title="Storm Shop"), owner_id=user.id)
+
+    login_samples, storefront_samples = [], []
+    statuses: dict[int, int] = {}
+    done = asyncio.Event()
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # Warm the hashing pool so process start-up is not measured
+            await client.post("/users/login", data={"username": "storm@example.com", "password": "secret"})
+
+            semaphore = asyncio.Semaphore(args.concurrency)
+            # One refresh token chain per concurrent session, each started with a login
+            refresh_tokens = asyncio.Queue()
+            if args.refresh:
+                for _ in range(args.concurrency):
+                    response = await client.post(
+                        "/users/login", data={"username": "storm@example.com", "password": "secret"}
+                    )
+                    refresh_tokens.put_nowait(response.json()["refresh_token"])
+
+            async def login():
+                async with semaphore:
+                    start = time.perf_counter()
+                    if args.refresh:
+                        refresh_token = await refresh_tokens.get()
+                        response = await client.post("/users/token/refresh", json={"refresh_token": refresh_token})
+                        # A shed request (503) leaves the old token unused
+                        refresh_tokens.put_nowait(response.json().get("refresh_token") or refresh_token)
+                    else:
+                        response = await client.post(
+                            "/users/login", data={"username": "storm@example.com", "password": "secret"}
+                        )
+                    login_samples.append(time.perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            async def read_storefront():
+                while not done.is_set():
+                    start = time.perf_counter()
+                    await client.get("/pages/storm-shop")
+                    storefront_samples.append(time.perf_counter() - start)
+                    await asyncio.sleep(0.005)
+
+            reader = asyncio.create_task(read_storefront())
+            started = time.perf_counter()
+            await asyncio.gather(*(login() for _ in range(args.logins)))
+            elapsed = time.perf_counter() - started
+            done.set()
+            await reader
+
+    print(f"hashing pool: {hashing.HASH_POOL_WORKERS} workers, queue limit {hashing.HASH_QUEUE_LIMIT}, "
+          f"bcrypt rounds {hashing.BCRYPT_ROUNDS}")
+    kind = "refreshes" if args.refresh else "logins"
+    print(f"{args.logins} {kind} in {elapsed:.2f}s, status codes: {statuses}")
+    print(f"{kind:<11}", summarize(login_samples))
+    print("storefront ", summarize(storefront_samples))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--refresh", action="store_true", help="renew sessions with refresh tokens instead")
+    args = parser.parse_args()
+    use_scratch_database()
+    asyncio.run(storm(args))
+
+if __name__ == "__main__":
+    main()
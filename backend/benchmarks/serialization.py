@@ -0,0 +1,74 @@
+# File: backend/benchmarks/serialization.py
+#
+# Encode time per 1,000 orders (3 items each) for /orders/my-orders:
+#   before: ORM objects -> response_model validation -> stdlib json (FastAPI's old path)
+#   after:  column-tuple dicts -> orjson (what crud.get_orders_for_page returns now)
+# Run from backend/:  python -m benchmarks.serialization [--orders 1000 --repeat 50]
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from .common import summarize, use_scratch_database
+
+use_scratch_database()
+
+import orjson  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app import models, schemas  # noqa: E402
+
+def build_orders(count: int):
+    # Naive, as SQLite returns it; with tz-aware values pydantic writes 'Z' where orjson writes '+00:00'
+    created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    orm_orders, rows = [], []
+    for i in range(count):
+        items = [
+            {"id": i * 3 + n, "product_name": f"Product {n}", "quantity": n + 1, "price_per_item": 9.5}
+            for n in range(3)
+        ]
+        order = {
+            "id": i, "customer_name": f"Customer {i}", "customer_phone": "+91 90000 00000",
+            "total_price": 57.0, "created_at": created_at, "items": items,
+        }
+        rows.append(order)
+        orm_orders.append(models.Order(
+            **{key: value for key, value in order.items() if key != "items"},
+            items=[models.OrderItem(**item) for item in items],
+        ))
+    return orm_orders, rows
+
+def time_it(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    orm_orders, rows = build_orders(args.orders)
+    adapter = TypeAdapter(List[schemas.Order])
+
+    def before():
+        validated = adapter.validate_python(orm_orders, from_attributes=True)
+        payload = adapter.dump_python(validated, mode="json")
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def after():
+        return orjson.dumps(rows)
+
+    assert json.loads(before()) == json.loads(after())
+    per = f"per {args.orders} orders"
+    print(f"before ({per}):", summarize(time_it(before, args.repeat)))
+    print(f"after  ({per}):", summarize(time_it(after, args.repeat)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# File: backend/benchmarks/stock_contention.py
+#
+# Limited-drop check: fires a burst of parallel checkouts at a product with
+# little stock through the in-process app, asserts that exactly as many orders
+# succeed as there were units (the rest get a 409) and reports checkout latency
+# under that contention. Buyers shed with a 503 by admission control retry
+# with exponential backoff, as real clients would. Latency is reported per
+# buyer, retries included, and for the final attempt alone, which is the time
+# the server spent on the checkout itself. Exits non-zero when the counts are off
+# or any checkout fails with a server error. Honours
+# DATABASE_MODE, ORDER_INGESTION_MODE and DATABASE_URL (use a scratch database).
+# Run from backend/:  python -m benchmarks.stock_contention [--checkouts 500 --stock 100]
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from .common import create_schema, summarize, use_scratch_database
+
+RETRY_BASE_SECONDS = 0.02
+
+# Every checkout comes from the same client address, so rate limits would hide the race
+for name in ("RATE_LIMIT_CHECKOUT_PER_PAGE", "RATE_LIMIT_CHECKOUT_PER_CLIENT"):
+    os.environ.setdefault(name, "0")
+
+async def contend(args) -> bool:
+    import httpx
+    from sqlalchemy import func, select
+    from app import database, models
+    from app.main import app
+
+    create_schema()
+    with database.SessionLocal() as db:
+        user = models.User(email="bench-drop@example.com", hashed_password="x")
+        page = models.Page(slug="bench-drop", title="Bench Drop", owner=user)
+        limited = models.Product(name="Limited", price=50.0, stock=args.stock)
+        unlimited = models.Product(name="Sticker", price=2.0)
+        page.products = [limited, unlimited]
+        db.add(page)
+        db.commit()
+        slug, limited_id, unlimited_id, page_id = page.slug, limited.id, unlimited.id, page.id
+
+    cart = {"customer_name": "Buyer", "customer_phone": "000", "items": [
+        {"product_id": limited_id, "quantity": 1},
+        {"product_id": unlimited_id, "quantity": 2},
+    ]}
+    latencies: dict[int, list[float]] = {}
+    served: dict[int, list[float]] = {}
+    shed = 0
+
+    async with app.router.lifespan_context(app):
+        # Report errors as 500s instead of aborting the burst
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            async def checkout():
+                nonlocal shed
+                start = time.perf_counter()
+                attempt = 0
+                while True:
+                    attempt_start = time.perf_counter()
+                    response = await client.post(f"/orders/{slug}", json=cart)
+                    if response.status_code != 503:
+                        break
+                    shed += 1
+                    await asyncio.sleep(random.uniform(0, min(1.0, RETRY_BASE_SECONDS * 2 ** attempt)))
+                    attempt += 1
+                end = time.perf_counter()
+                latencies.setdefault(response.status_code, []).append(end - start)
+                served.setdefault(response.status_code, []).append(end - attempt_start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(checkout() for _ in range(args.checkouts)))
+            elapsed = time.perf_counter() - start
+
+    with database.SessionLocal() as db:
+        stock_left = db.scalar(select(models.Product.stock).where(models.Product.id == limited_id))
+        orders = db.scalar(select(func.count()).select_from(models.Order).where(models.Order.page_id == page_id))
+
+    print(f"{database.engine.dialect.name}, DATABASE_MODE={database.DATABASE_MODE}: "
+          f"{args.checkouts} parallel checkouts for {args.stock} units in {elapsed:.2f} s\n")
+    percentiles = f" {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    print(f"{'':>14} {'buyer, with retries':^26}  {'final attempt':^26}")
+    print(f"{'status':>7} {'count':>6}{percentiles} {percentiles}")
+    for status_code, samples in sorted(latencies.items()):
+        buyer, attempt = summarize(samples), summarize(served[status_code])
+        print(f"{status_code:>7} {buyer['count']:>6}"
+              f" {buyer['p50_ms']:>8} {buyer['p95_ms']:>8} {buyer['p99_ms']:>8} "
+              f" {attempt['p50_ms']:>8} {attempt['p95_ms']:>8} {attempt['p99_ms']:>8}")
+    print(f"\nstock left: {stock_left}, orders written: {orders}, 503 retries: {shed}")
+
+    # Every buyer must get an answer: any server error fails the run, even if
+    # the counts would otherwise line up. On SQLite, raise
+    # SQLITE_BUSY_TIMEOUT_SECONDS if writers give up with "database is locked".
+    errors = sum(len(samples) for status_code, samples in latencies.items() if status_code >= 500)
+    expected = min(args.stock, args.checkouts)
+    failures = []
+    if errors:
+        failures.append(f"{errors} checkouts failed with a server error")
+    if len(latencies.get(201, [])) != expected:
+        failures.append(f"{len(latencies.get(201, []))} checkouts succeeded, expected {expected}")
+    if len(latencies.get(409, [])) != args.checkouts - expected:
+        failures.append(f"{len(latencies.get(409, []))} got a 409, expected {args.checkouts - expected}")
+    if orders != expected:
+        failures.append(f"{orders} orders written, expected {expected}")
+    if stock_left != args.stock - expected:
+        failures.append(f"{stock_left} units left, expected {args.stock - expected}")
+    print("OK" if not failures else "FAILED: " + "; ".join(failures))
+    return not failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=100)
+    args = parser.parse_args()
+    use_scratch_database()
+    if not asyncio.run(contend(args)):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# File: backend/benchmarks/storefront_snapshots.py
+#
+# What a storefront cache miss costs, per load:
+#   tables:   page + products query, validation and encoding (the path before snapshots)
+#   snapshot: one read of the pre-rendered storefront_snapshots row (what misses do now)
+# plus the one-off cost of rendering and compressing a snapshot, and the bytes
+# sent for each encoding.
+# Run from backend/:  python -m benchmarks.storefront_snapshots [--products 40 --repeat 200]
+
+import argparse
+import asyncio
+import time
+
+from .common import create_schema, summarize, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, models, schemas, snapshots  # noqa: E402
+
+def seed(product_count: int) -> tuple[int, str]:
+    with database.SessionLocal() as db:
+        user = models.User(email="bench-snapshots@example.com", hashed_password="x")
+        page = models.Page(slug="bench-snapshots", title="Bench Snapshots", owner=user,
+                           description="Handmade goods, shipped weekly. " * 4)
+        page.products = [
+            models.Product(name=f"Product {i}", description=f"A lovely thing, number {i}, in stock now. " * 3,
+                           price=10.0 + i, stock=None if i % 3 else 25)
+            for i in range(product_count)
+        ]
+        db.add(page)
+        db.commit()
+        return page.id, page.slug
+
+def time_it(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    create_schema()
+    page_id, slug = seed(args.products)
+    render_time = summarize(time_it(lambda: asyncio.run(snapshots.regenerate(page_id)), 5))
+
+    def from_tables():
+        with database.SessionLocal() as db:
+            db_page = crud.get_page_by_slug(db, slug=slug, with_products=True)
+            return schemas.Page.model_validate(db_page).model_dump_json().encode()
+
+    def from_snapshot():
+        with database.SessionLocal() as db:
+            return snapshots.from_snapshot(crud.get_storefront_snapshot(db, slug=slug))
+
+    cached = from_snapshot()
+    assert from_tables() == cached.body
+    print(f"{database.engine.dialect.name}, one page with {args.products} products\n")
+    print("tables:  ", summarize(time_it(from_tables, args.repeat)))
+    print("snapshot:", summarize(time_it(from_snapshot, args.repeat)))
+    print("render:  ", render_time)
+    print(f"\nbytes: identity {len(cached.body)}, gzip {len(cached.body_gzip)}, br {len(cached.body_br)}")
+
+if __name__ == "__main__":
+    main()
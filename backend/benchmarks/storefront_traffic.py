@@ -0,0 +1,78 @@
+# File: backend/benchmarks/storefront_traffic.py
+#
+# What traffic counting costs:
+#   1. per storefront view: the in-memory increment on the request path,
+#      next to the one-row INSERT it replaces
+#   2. per flush: the batched upsert of a worker's counts, by number of
+#      (page, day, product) entries
+# Run from backend/:  python -m benchmarks.storefront_traffic [--views 100000 --pages 200]
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from .common import create_schema, summarize, use_scratch_database
+
+use_scratch_database()
+
+from app import crud, database, models, traffic  # noqa: E402
+
+def seed(page_count: int) -> list[int]:
+    with database.SessionLocal() as db:
+        pages = [
+            models.Page(slug=f"bench-traffic-{i}", title=f"Bench {i}",
+                        owner=models.User(email=f"bench-traffic-{i}@example.com", hashed_password="x"))
+            for i in range(page_count)
+        ]
+        db.add_all(pages)
+        db.commit()
+        return [page.id for page in pages]
+
+def per_view_us(page_ids: list[int], views: int) -> float:
+    counter = traffic.TrafficCounter(flush_seconds=60, max_keys=traffic.TRAFFIC_MAX_KEYS)
+    start = time.perf_counter()
+    for n in range(views):
+        counter.view(page_ids[n % len(page_ids)])
+    return (time.perf_counter() - start) / views * 1e6
+
+def per_insert_us(page_id: int, inserts: int) -> float:
+    """One committed write per view, the approach the counters avoid."""
+    with database.SessionLocal() as db:
+        start = time.perf_counter()
+        for _ in range(inserts):
+            crud.add_traffic_counts(db, {(page_id, datetime.now(timezone.utc).date(), 0): [1, 0]})
+        return (time.perf_counter() - start) / inserts * 1e6
+
+def flush_times(page_ids: list[int], products_per_page: int, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        counter = traffic.TrafficCounter(flush_seconds=60, max_keys=traffic.TRAFFIC_MAX_KEYS)
+        for page_id in page_ids:
+            counter.view(page_id)
+            for product_id in range(1, products_per_page + 1):
+                counter.click(page_id, product_id)
+        start = time.perf_counter()
+        asyncio.run(counter.flush())
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--views", type=int, default=100_000)
+    parser.add_argument("--inserts", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--products", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    create_schema()
+    page_ids = seed(args.pages)
+    print(f"{database.engine.dialect.name}\n")
+    print(f"per view, in-memory counter:   {per_view_us(page_ids, args.views):.2f} us")
+    print(f"per view, one committed write: {per_insert_us(page_ids[0], args.inserts):.2f} us")
+    entries = args.pages * (args.products + 1)
+    print(f"\nflush of {entries} entries:", summarize(flush_times(page_ids, args.products, args.repeat)))
+
+if __name__ == "__main__":
+    main()
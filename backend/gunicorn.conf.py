@@ -0,0 +1,59 @@
+# File: backend/gunicorn.conf.py
+#
+# Loaded by gunicorn from backend/ (see Procfile). Workers are forked from the
+# master, so environment set here reaches every worker.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Each worker writes its Prometheus samples here; /metrics merges them. Must be
+# set before prometheus_client is imported anywhere.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "solopreneur-prometheus")
+)
+
+# Worker processes. Exported so that per-worker pools (see app/hashing.py) can
+# size themselves to their share of the machine.
+workers = int(os.environ.setdefault("WEB_CONCURRENCY", "4"))
+
+# Token buckets for rate limiting, shared by all workers (see app/limits.py)
+RATE_LIMIT_STATE_FILE = os.environ.setdefault(
+    "RATE_LIMIT_STATE_FILE", os.path.join(tempfile.gettempdir(), "solopreneur-rate-limits")
+)
+
+from prometheus_client import multiprocess  # noqa: E402
+
+# Proxies trusted to report the client address in X-Forwarded-For; UvicornWorker
+# passes this on to uvicorn. Per-client rate limits (app/limits.py) key on that
+# address, so enable them only once this covers the proxy in front of the app.
+# On Azure App Service the app is only reachable through its front end, whose
+# addresses are not fixed: set FORWARDED_ALLOW_IPS="*" there.
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1,::1")
+
+# Set to false when migrations run as a separate release step
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "true").lower() in ("1", "true", "yes", "on")
+
+def on_starting(server):
+    # Samples left over from a previous run would be added to this run's totals
+    shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(PROMETHEUS_MULTIPROC_DIR)
+    if os.path.exists(RATE_LIMIT_STATE_FILE):
+        os.remove(RATE_LIMIT_STATE_FILE)
+    if RUN_MIGRATIONS:
+        # In a child process so the master never imports the app or opens
+        # connections that forked workers would inherit. Fails the start on error.
+        subprocess.run(
+            [sys.executable, "-m", "app.cli", "migrate"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+        )
+
+def post_fork(server, worker):
+    # Read by app.startup to measure the worker's import, warm-up and first request
+    os.environ["WORKER_BOOT_STARTED_AT"] = str(time.time())
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
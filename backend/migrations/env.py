@@ -0,0 +1,37 @@
+# File: backend/migrations/env.py
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from app import database, models
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+def _configure(**kwargs):
+    context.configure(
+        target_metadata=target_metadata,
+        # SQLite can only alter tables by copying them
+        render_as_batch=database.engine.dialect.name == "sqlite",
+        **kwargs,
+    )
+
+def run_migrations_offline():
+    _configure(url=database.engine.url, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with database.engine.connect() as connection:
+        _configure(connection=connection)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,31 @@
+"""Indexes for keyset-paginated order listings and per-page product lookups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+Databases created by create_all after these indexes were added to the models
+already have them, hence IF NOT EXISTS.
+"""
+
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_orders_page_id_created_at_id", "orders", ["page_id", "created_at", "id"], if_not_exists=True
+    )
+    op.create_index("ix_products_page_id", "products", ["page_id"], if_not_exists=True)
+    op.create_index("ix_order_items_order_id", "order_items", ["order_id"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_order_items_order_id", table_name="order_items")
+    op.drop_index("ix_products_page_id", table_name="products")
+    op.drop_index("ix_orders_page_id_created_at_id", table_name="orders")
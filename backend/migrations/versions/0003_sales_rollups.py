@@ -0,0 +1,44 @@
+"""Daily sales rollups per page and per product
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+create_all may already have created these tables, hence IF NOT EXISTS.
+Backfill with `python -m app.cli rebuild-rollups`.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "page_daily_sales",
+        sa.Column("page_id", sa.Integer(), sa.ForeignKey("pages.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.Column("order_count", sa.Integer(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "page_product_daily_sales",
+        sa.Column("page_id", sa.Integer(), sa.ForeignKey("pages.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("product_name", sa.String(), primary_key=True),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        if_not_exists=True,
+    )
+
+
+def downgrade():
+    op.drop_table("page_product_daily_sales")
+    op.drop_table("page_daily_sales")
@@ -0,0 +1,25 @@
+"""Optional per-product stock for limited drops
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable, so existing products keep unlimited stock and no table rewrite is needed
+    op.add_column("products", sa.Column("stock", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("products") as batch_op:
+        batch_op.drop_column("stock")
@@ -0,0 +1,30 @@
+"""Heartbeat row for measuring read replica lag
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    heartbeat = op.create_table(
+        "replica_heartbeat",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("beat_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.bulk_insert(heartbeat, [{"id": 1, "beat_at": datetime.now(timezone.utc)}])
+
+
+def downgrade():
+    op.drop_table("replica_heartbeat")
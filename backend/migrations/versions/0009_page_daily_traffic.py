@@ -0,0 +1,30 @@
+"""Storefront view and product click counters
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "page_daily_traffic",
+        sa.Column("page_id", sa.Integer(), sa.ForeignKey("pages.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("product_id", sa.Integer(), primary_key=True),
+        sa.Column("views", sa.Integer(), nullable=False),
+        sa.Column("clicks", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("page_daily_traffic")
@@ -0,0 +1,28 @@
+"""One page per user, enforced by a unique index on pages.owner_id
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+
+crud.create_user_page relies on this index to turn away a second page in its
+INSERT instead of looking the owner up first. The endpoint used to check for
+an existing page before inserting, which two concurrent requests could both
+pass; find any owners left with more than one page before upgrading:
+  SELECT owner_id FROM pages GROUP BY owner_id HAVING count(*) > 1
+"""
+
+from alembic import op
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_pages_owner_id", "pages", ["owner_id"], unique=True)
+
+
+def downgrade():
+    op.drop_index("ix_pages_owner_id", table_name="pages")
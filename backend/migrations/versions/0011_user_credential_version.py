@@ -0,0 +1,49 @@
+"""Credential version per user, bumped only by a password change
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+
+Tokens used to carry a fingerprint of the stored password hash, so a rehash
+under a new cost policy ended the user's other sessions as if the password had
+changed. They now carry users.credential_version. Live refresh tokens issued
+under the current hash are carried over to version 0; access tokens issued
+before the upgrade are turned away once and renewed through them.
+"""
+
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def _hash_fingerprint(hashed_password: str) -> str:
+    # What security.credential_version returned before this revision
+    return hashlib.sha256(hashed_password.encode()).hexdigest()[:16]
+
+
+def upgrade():
+    op.add_column(
+        "users", sa.Column("credential_version", sa.Integer(), nullable=False, server_default="0")
+    )
+    conn = op.get_bind()
+    tokens = conn.execute(sa.text(
+        "SELECT t.id, t.credential_version, u.hashed_password FROM refresh_tokens t"
+        " JOIN users u ON u.id = t.user_id WHERE t.used_at IS NULL AND t.revoked_at IS NULL"
+    )).all()
+    current = [{"id": token.id} for token in tokens if token.credential_version == _hash_fingerprint(token.hashed_password)]
+    if current:
+        conn.execute(sa.text("UPDATE refresh_tokens SET credential_version = '0' WHERE id = :id"), current)
+
+
+def downgrade():
+    # Sessions carried over above would no longer match; end them
+    op.execute("UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP WHERE revoked_at IS NULL")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("credential_version")
@@ -0,0 +1,32 @@
+"""Store every SQLite orders.created_at with microseconds
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+
+SQLite keeps datetimes as text and compares them as strings. Orders written
+through the server default (CURRENT_TIMESTAMP) were stored as
+"YYYY-MM-DD HH:MM:SS", while SQLAlchemy binds "YYYY-MM-DD HH:MM:SS.ffffff",
+so an order-history cursor or a `since`/`until` bound falling on such a row's
+second compared wrongly: the cursor's own order came back on the next page,
+and `since` skipped it. Other databases store timestamps natively.
+"""
+
+from alembic import op
+
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    op.execute("UPDATE orders SET created_at = created_at || '.000000' WHERE length(created_at) = 19")
+
+
+def downgrade():
+    # Both formats read back the same
+    pass
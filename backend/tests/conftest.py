@@ -0,0 +1,55 @@
+# File: backend/tests/conftest.py
+#
+# The suite drives the app in-process against a scratch SQLite database, in
+# whichever DATABASE_MODE it was started with (test_async_mode.py reruns it
+# with DATABASE_MODE=async). Requests go through httpx's ASGITransport inside
+# the test's own task, so `database.statement_budget()` around a request sees
+# every statement it issues, in the threadpool (sync) or the greenlet (async).
+# Run from backend/:  python -m pytest
+
+import itertools
+import os
+import tempfile
+
+# Before anything under `app` is imported
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='solopreneur-tests-'), 'test.db')}"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("LOG_LEVEL", "off")
+# Every test request comes from one address and hits a handful of pages
+for _name in ("RATE_LIMIT_STOREFRONT_PER_PAGE", "RATE_LIMIT_CHECKOUT_PER_PAGE"):
+    os.environ.setdefault(_name, "0")
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from app.cli import upgrade_database  # noqa: E402
+from app.main import app  # noqa: E402
+
+from .helpers import Seller, sign_up  # noqa: E402
+
+_accounts = itertools.count()
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    upgrade_database()
+
+@pytest.fixture
+async def client():
+    """An HTTP client for the app, with its lifespan (background tasks, warm-up) running."""
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
+
+@pytest.fixture
+async def seller(client) -> Seller:
+    n = next(_accounts)
+    headers = await sign_up(client, f"seller-{n}@example.com")
+    response = await client.post("/pages/", headers=headers, json={"title": f"Test Shop {n}"})
+    assert response.status_code == 201, response.text
+    return Seller(headers, response.json())
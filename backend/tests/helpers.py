@@ -0,0 +1,37 @@
+# File: backend/tests/helpers.py
+#
+# Request helpers shared by the tests.
+
+import httpx
+
+class Seller:
+    """A signed-up user with a page; `headers` authenticate as them."""
+
+    def __init__(self, headers: dict, page: dict):
+        self.headers = headers
+        self.page = page
+        self.slug = page["slug"]
+
+async def sign_up(client: httpx.AsyncClient, email: str, password: str = "secret") -> dict:
+    response = await client.post("/users/", json={"email": email, "password": password})
+    assert response.status_code == 201, response.text
+    response = await client.post("/users/login", data={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    # Fills this worker's principal cache, as on any of a seller's requests but the first
+    assert (await client.get("/users/me", headers=headers)).status_code == 200
+    return headers
+
+async def add_product(client: httpx.AsyncClient, seller: Seller, **fields) -> dict:
+    response = await client.post("/products/", headers=seller.headers, json={"price": 5.0, **fields})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+async def place_order(client: httpx.AsyncClient, slug: str, product_ids: list[int], quantity: int = 1) -> dict:
+    response = await client.post(f"/orders/{slug}", json={
+        "customer_name": "Buyer",
+        "customer_phone": "000",
+        "items": [{"product_id": product_id, "quantity": quantity} for product_id in product_ids],
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
@@ -0,0 +1,27 @@
+# File: backend/tests/test_async_mode.py
+#
+# DATABASE_MODE is read once, at import, so the async session path needs its
+# own process: this reruns the rest of the suite with DATABASE_MODE=async.
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app import database
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@pytest.mark.skipif(database.ASYNC_DATABASE, reason="already running in async mode")
+def test_suite_passes_in_async_mode(tmp_path):
+    env = {
+        **os.environ,
+        "DATABASE_MODE": "async",
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'test.db'}",
+    }
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", TESTS_DIR],
+        cwd=os.path.dirname(TESTS_DIR), env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout[-4000:] + result.stderr[-2000:]
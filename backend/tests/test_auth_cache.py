@@ -0,0 +1,71 @@
+# File: backend/tests/test_auth_cache.py
+#
+# Authenticated requests resolve their user from `principal_cache` and their
+# token from the verified-token memo. Neither may keep a token alive longer
+# than the database or the token's own `exp` allows.
+
+import itertools
+from datetime import datetime, timedelta
+
+import pytest
+from jose import JWTError
+from sqlalchemy import select, update
+
+from app import crud, database, models, security
+from app.cache import principal_cache
+
+from .helpers import sign_up
+
+pytestmark = pytest.mark.anyio
+
+_emails = (f"cached-{n}@example.com" for n in itertools.count())
+
+def find_user(email: str) -> models.User:
+    with database.SessionLocal() as db:
+        return db.scalar(select(models.User).where(models.User.email == email))
+
+async def test_cached_principal_issues_no_statements(client):
+    # sign_up has already made one authenticated request
+    headers = await sign_up(client, next(_emails))
+    with database.statement_budget(0, label="GET /users/me, cached"):
+        response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+
+async def test_stale_cache_entry_yields_to_a_newer_token(client):
+    email = next(_emails)
+    await sign_up(client, email)
+    user = find_user(email)
+    assert principal_cache.get(user.id)[1] == "0"
+    # The version moves on behind this worker's back, as through another worker
+    with database.SessionLocal() as db:
+        db.execute(update(models.User).where(models.User.id == user.id).values(credential_version=1))
+        db.commit()
+    token = security.create_user_access_token(user.id, email, credential_version="1")
+    response = await client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert principal_cache.get(user.id)[1] == "1"
+
+async def test_password_change_rejects_older_tokens(client):
+    email = next(_emails)
+    headers = await sign_up(client, email)
+    with database.SessionLocal() as db:
+        crud.update_user_password(db, db.get(models.User, find_user(email).id), "a different hash")
+    response = await client.get("/users/me", headers=headers)
+    assert response.status_code == 401
+
+async def test_verified_token_memo_respects_exp(client, monkeypatch):
+    email = next(_emails)
+    headers = await sign_up(client, email)
+    token = headers["Authorization"].removeprefix("Bearer ")
+    assert security.decode_access_token(token)["sub"] == email
+
+    class Later(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.now(tz) + timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES + 1)
+
+    monkeypatch.setattr(security, "datetime", Later)
+    # Served from the memo, which checks `exp` itself before jose ever sees the token
+    with pytest.raises(JWTError):
+        security.decode_access_token(token)
+    assert security._verified_tokens.get(token) is None
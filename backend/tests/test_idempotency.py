@@ -0,0 +1,126 @@
+# File: backend/tests/test_idempotency.py
+#
+# POST /orders/{slug} with an Idempotency-Key places at most one order per key:
+# duplicates get the stored response back without touching orders or
+# products, and a request that fails releases the key for its retry.
+
+import asyncio
+import itertools
+from contextlib import contextmanager
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, func, select
+
+from app import database, models
+from app.api.endpoints import orders
+from app.cache import idempotency_cache
+
+from .helpers import add_product
+
+pytestmark = pytest.mark.anyio
+
+_keys = (f"checkout-{n}" for n in itertools.count())
+
+def order_body(product_id: int, customer_name: str = "Buyer") -> dict:
+    return {
+        "customer_name": customer_name,
+        "customer_phone": "000",
+        "items": [{"product_id": product_id, "quantity": 1}],
+    }
+
+def count_orders() -> int:
+    with database.SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(models.Order))
+
+@contextmanager
+def recorded_statements():
+    """Collects the SQL issued on the primary, in either DATABASE_MODE, inside the block."""
+    statements = []
+    target = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(target, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(target, "before_cursor_execute", record)
+
+async def test_concurrent_duplicates_place_one_order(client, seller):
+    product = await add_product(client, seller, name="Lamp")
+    headers = {"Idempotency-Key": next(_keys)}
+    before = count_orders()
+    responses = await asyncio.gather(*(
+        client.post(f"/orders/{seller.slug}", json=order_body(product["id"]), headers=headers)
+        for _ in range(5)
+    ))
+    assert [response.status_code for response in responses] == [201] * 5
+    assert sum(response.headers.get("Idempotent-Replayed") == "true" for response in responses) == 4
+    assert len({response.content for response in responses}) == 1
+    assert count_orders() == before + 1
+
+async def test_key_reused_with_a_different_body(client, seller):
+    product = await add_product(client, seller, name="Rug")
+    headers = {"Idempotency-Key": next(_keys)}
+    response = await client.post(f"/orders/{seller.slug}", json=order_body(product["id"]), headers=headers)
+    assert response.status_code == 201
+    response = await client.post(
+        f"/orders/{seller.slug}", json=order_body(product["id"], customer_name="Someone else"), headers=headers
+    )
+    assert response.status_code == 422
+
+async def test_replay_leaves_orders_and_products_alone(client, seller):
+    product = await add_product(client, seller, name="Vase", stock=5)
+    headers = {"Idempotency-Key": next(_keys)}
+    first = await client.post(f"/orders/{seller.slug}", json=order_body(product["id"]), headers=headers)
+    assert first.status_code == 201
+    # From this worker's cache
+    with database.statement_budget(0, label="POST /orders/{slug}, cached replay"):
+        replay = await client.post(f"/orders/{seller.slug}", json=order_body(product["id"]), headers=headers)
+    assert replay.content == first.content
+    # From the stored row, as on a worker that did not run the first request
+    idempotency_cache.clear()
+    with recorded_statements() as statements:
+        replay = await client.post(f"/orders/{seller.slug}", json=order_body(product["id"]), headers=headers)
+    assert replay.content == first.content
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    # Just the claim, which finds the stored response
+    assert statements
+    touched = [statement for statement in statements if "orders" in statement or "products" in statement]
+    assert not touched, touched
+
+async def test_exception_releases_the_key(client, seller, monkeypatch):
+    product = await add_product(client, seller, name="Mug")
+    headers = {"Idempotency-Key": next(_keys)}
+    create_order = orders._create_order
+
+    async def crash(*args, **kwargs):
+        raise RuntimeError("worker fell over")
+
+    monkeypatch.setattr(orders, "_create_order", crash)
+    with pytest.raises(RuntimeError):
+        await client.post(f"/orders/{seller.slug}", json=order_body(product["id"]), headers=headers)
+    monkeypatch.setattr(orders, "_create_order", create_order)
+    response = await client.post(f"/orders/{seller.slug}", json=order_body(product["id"]), headers=headers)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+
+async def test_server_error_releases_the_key(client, seller, monkeypatch):
+    product = await add_product(client, seller, name="Bowl")
+    headers = {"Idempotency-Key": next(_keys)}
+    create_order = orders._create_order
+
+    async def unavailable(*args, **kwargs):
+        raise HTTPException(status_code=503, detail="Orders cannot be taken right now, please try again.")
+
+    monkeypatch.setattr(orders, "_create_order", unavailable)
+    response = await client.post(f"/orders/{seller.slug}", json=order_body(product["id"]), headers=headers)
+    assert response.status_code == 503
+    before = count_orders()
+    monkeypatch.setattr(orders, "_create_order", create_order)
+    response = await client.post(f"/orders/{seller.slug}", json=order_body(product["id"]), headers=headers)
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+    assert count_orders() == before + 1
@@ -0,0 +1,93 @@
+# File: backend/tests/test_order_history.py
+#
+# GET /orders/my-orders pages through a seller's orders newest first with an
+# opaque (created_at, id) cursor: every order is served exactly once, however
+# the page boundaries fall.
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from alembic import command
+from sqlalchemy import text, update
+
+from app import crud, database, models
+from app.cli import _alembic_config, upgrade_database
+
+from .helpers import add_product, place_order
+
+pytestmark = pytest.mark.anyio
+
+async def place_orders(client, seller, count: int) -> list[int]:
+    product = await add_product(client, seller, name="Print")
+    return [(await place_order(client, seller.slug, [product["id"]]))["id"] for _ in range(count)]
+
+async def read_history(client, seller, **params) -> list[int]:
+    """Follows X-Next-Cursor to the end; returns the order ids in the order served."""
+    served = []
+    while True:
+        response = await client.get("/orders/my-orders", headers=seller.headers, params=params)
+        assert response.status_code == 200, response.text
+        page = [order["id"] for order in response.json()]
+        # A cursor that lets its own order through would loop here forever
+        assert not set(page) & set(served), f"served again: {set(page) & set(served)}"
+        served += page
+        if "X-Next-Cursor" not in response.headers:
+            return served
+        assert len(response.json()) == params["limit"]
+        params = {**params, "cursor": response.headers["X-Next-Cursor"]}
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 18, 9, 30, 5, 123456, tzinfo=timezone.utc)
+    assert crud.decode_order_cursor(crud.encode_order_cursor(created_at, 42)) == (created_at, 42)
+
+async def test_pages_cover_every_order_once(client, seller):
+    order_ids = await place_orders(client, seller, 5)
+    assert await read_history(client, seller, limit=2) == order_ids[::-1]
+    response = await client.get("/orders/my-orders", headers=seller.headers, params={"limit": 5})
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+async def test_orders_sharing_a_timestamp(client, seller):
+    order_ids = await place_orders(client, seller, 4)
+    with database.SessionLocal() as db:
+        db.execute(
+            update(models.Order).where(models.Order.id.in_(order_ids))
+            .values(created_at=datetime(2026, 1, 1, 10, tzinfo=timezone.utc))
+        )
+        db.commit()
+    assert await read_history(client, seller, limit=1) == order_ids[::-1]
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "bm90IGpzb24", "WyJ5ZXN0ZXJkYXkiLCAxXQ"])
+async def test_invalid_cursor(client, seller, cursor):
+    response = await client.get("/orders/my-orders", headers=seller.headers, params={"cursor": cursor})
+    assert response.status_code == 400
+
+async def test_since_and_until(client, seller):
+    order_ids = await place_orders(client, seller, 3)
+    start = datetime(2026, 3, 1, tzinfo=timezone.utc)
+    with database.SessionLocal() as db:
+        for day, order_id in enumerate(order_ids):
+            db.execute(
+                update(models.Order).where(models.Order.id == order_id)
+                .values(created_at=start + timedelta(days=day))
+            )
+        db.commit()
+    # `since` is inclusive, `until` exclusive
+    params = {"limit": 1, "since": start.isoformat(), "until": (start + timedelta(days=2)).isoformat()}
+    assert await read_history(client, seller, **params) == order_ids[1::-1]
+
+@pytest.mark.skipif(database.engine.dialect.name != "sqlite", reason="SQLite stores datetimes as text")
+async def test_orders_from_the_server_default(client, seller):
+    order_ids = await place_orders(client, seller, 3)
+    # As written by CURRENT_TIMESTAMP, without microseconds, before revision 0012
+    with database.SessionLocal() as db:
+        db.execute(
+            text("UPDATE orders SET created_at = '2026-01-01 10:00:00' WHERE page_id = :page_id"),
+            {"page_id": seller.page["id"]},
+        )
+        db.commit()
+    command.downgrade(_alembic_config(), "0011")
+    upgrade_database()
+    assert await read_history(client, seller, limit=1) == order_ids[::-1]
+    params = {"limit": 1, "since": "2026-01-01T10:00:00"}
+    assert await read_history(client, seller, **params) == order_ids[::-1]
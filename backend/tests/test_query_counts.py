@@ -0,0 +1,60 @@
+# File: backend/tests/test_query_counts.py
+#
+# N+1 guards: each route below must issue a fixed number of SQL statements no
+# matter how many products, orders or cart lines are involved. The data is
+# sized so that one lazy load per row would blow the budget several times over.
+
+import pytest
+
+from app import database
+from app.cache import storefront_cache
+
+from .helpers import add_product, place_order
+
+pytestmark = pytest.mark.anyio
+
+PRODUCTS = 12
+ORDERS = 15
+
+@pytest.fixture
+async def stocked(client, seller):
+    seller.products = [await add_product(client, seller, name=f"Product {i}") for i in range(PRODUCTS)]
+    return seller
+
+async def test_public_storefront_from_tables(client, stocked):
+    # Not yet rendered as a snapshot and not cached: the page is read from its tables
+    storefront_cache.invalidate(stocked.page["id"])
+    with database.statement_budget(3, label="GET /pages/{slug}"):
+        response = await client.get(f"/pages/{stocked.slug}")
+    assert response.status_code == 200
+    assert len(response.json()["products"]) == PRODUCTS
+
+async def test_public_storefront_cached(client, stocked):
+    await client.get(f"/pages/{stocked.slug}")
+    with database.statement_budget(0, label="GET /pages/{slug}, cached"):
+        response = await client.get(f"/pages/{stocked.slug}")
+    assert response.status_code == 200
+
+async def test_own_page(client, stocked):
+    with database.statement_budget(2, label="GET /pages/me"):
+        response = await client.get("/pages/me", headers=stocked.headers)
+    assert response.status_code == 200
+    assert len(response.json()["products"]) == PRODUCTS
+
+async def test_order_history(client, stocked):
+    product_ids = [product["id"] for product in stocked.products[:3]]
+    for _ in range(ORDERS):
+        await place_order(client, stocked.slug, product_ids)
+    with database.statement_budget(3, label="GET /orders/my-orders"):
+        response = await client.get("/orders/my-orders", headers=stocked.headers)
+    assert response.status_code == 200
+    orders = response.json()
+    assert len(orders) == ORDERS
+    assert all(len(order["items"]) == len(product_ids) for order in orders)
+
+async def test_checkout_does_not_grow_with_the_cart(client, stocked):
+    with database.statement_budget(7, label="POST /orders/{slug}, one line"):
+        await place_order(client, stocked.slug, [stocked.products[0]["id"]])
+    with database.statement_budget(7, label="POST /orders/{slug}, every product"):
+        order = await place_order(client, stocked.slug, [product["id"] for product in stocked.products])
+    assert len(order["items"]) == PRODUCTS
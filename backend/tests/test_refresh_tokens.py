@@ -0,0 +1,78 @@
+# File: backend/tests/test_refresh_tokens.py
+#
+# A refresh token outlives neither its user nor their password: the rotation
+# checks both before issuing a successor, and ends the session when either
+# has changed.
+
+import itertools
+
+import pytest
+from passlib.hash import bcrypt
+from sqlalchemy import delete, select
+
+from app import crud, database, hashing, models
+
+pytestmark = pytest.mark.anyio
+
+_emails = (f"refresher-{n}@example.com" for n in itertools.count())
+
+async def log_in(client, email: str | None = None) -> tuple[int, str]:
+    if email is None:
+        email = next(_emails)
+        assert (await client.post("/users/", json={"email": email, "password": "secret"})).status_code == 201
+    response = await client.post("/users/login", data={"username": email, "password": "secret"})
+    assert response.status_code == 200, response.text
+    with database.SessionLocal() as db:
+        user_id = db.scalar(select(models.User.id).where(models.User.email == email))
+    return user_id, response.json()["refresh_token"]
+
+def session_tokens(user_id: int) -> list:
+    with database.SessionLocal() as db:
+        return db.execute(
+            select(models.RefreshToken.used_at, models.RefreshToken.revoked_at)
+            .where(models.RefreshToken.user_id == user_id)
+        ).all()
+
+async def test_rotation(client):
+    user_id, refresh_token = await log_in(client)
+    response = await client.post("/users/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200
+    assert response.json()["refresh_token"] != refresh_token
+    assert len(session_tokens(user_id)) == 2
+
+async def test_password_change_ends_the_session(client):
+    user_id, refresh_token = await log_in(client)
+    with database.SessionLocal() as db:
+        crud.update_user_password(db, db.get(models.User, user_id), "a different hash")
+    response = await client.post("/users/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+    # No successor was issued, and the token that came back is revoked
+    tokens = session_tokens(user_id)
+    assert len(tokens) == 1
+    assert tokens[0].revoked_at is not None
+
+async def test_deleted_user_is_rejected(client):
+    user_id, refresh_token = await log_in(client)
+    with database.SessionLocal() as db:
+        # Like a deletion on a database that does not enforce the foreign key
+        db.execute(delete(models.User).where(models.User.id == user_id))
+        db.commit()
+    response = await client.post("/users/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+    assert len(session_tokens(user_id)) == 1
+
+async def test_rehash_keeps_other_sessions(client):
+    user_id, refresh_token = await log_in(client)
+    with database.SessionLocal() as db:
+        # Hashed under an older cost policy, so the next login rehashes it
+        old_hash = bcrypt.using(rounds=hashing.BCRYPT_ROUNDS + 1).hash("secret")
+        crud.rehash_user_password(db, user_id=user_id, hashed_password=old_hash)
+        email = db.get(models.User, user_id).email
+    await log_in(client, email)
+    with database.SessionLocal() as db:
+        assert db.get(models.User, user_id).hashed_password != old_hash
+    # The session started before the rehash carries on
+    response = await client.post("/users/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert (await client.get("/users/me", headers=headers)).status_code == 200
@@ -0,0 +1,23 @@
+# File: backend/tests/test_snapshots.py
+#
+# The snapshot scheduler has to stop on shutdown however its task is parked.
+
+import anyio
+import pytest
+
+from app import snapshots
+
+pytestmark = pytest.mark.anyio
+
+async def test_stop_when_a_page_is_scheduled_during_shutdown():
+    scheduler = snapshots.SnapshotScheduler(debounce_seconds=60, max_delay_seconds=60)
+    await scheduler.start()
+    # A page that is not due yet parks the task in a timed wait for the wakeup
+    scheduler._schedule(1)
+    await anyio.sleep(0.01)
+    scheduler._pending.clear()
+    # Another page scheduled in the same loop iteration as the cancellation
+    scheduler._wakeup.set()
+    with anyio.move_on_after(2) as deadline:
+        await scheduler.stop()
+    assert not deadline.cancel_called, "stop() hung"
@@ -0,0 +1,45 @@
+# File: backend/tests/test_stock_contention.py
+#
+# A limited drop at test size: parallel checkouts for fewer units than buyers
+# sell exactly the stock and turn the rest away with a 409. The full-size run,
+# with latencies, is benchmarks/stock_contention.py.
+
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from app import database, models
+
+from .helpers import add_product
+
+pytestmark = pytest.mark.anyio
+
+CHECKOUTS = 50
+STOCK = 10
+
+async def test_parallel_checkouts_sell_exactly_the_stock(client, seller):
+    limited = await add_product(client, seller, name="Limited", price=50.0, stock=STOCK)
+    unlimited = await add_product(client, seller, name="Sticker", price=2.0)
+    cart = {"customer_name": "Buyer", "customer_phone": "000", "items": [
+        {"product_id": limited["id"], "quantity": 1},
+        {"product_id": unlimited["id"], "quantity": 2},
+    ]}
+
+    async def checkout() -> int:
+        while True:
+            response = await client.post(f"/orders/{seller.slug}", json=cart)
+            # Shed by admission control; retry as a real client would
+            if response.status_code != 503:
+                return response.status_code
+            await asyncio.sleep(0.01)
+
+    statuses = await asyncio.gather(*(checkout() for _ in range(CHECKOUTS)))
+    assert statuses.count(201) == STOCK
+    assert statuses.count(409) == CHECKOUTS - STOCK
+    with database.SessionLocal() as db:
+        assert db.scalar(select(models.Product.stock).where(models.Product.id == limited["id"])) == 0
+        orders = db.scalar(
+            select(func.count()).select_from(models.Order).where(models.Order.page_id == seller.page["id"])
+        )
+    assert orders == STOCK
@@ -0,0 +1,62 @@
+# File: backend/tests/test_write_statements.py
+#
+# SQL statements per write endpoint, authentication included. Each write is
+# one INSERT/UPDATE/DELETE ... RETURNING plus whatever bookkeeping has to share
+# its transaction (snapshot dirty marks, stock, sales rollups), with no re-read
+# after the commit. COMMIT is not counted. Checkout, which must not grow with
+# the cart, is covered in test_query_counts.py.
+
+import itertools
+
+import pytest
+
+from app import database, security
+
+from .helpers import add_product, sign_up
+
+pytestmark = pytest.mark.anyio
+
+_emails = (f"writer-{n}@example.com" for n in itertools.count())
+
+async def test_sign_up(client):
+    # The email lookup, then INSERT ... ON CONFLICT DO NOTHING RETURNING
+    with database.statement_budget(2, label="POST /users/"):
+        response = await client.post("/users/", json={"email": next(_emails), "password": "secret"})
+    assert response.status_code == 201
+
+async def test_sign_up_with_a_taken_email_skips_hashing(client, monkeypatch):
+    email = next(_emails)
+    assert (await client.post("/users/", json={"email": email, "password": "secret"})).status_code == 201
+
+    async def must_not_hash(password):
+        raise AssertionError("hashed a password for a taken email")
+
+    monkeypatch.setattr(security, "get_password_hash", must_not_hash)
+    with database.statement_budget(1, label="POST /users/, taken email"):
+        response = await client.post("/users/", json={"email": email, "password": "secret"})
+    assert response.status_code == 400
+
+async def test_page_writes(client):
+    headers = await sign_up(client, next(_emails))
+    # INSERT ... ON CONFLICT DO NOTHING RETURNING
+    with database.statement_budget(1, label="POST /pages/"):
+        response = await client.post("/pages/", headers=headers, json={"title": "Write Shop", "description": "Before"})
+    assert response.status_code == 201
+    # UPDATE ... RETURNING, its products, the snapshot dirty mark
+    with database.statement_budget(3, label="PUT /pages/me"):
+        response = await client.put("/pages/me", headers=headers, json={"description": "After"})
+    assert response.status_code == 200
+    assert response.json()["description"] == "After"
+
+async def test_product_writes(client, seller):
+    # INSERT ... SELECT ... RETURNING, the snapshot dirty mark
+    with database.statement_budget(2, label="POST /products/"):
+        product = await add_product(client, seller, name="Product", stock=10)
+    # UPDATE ... RETURNING, the dirty mark
+    with database.statement_budget(2, label="PUT /products/{id}"):
+        response = await client.put(f"/products/{product['id']}", headers=seller.headers, json={"price": 9.5})
+    assert response.status_code == 200
+    # DELETE ... RETURNING, the dirty mark
+    with database.statement_budget(2, label="DELETE /products/{id}"):
+        response = await client.delete(f"/products/{product['id']}", headers=seller.headers)
+    assert response.status_code == 200